@@ -1,97 +1,377 @@
 # analyzer.py
+import asyncio
+import contextvars
+import json
+import logging
 import re
-from typing import Dict, Any, List
-from Prompt_analyzer_Enhancer.templates import create_analysis_prompt_template
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_core.prompts import PromptTemplate
+from Prompt_analyzer_Enhancer.templates import (
+    create_analysis_prompt_template,
+    create_structured_analysis_prompt_template,
+)
 from Prompt_analyzer_Enhancer.config import Config
+from Prompt_analyzer_Enhancer.cache import ResponseCache
+from Prompt_analyzer_Enhancer.chunking import merge_analyses, split_prompt
+from Prompt_analyzer_Enhancer.heuristics import HeuristicScorer
+from Prompt_analyzer_Enhancer.resilience import CircuitOpenError
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
+from Prompt_analyzer_Enhancer.metrics import record_tokens, span
+from Prompt_analyzer_Enhancer.micro_batch import AnalysisBatcher, BatchItemError
+from Prompt_analyzer_Enhancer.schemas import PromptAnalysis
+from Prompt_analyzer_Enhancer.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Compiled once; parsing runs on every request
+JSON_DECODER = json.JSONDecoder()
+FENCED_JSON_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.IGNORECASE | re.DOTALL)
+FIELD_PATTERN = re.compile(
+    r'"?(task[_ ]type|complexity|missing[_ ]elements?|context[_ ]score|clarity[_ ]score)"?\s*:\s*'
+    r'("(?:[^"\\]|\\.)*"|\[[^\]]*\]|-?\d+(?:\.\d+)?|[A-Za-z]+)',
+    re.IGNORECASE,
+)
+QUOTED_PATTERN = re.compile(r'"([^"]*)"')
+TASK_TYPE_PATTERN = re.compile(r"\b(code|coding|programming|writing|analysis|analytical|general)\b", re.IGNORECASE)
+TASK_TYPE_ALIASES = {"coding": "code", "programming": "code", "analytical": "analysis"}
+COMPLEXITY_PATTERN = re.compile(r"\b(low|medium|high)\b", re.IGNORECASE)
+FIELD_NAMES = {
+    "task type": "task_type",
+    "missing element": "missing_elements",
+    "missing elements": "missing_elements",
+    "missing_element": "missing_elements",
+    "context score": "context_score",
+    "clarity score": "clarity_score",
+}
+
 
 class PromptAnalyzer:
     def __init__(self, config: Config):
-        self.llm = config.llm
+        self.llm = config.router.model("analysis") if config.router else config.llm
         self.analysis_prompt = create_analysis_prompt_template()
+        self.cache = config.cache
+        self.fast_analysis_threshold = config.fast_analysis_threshold
+        self.fast_analysis = config.fast_analysis
+        self.heuristic_scorer = HeuristicScorer()
+        self.guard = config.guard
+        self.structured_prompt = None
+        self.structured_chain = None
+        if config.structured_analysis:
+            self.structured_prompt = create_structured_analysis_prompt_template()
+            self.structured_chain = self.structured_prompt | self.llm.with_structured_output(PromptAnalysis)
+        self.semantic_cache = config.semantic_cache
+        # Prompts longer than this many estimated tokens are analyzed in chunks (0 disables)
+        self.chunk_tokens = config.analysis_chunk_tokens
+        # Chunk calls in flight per analysis; the request holds one llm_semaphore slot for all of them
+        self.chunk_concurrency = config.analysis_chunk_concurrency
+        # Identical prompts analyzed concurrently share one LLM call
+        self.in_flight = SingleFlight("analysis")
+        # Different prompts analyzed concurrently share one call when batching is on (async only)
+        self.batcher = None
+        if config.analysis_batching:
+            self.batcher = AnalysisBatcher(self.llm, self.guard, **config.analysis_batching)
+        # How each analysis was produced; "parsed" includes cached raw responses
+        self.path_counts = {
+            "fast": 0, "semantic_hit": 0, "cache_hit": 0, "structured": 0, "parsed": 0, "fallback": 0, "degraded": 0,
+            "chunked": 0,
+        }
 
     def analyze_prompt(self, prompt: str) -> Dict[str, Any]:
-        """Comprehensive prompt analysis"""
-        chain = self.analysis_prompt | self.llm
+        """Comprehensive prompt analysis; long prompts are analyzed in parallel chunks and merged"""
+        fast_analysis = self._fast_analysis(prompt) or self._similar_analysis(prompt)
+        if fast_analysis is not None:
+            return fast_analysis
+
+        chunks = self._chunks(prompt)
+        if chunks:
+            # Each thread runs in a copy of this context, keeping the request's priority and queue-wait tracker
+            context = contextvars.copy_context()
+            with ThreadPoolExecutor(max_workers=min(len(chunks), self.chunk_concurrency)) as pool:
+                analyses = list(pool.map(lambda chunk: context.copy().run(self._analyze_whole, chunk), chunks))
+            return self._merge_chunks(prompt, chunks, analyses)
+        return self._analyze_whole(prompt)
+
+    def _analyze_whole(self, prompt: str) -> Dict[str, Any]:
+        try:
+            (analysis, reusable), shared = self.in_flight.do(
+                self._flight_key(prompt), lambda: self._analyze_with_llm(prompt)
+            )
+        except CircuitOpenError:
+            return self._degraded_analysis(prompt)
+        except Exception as e:
+            return self._fallback_analysis(prompt, str(e))
+
+        # The caller that made the call remembers it, once
+        if reusable and not shared:
+            self._remember_analysis(prompt, analysis)
+        return analysis
+
+    def _analyze_with_llm(self, prompt: str) -> Tuple[Dict[str, Any], bool]:
+        """Analysis from the LLM, and whether it is worth remembering"""
+        if self.structured_chain is not None:
+            structured_key = self._cache_key(prompt, self.structured_prompt)
+            cached = self._cached_structured(structured_key)
+            if cached is not None:
+                return cached, False
+            tokens = estimate_tokens(self.structured_prompt.template, prompt)
+            try:
+                with span("analysis.structured_llm"):
+                    result = self.guard.call(
+                        lambda: self.structured_chain.invoke({"prompt": prompt}), tokens=tokens
+                    )
+                record_tokens("structured_analysis", tokens, 0)
+                return self._structured_analysis(result, structured_key), True
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning("Structured analysis failed, using text parsing: %s", e)
 
+        cache_key = self._cache_key(prompt)
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            self.path_counts["cache_hit"] += 1
+            return self._parse_analysis(cached, prompt), False
+
+        with span("analysis.render"):
+            prompt_value = self.analysis_prompt.invoke({"prompt": prompt})
+        tokens = estimate_tokens(prompt_value.to_string())
+        with span("analysis.llm"):
+            response = self.guard.call(lambda: self.llm.invoke(prompt_value), tokens=tokens)
+        return self._handle_response(response, prompt, tokens, cache_key)
+
+    async def analyze_prompt_async(self, prompt: str, raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        Non-blocking prompt analysis for use inside an event loop; long
+        prompts are analyzed in concurrent chunks and merged.
+        With raise_errors the LLM error is re-raised instead of falling back.
+        """
+        fast_analysis = self._fast_analysis(prompt) or self._similar_analysis(prompt)
+        if fast_analysis is not None:
+            return fast_analysis
+
+        chunks = self._chunks(prompt)
+        if chunks:
+            gate = asyncio.Semaphore(self.chunk_concurrency)
+
+            async def analyze_chunk(chunk: str) -> Dict[str, Any]:
+                async with gate:
+                    return await self._analyze_whole_async(chunk, raise_errors)
+
+            analyses = await asyncio.gather(*(analyze_chunk(chunk) for chunk in chunks))
+            return self._merge_chunks(prompt, chunks, analyses)
+        return await self._analyze_whole_async(prompt, raise_errors)
+
+    async def _analyze_whole_async(self, prompt: str, raise_errors: bool) -> Dict[str, Any]:
         try:
-            response = chain.invoke({"prompt": prompt})
-            print("The response of the prompt is this ", response)
-            return self._parse_analysis(response.content, prompt)
+            (analysis, reusable), shared = await self.in_flight.ado(
+                self._flight_key(prompt), lambda: self._analyze_with_llm_async(prompt)
+            )
         except Exception as e:
+            if raise_errors:
+                raise
+            if isinstance(e, CircuitOpenError):
+                return self._degraded_analysis(prompt)
             return self._fallback_analysis(prompt, str(e))
 
+        # The caller that made the call remembers it, once
+        if reusable and not shared:
+            self._remember_analysis(prompt, analysis)
+        return analysis
+
+    async def _analyze_with_llm_async(self, prompt: str) -> Tuple[Dict[str, Any], bool]:
+        if self.structured_chain is not None:
+            structured_key = self._cache_key(prompt, self.structured_prompt)
+            cached = self._cached_structured(structured_key)
+            if cached is not None:
+                return cached, False
+            tokens = estimate_tokens(self.structured_prompt.template, prompt)
+            try:
+                with span("analysis.structured_llm"):
+                    result = await self.guard.acall(
+                        lambda: self.structured_chain.ainvoke({"prompt": prompt}), tokens=tokens
+                    )
+                record_tokens("structured_analysis", tokens, 0)
+                return self._structured_analysis(result, structured_key), True
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning("Structured analysis failed, using text parsing: %s", e)
+
+        cache_key = self._cache_key(prompt)
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            self.path_counts["cache_hit"] += 1
+            return self._parse_analysis(cached, prompt), False
+
+        if self.batcher is not None:
+            try:
+                batched = await self.batcher.submit(prompt)
+            except BatchItemError:
+                batched = None
+            if batched is not None:
+                return self._use_response(batched, prompt, cache_key)
+
+        with span("analysis.render"):
+            prompt_value = self.analysis_prompt.invoke({"prompt": prompt})
+        tokens = estimate_tokens(prompt_value.to_string())
+        with span("analysis.llm"):
+            response = await self.guard.acall(lambda: self.llm.ainvoke(prompt_value), tokens=tokens)
+        return self._handle_response(response, prompt, tokens, cache_key)
+
+    def _handle_response(
+        self, response: Any, prompt: str, tokens: int, cache_key: Optional[str]
+    ) -> Tuple[Dict[str, Any], bool]:
+        usage = getattr(response, "usage_metadata", None) or {}
+        record_tokens(
+            "analysis",
+            usage.get("input_tokens", tokens),
+            usage.get("output_tokens", estimate_tokens(response.content)),
+        )
+        logger.debug("Analysis response for %r: %s", prompt[:80], response.content)
+        return self._use_response(response.content, prompt, cache_key)
+
+    def _use_response(self, content: str, prompt: str, cache_key: Optional[str]) -> Tuple[Dict[str, Any], bool]:
+        with span("analysis.parse"):
+            analysis = self._parse_analysis(content, prompt)
+        parsed = not self._is_fallback(analysis)
+        # An unparseable response is not cached, so the next call asks the model again
+        if cache_key and parsed:
+            self.cache.set(cache_key, content)
+        return analysis, parsed
+
+    def _chunks(self, prompt: str) -> Optional[List[str]]:
+        """Chunks of a prompt too long to analyze in one call, or None"""
+        if not self.chunk_tokens or estimate_tokens(prompt) <= self.chunk_tokens:
+            return None
+        chunks = split_prompt(prompt, self.chunk_tokens)
+        return chunks if len(chunks) > 1 else None
+
+    def _merge_chunks(self, prompt: str, chunks: List[str], analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reduce step of chunked analysis; chunks whose analysis failed are left out"""
+        analyzed = [(chunk, analysis) for chunk, analysis in zip(chunks, analyses) if not self._is_fallback(analysis)]
+        if not analyzed:
+            return analyses[0]
+        self.path_counts["chunked"] += 1
+        analysis = merge_analyses([a for _, a in analyzed], [estimate_tokens(chunk) for chunk, _ in analyzed])
+        if len(analyzed) == len(chunks):
+            self._remember_analysis(prompt, analysis)
+        return analysis
+
+    def _fast_analysis(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Local heuristic answer when fast analysis is on and confident enough"""
+        if not self.fast_analysis:
+            return None
+        analysis, confidence = self.heuristic_scorer.score(prompt)
+        if confidence < self.fast_analysis_threshold:
+            return None
+        self.path_counts["fast"] += 1
+        return analysis
+
+    def _similar_analysis(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """Analysis of a near-duplicate earlier prompt, when the semantic cache is on"""
+        if self.semantic_cache is None:
+            return None
+        match = self.semantic_cache.lookup(prompt)
+        if match is None:
+            return None
+        self.path_counts["semantic_hit"] += 1
+        return match[0]
+
+    def _remember_analysis(self, prompt: str, analysis: Dict[str, Any]) -> None:
+        if self.semantic_cache is not None:
+            self.semantic_cache.add(prompt, analysis)
+
+    def _degraded_analysis(self, prompt: str) -> Dict[str, Any]:
+        """Local heuristic analysis while the provider circuit is open"""
+        self.path_counts["degraded"] += 1
+        return self.heuristic_scorer.score(prompt)[0]
+
+    @staticmethod
+    def _is_fallback(analysis: Dict[str, Any]) -> bool:
+        # Fallbacks describe a failed call, not the prompt; never reuse them
+        return any(elem.startswith("Parse error:") for elem in analysis.get("missing_elements", []))
+
+    def _cached_structured(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        cached = self.cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            self.path_counts["cache_hit"] += 1
+        return cached
+
+    def _structured_analysis(self, result: Optional[PromptAnalysis], cache_key: Optional[str]) -> Dict[str, Any]:
+        """Validated analysis from the structured-output path"""
+        if result is None:
+            raise ValueError("Model returned no structured analysis")
+        analysis = result.model_dump()
+        if cache_key:
+            self.cache.set(cache_key, analysis)
+        self.path_counts["structured"] += 1
+        return analysis
+
+    def _flight_key(self, prompt: str) -> str:
+        """Same normalization as the response cache, whether or not caching is on"""
+        return ResponseCache.make_key(self.analysis_prompt.template, self.llm, {"prompt": prompt})
+
+    def _cache_key(self, prompt: str, template: PromptTemplate = None) -> Optional[str]:
+        """Content-addressed key for the analysis response, if caching is on"""
+        if self.cache is None:
+            return None
+        template = template or self.analysis_prompt
+        return ResponseCache.make_key(template.template, self.llm, {"prompt": prompt})
+
     def _parse_analysis(self, response: str, original_prompt: str) -> Dict[str, Any]:
         """Parse and validate LLM's analysis response"""
         try:
-            # Extract JSON-like content
-            json_match = re.search(r"\{.*\}", response, re.DOTALL)
-            if not json_match:
+            fields = _extract_fields(response)
+            if fields is None:
                 return self._fallback_analysis(
                     original_prompt, "No structured response"
                 )
 
-            parsed_response = json_match.group(0)
-
             # Validate and extract key components
             analysis = {
-                "task_type": self._extract_task_type(parsed_response, original_prompt),
-                "complexity": self._extract_complexity(parsed_response),
-                "missing_elements": self._extract_missing_elements(parsed_response),
-                "context_score": self._extract_score(parsed_response, "context"),
-                "clarity_score": self._extract_score(parsed_response, "clarity"),
+                "task_type": self._normalize_task_type(fields.get("task_type"), original_prompt),
+                "complexity": self._normalize_complexity(fields.get("complexity")),
+                "missing_elements": self._normalize_missing_elements(fields.get("missing_elements")),
+                "context_score": self._normalize_score(fields.get("context_score")),
+                "clarity_score": self._normalize_score(fields.get("clarity_score")),
             }
+            self.path_counts["parsed"] += 1
             return analysis
 
         except Exception as e:
             return self._fallback_analysis(original_prompt, str(e))
 
-    def _extract_task_type(self, response: str, prompt: str) -> str:
-        """Extract task type with fallback mechanism"""
-        task_types = ["code", "writing", "analysis", "general"]
+    def _normalize_task_type(self, value: Any, prompt: str) -> str:
+        """Map the reported task type onto a known one, with heuristic fallback"""
+        match = TASK_TYPE_PATTERN.search(value) if isinstance(value, str) else None
+        if match:
+            return TASK_TYPE_ALIASES.get(match.group(1).lower(), match.group(1).lower())
+        return self._detect_task_type(prompt)
 
-        # Try extracting from response
-        for task in task_types:
-            if task.lower() in response.lower():
-                return task
+    @staticmethod
+    def _normalize_complexity(value: Any) -> str:
+        match = COMPLEXITY_PATTERN.search(value) if isinstance(value, str) else None
+        return match.group(1).capitalize() if match else "Medium"
 
-        # Fallback to heuristic detection
-        return self._detect_task_type(prompt)
+    @staticmethod
+    def _normalize_missing_elements(value: Any) -> List[str]:
+        if isinstance(value, str):
+            value = QUOTED_PATTERN.findall(value) if value.lstrip().startswith("[") else [value]
+        if not isinstance(value, list):
+            return ["Insufficient context details"]
+        return [str(elem).strip() for elem in value if str(elem).strip()]
 
-    def _extract_complexity(self, response: str) -> str:
-        """Extract complexity level"""
-        complexities = ["Low", "Medium", "High"]
-        for complexity in complexities:
-            if complexity.lower() in response.lower():
-                return complexity
-        return "Medium"
-
-    def _extract_missing_elements(self, response: str) -> List[str]:
-        """Extract missing elements with robust parsing"""
-        missing_patterns = [
-            r'"missing_elements":\s*\[(.*?)\]',
-            r"missing\s*elements?:\s*\[(.*?)\]",
-        ]
-
-        for pattern in missing_patterns:
-            match = re.search(pattern, response, re.IGNORECASE | re.DOTALL)
-            if match:
-                # Clean and split elements
-                elements = re.findall(r'"([^"]*)"', match.group(1))
-                return [elem.strip() for elem in elements if elem.strip()]
-
-        return ["Insufficient context details"]
-
-    def _extract_score(self, response: str, score_type: str) -> float:
-        """Extract numeric score with error handling"""
+    @staticmethod
+    def _normalize_score(value: Any) -> float:
         try:
-            score_pattern = f'"{score_type}_score":\s*(\d+\.?\d*)'
-            match = re.search(score_pattern, response)
-            return float(match.group(1)) if match else 0.5
-        except Exception:
+            return float(value)
+        except (TypeError, ValueError):
             return 0.5
 
     def _fallback_analysis(self, prompt: str, error: str = "") -> Dict[str, Any]:
         """Robust fallback analysis method"""
+        self.path_counts["fallback"] += 1
         return {
             "task_type": self._detect_task_type(prompt),
             "complexity": "Medium",
@@ -102,25 +382,47 @@ class PromptAnalyzer:
 
     def _detect_task_type(self, prompt: str) -> str:
         """Detect task type using comprehensive heuristics"""
-        prompt_lower = prompt.lower()
-        task_mappings = {
-            "code": ["code", "algorithm", "function", "implement", "programming"],
-            "writing": ["write", "essay", "article", "story", "draft", "blog"],
-            "analysis": [
-                "analyze",
-                "research",
-                "data",
-                "study",
-                "investigate",
-                "examine",
-            ],
-        }
+        return HeuristicScorer.detect_task_type(prompt)
+
+
+def _extract_fields(response: str) -> Optional[Dict[str, Any]]:
+    """
+    Pull the analysis fields out of an LLM response in a single pass:
+    a fenced ```json block, else the first JSON object in the text, decoded
+    strictly; malformed JSON falls back to one regex scan of the braces.
+    Returns None when the response has no structured content at all.
+    """
+    fenced = FENCED_JSON_PATTERN.search(response)
+    if fenced:
+        candidate, start = fenced.group(1), 0
+    else:
+        start, end = response.find("{"), response.rfind("}")
+        if start == -1 or end < start:
+            return None
+        candidate = response[:end + 1]
+
+    try:
+        parsed, _ = JSON_DECODER.raw_decode(candidate, start)
+        if isinstance(parsed, dict):
+            return {_field_name(name): value for name, value in parsed.items()}
+    except ValueError:
+        pass
+
+    fields = {}
+    for match in FIELD_PATTERN.finditer(candidate, start):
+        name = _field_name(match.group(1))
+        if name in fields:
+            continue
+        value = match.group(2)
+        if value.startswith('"'):
+            value = value[1:-1]
+        fields[name] = value
+    return fields
 
-        for task, keywords in task_mappings.items():
-            if any(kw in prompt_lower for kw in keywords):
-                return task
 
-        return "general"
+def _field_name(name: str) -> str:
+    name = name.strip().lower()
+    return FIELD_NAMES.get(name, name.replace(" ", "_"))
 
 
 # Example usage
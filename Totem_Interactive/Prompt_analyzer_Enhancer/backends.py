@@ -0,0 +1,375 @@
+# backends.py
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+import asyncio
+import math
+import threading
+import time
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from Prompt_analyzer_Enhancer.rate_limit import TokenBucketLimiter, estimate_tokens
+from Prompt_analyzer_Enhancer.resilience import is_retryable_error
+
+# Each step down a route's preference list handicaps a backend's score by this much
+PREFERENCE_STEP = 0.5
+# Errors cost this many multiples of a backend's latency
+ERROR_PENALTY = 10.0
+# Latency samples needed before a backend's p95 is trusted for hedging
+MIN_HEDGE_SAMPLES = 20
+
+
+class BackendStats:
+    """Latency and error EWMAs plus a window of recent latencies for one backend"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200, error_half_life: float = 60.0):
+        self.alpha = alpha
+        self.error_half_life = error_half_life
+        self.latency_ewma = None
+        self.error_ewma = 0.0
+        self.recent = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.last_error_at = 0.0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.calls += 1
+        if ok:
+            self.recent.append(latency)
+            self.latency_ewma = latency if self.latency_ewma is None else (
+                self.alpha * latency + (1 - self.alpha) * self.latency_ewma
+            )
+        else:
+            self.errors += 1
+            self.last_error_at = time.monotonic()
+        self.error_ewma = self.alpha * (0.0 if ok else 1.0) + (1 - self.alpha) * self.current_error()
+
+    def current_error(self) -> float:
+        # Decays while a backend gets no traffic so it is eventually retried
+        idle = time.monotonic() - self.last_error_at
+        return self.error_ewma * 0.5 ** (idle / self.error_half_life) if self.last_error_at else self.error_ewma
+
+    def score(self) -> float:
+        """Expected cost of a call; unseen backends score 0 so they get sampled"""
+        if self.latency_ewma is None:
+            return 0.0 if not self.errors else ERROR_PENALTY * self.current_error()
+        return self.latency_ewma * (1 + ERROR_PENALTY * self.current_error())
+
+    def p95(self) -> Optional[float]:
+        if len(self.recent) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 2) if self.latency_ewma is not None else None,
+            "error_ewma": round(self.current_error(), 4),
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+        }
+
+
+class BackendRouter:
+    """
+    Named chat-model backends and per-stage routes to them.
+
+    A route is an ordered preference list of backend names, looked up from
+    most to least specific: "stage/task_type/complexity", "stage/task_type",
+    "stage/*/complexity", "stage", "default". Each call goes to the backend
+    with the lowest latency/error score after a preference handicap; with
+    hedging, a call still running past that backend's p95 is raced
+    against the next-best backend and the first answer wins. A call that
+    fails with a retryable error is sent once more to the next-best
+    backend. Hedges and failovers are extra provider calls, so with a
+    limiter they only go out when its budget has room right now.
+    """
+
+    def __init__(
+        self,
+        backends: Dict[str, BaseChatModel],
+        routes: Dict[str, List[str]] = None,
+        hedge: bool = True,
+        hedge_workers: int = 8,
+        limiter: TokenBucketLimiter = None,
+    ):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        self.backends = backends
+        self.routes = dict(routes or {})
+        self.routes.setdefault("default", [next(iter(backends))])
+        unknown = {name for names in self.routes.values() for name in names} - set(backends)
+        if unknown:
+            raise ValueError(f"Routes reference unknown backends: {sorted(unknown)}")
+        self.hedge = hedge
+        self.limiter = limiter
+        self.stats = {name: BackendStats() for name in backends}
+        self._lock = threading.Lock()
+        self._models = {}
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="hedge") if hedge else None
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_throttled = 0
+        self.failovers = 0
+
+    def model(self, stage: str, task_type: str = None, complexity: str = None) -> "RoutedChatModel":
+        """Chat model bound to the most specific route for a stage and tier"""
+        route = self.resolve(stage, task_type, complexity)
+        model = self._models.get(route)
+        if model is None:
+            with self._lock:
+                model = self._models.setdefault(route, RoutedChatModel(router=self, route=route, **self._identity(route)))
+        return model
+
+    def resolve(self, stage: str, task_type: str = None, complexity: str = None) -> str:
+        for key in (
+            f"{stage}/{task_type}/{complexity}",
+            f"{stage}/{task_type}",
+            f"{stage}/*/{complexity}",
+            stage,
+        ):
+            if key in self.routes:
+                return key
+        return "default"
+
+    def rank(self, route: str) -> List[str]:
+        """The route's backends, best first"""
+        names = self.routes[route]
+        with self._lock:
+            scores = {
+                name: self.stats[name].score() * (1 + PREFERENCE_STEP * position)
+                for position, name in enumerate(names)
+            }
+        return sorted(names, key=lambda name: scores[name])
+
+    def generate(self, route: str, messages: List[BaseMessage], **kwargs: Any) -> ChatResult:
+        order = self.rank(route)
+        hedge_after = self._hedge_after(order)
+        raced = False
+        try:
+            if hedge_after is None:
+                return self._call(order[0], messages, kwargs)
+            primary = self._executor.submit(self._call, order[0], messages, kwargs)
+            done, _ = wait([primary], timeout=hedge_after)
+            if not done and self._spare_budget(messages, hedge=True):
+                raced = True
+                return self._race(primary, order[1], messages, kwargs)
+            return primary.result()
+        except Exception as e:
+            # After a lost race the next backend has already failed this call
+            if raced or not self._should_fail_over(order, e) or not self._spare_budget(messages):
+                raise
+        self._count("failovers")
+        return self._call(order[1], messages, kwargs)
+
+    async def agenerate(self, route: str, messages: List[BaseMessage], **kwargs: Any) -> ChatResult:
+        order = self.rank(route)
+        hedge_after = self._hedge_after(order)
+        primary, raced = None, False
+        try:
+            if hedge_after is None:
+                return await self._acall(order[0], messages, kwargs)
+            primary = asyncio.ensure_future(self._acall(order[0], messages, kwargs))
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if not done and await self._aspare_budget(messages, hedge=True):
+                raced = True
+                return await self._arace(primary, order[1], messages, kwargs)
+            return await primary
+        except Exception as e:
+            if raced or not self._should_fail_over(order, e) or not await self._aspare_budget(messages):
+                raise
+        finally:
+            # Also runs when the caller's deadline cancels us while waiting on the primary
+            if primary is not None:
+                primary.cancel()
+        self._count("failovers")
+        return await self._acall(order[1], messages, kwargs)
+
+    def stream(self, route: str, messages: List[BaseMessage], **kwargs: Any) -> Iterator[BaseMessage]:
+        """Streams go to the best backend without hedging; tokens cannot be raced"""
+        name = self.rank(route)[0]
+        started = time.perf_counter()
+        try:
+            yield from self.backends[name].stream(messages, **kwargs)
+        except Exception:
+            self._record(name, time.perf_counter() - started, False)
+            raise
+        self._record(name, time.perf_counter() - started, True)
+
+    async def astream(self, route: str, messages: List[BaseMessage], **kwargs: Any) -> AsyncIterator[BaseMessage]:
+        name = self.rank(route)[0]
+        started = time.perf_counter()
+        try:
+            async for chunk in self.backends[name].astream(messages, **kwargs):
+                yield chunk
+        except Exception:
+            self._record(name, time.perf_counter() - started, False)
+            raise
+        self._record(name, time.perf_counter() - started, True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            backends = {name: stats.snapshot() for name, stats in self.stats.items()}
+            counts = {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedges_throttled": self.hedges_throttled,
+                "failovers": self.failovers,
+            }
+        return {"backends": backends, "routes": {route: self.rank(route) for route in self.routes}, **counts}
+
+    def _identity(self, route: str) -> Dict[str, Any]:
+        """
+        Model name and temperature a route's facade reports to the response
+        cache; backends on one route that differ in temperature each carry
+        their own in the name.
+        """
+        names = self.routes[route]
+        temperatures = [getattr(self.backends[name], "temperature", None) for name in names]
+        if len(set(temperatures)) == 1:
+            return {"model": "|".join(names), "temperature": temperatures[0]}
+        return {"model": "|".join(f"{name}@{t}" for name, t in zip(names, temperatures)), "temperature": None}
+
+    def _hedge_after(self, order: List[str]) -> Optional[float]:
+        if not self.hedge or len(order) < 2:
+            return None
+        with self._lock:
+            return self.stats[order[0]].p95()
+
+    def _race(self, primary: Any, name: str, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> ChatResult:
+        """First successful answer of a running primary call and a hedge to another backend"""
+        self._count("hedges")
+        # A thread cannot be cancelled; the loser finishes in the background and still updates its stats
+        pending = {primary, self._executor.submit(self._call, name, messages, kwargs)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def _arace(
+        self, primary: "asyncio.Future", name: str, messages: List[BaseMessage], kwargs: Dict[str, Any]
+    ) -> ChatResult:
+        self._count("hedges")
+        tasks = {primary, asyncio.ensure_future(self._acall(name, messages, kwargs))}
+        try:
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count("hedge_wins")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _should_fail_over(order: List[str], error: Exception) -> bool:
+        # A rejected request would be rejected by the next backend too
+        return len(order) > 1 and is_retryable_error(error)
+
+    def _spare_budget(self, messages: List[BaseMessage], hedge: bool = False) -> bool:
+        """Charge an extra call to the limiter if it fits now; never waits"""
+        if self.limiter is None or self.limiter.try_acquire(_message_tokens(messages)):
+            return True
+        if hedge:
+            self._count("hedges_throttled")
+        return False
+
+    async def _aspare_budget(self, messages: List[BaseMessage], hedge: bool = False) -> bool:
+        if self.limiter is None or await self.limiter.atry_acquire(_message_tokens(messages)):
+            return True
+        if hedge:
+            self._count("hedges_throttled")
+        return False
+
+    def _call(self, name: str, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> ChatResult:
+        started = time.perf_counter()
+        try:
+            message = self.backends[name].invoke(messages, **kwargs)
+        except Exception:
+            self._record(name, time.perf_counter() - started, False)
+            raise
+        self._record(name, time.perf_counter() - started, True)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _acall(self, name: str, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> ChatResult:
+        started = time.perf_counter()
+        try:
+            message = await self.backends[name].ainvoke(messages, **kwargs)
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the backend's health
+            raise
+        except Exception:
+            self._record(name, time.perf_counter() - started, False)
+            raise
+        self._record(name, time.perf_counter() - started, True)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _record(self, name: str, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.stats[name].record(latency, ok)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+class RoutedChatModel(BaseChatModel):
+    """Chat model facade for one route; chains use it like any other model"""
+
+    router: Any
+    route: str
+    # Read by ResponseCache.make_key like a real client's fields; set from the route's backends
+    model: str
+    temperature: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "routed"
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        return self.router.generate(self.route, messages, **_call_options(stop, kwargs))
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        return await self.router.agenerate(self.route, messages, **_call_options(stop, kwargs))
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        for chunk in self.router.stream(self.route, messages, **_call_options(stop, kwargs)):
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self.router.astream(self.route, messages, **_call_options(stop, kwargs)):
+            yield ChatGenerationChunk(message=chunk)
+
+    def with_structured_output(self, schema: Any, **kwargs: Any) -> Any:
+        # Tool-calling output is provider specific, so it binds to the route's preferred backend
+        return self.router.backends[self.router.routes[self.route][0]].with_structured_output(schema, **kwargs)
+
+
+def _message_tokens(messages: List[BaseMessage]) -> int:
+    return estimate_tokens(*(str(message.content) for message in messages))
+
+
+def _call_options(stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {**kwargs, "stop": stop} if stop else kwargs
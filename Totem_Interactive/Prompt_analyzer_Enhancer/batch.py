@@ -0,0 +1,219 @@
+# batch.py
+from typing import IO, TYPE_CHECKING, Dict, Any, AsyncIterable, AsyncIterator, Iterable, Optional, Union
+import asyncio
+import json
+import random
+import time
+from Prompt_analyzer_Enhancer.chunking import PromptTooLargeError, check_prompt_size
+from Prompt_analyzer_Enhancer.resilience import is_rate_limit_error
+from Prompt_analyzer_Enhancer.rate_limit import BATCH, request_priority
+
+if TYPE_CHECKING:
+    from Prompt_analyzer_Enhancer.pipeline import PromptPipeline
+
+PromptItem = Union[str, Dict[str, Any]]
+
+
+class InvalidItem:
+    """An input item that cannot be processed; reported as that item's error row"""
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+async def process_batch(
+    prompts: Union[Iterable[PromptItem], AsyncIterable[PromptItem]],
+    pipeline: "PromptPipeline",
+    concurrency: int = 8,
+    max_retries: int = 3,
+    base_delay: float = 1.0,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    max_prompt_tokens: int = 0,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run prompts through the pipeline with bounded concurrency and yield each
+    result as soon as it finishes (completion order, not input order).
+
+    Prompts may be plain strings or {"id": ..., "prompt": ...} dicts, from a
+    list or an async stream; input is only read as fast as workers free up.
+    A rate-limit error pauses every worker, not just the one that hit it.
+    Prompts over max_prompt_tokens, undecodable lines and dicts without a
+    "prompt" string fail without being sent. Workers wait while the caller
+    is slow to take finished results.
+    """
+    pending = asyncio.Queue(maxsize=concurrency * 2)
+    results = asyncio.Queue(maxsize=concurrency * 2)
+    throttle = _Throttle()
+    done = object()
+
+    async def produce():
+        index = 0
+        try:
+            async for item in _aiter(prompts):
+                await pending.put((index, item))
+                index += 1
+        except Exception as e:
+            # Malformed input ends the batch but still reports what finished
+            await results.put({"id": None, "status": "error", "error": f"Invalid batch input: {e}"})
+        for _ in range(concurrency):
+            await pending.put(done)
+
+    async def work():
+        # Batch calls queue behind interactive ones at the rate limiter
+        with request_priority(BATCH):
+            while True:
+                job = await pending.get()
+                if job is done:
+                    await results.put(done)
+                    return
+                index, item = job
+                await results.put(
+                    await _process_item(
+                        index, item, pipeline, max_retries, base_delay, throttle, semaphore, max_prompt_tokens
+                    )
+                )
+
+    tasks = [asyncio.create_task(produce())]
+    tasks += [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        finished_workers = 0
+        while finished_workers < concurrency:
+            result = await results.get()
+            if result is done:
+                finished_workers += 1
+                continue
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def iter_jsonl(lines: Iterable[Union[str, bytes]]) -> Iterable[Union[PromptItem, InvalidItem]]:
+    """
+    Lazily decode prompt items from the lines of a JSONL file; a malformed
+    line becomes an InvalidItem and the lines after it are still read.
+    """
+    for number, line in enumerate(lines, start=1):
+        item = _jsonl_item(number, line)
+        if item is not None:
+            yield item
+
+
+async def aiter_jsonl(
+    file: IO, chunk_bytes: int = 64 * 1024
+) -> AsyncIterator[Union[PromptItem, InvalidItem]]:
+    """
+    iter_jsonl for a file object, read in worker threads about chunk_bytes
+    of lines at a time so a spooled-to-disk upload never blocks the event loop.
+    """
+    number = 0
+    while True:
+        lines = await asyncio.to_thread(file.readlines, chunk_bytes)
+        if not lines:
+            return
+        for line in lines:
+            number += 1
+            item = _jsonl_item(number, line)
+            if item is not None:
+                yield item
+
+
+async def _process_item(
+    index: int,
+    item: Union[PromptItem, InvalidItem],
+    pipeline: "PromptPipeline",
+    max_retries: int,
+    base_delay: float,
+    throttle: "_Throttle",
+    semaphore: Optional[asyncio.Semaphore],
+    max_prompt_tokens: int,
+) -> Dict[str, Any]:
+    item_id = item.get("id", index) if isinstance(item, dict) else index
+    if isinstance(item, dict) and not isinstance(item.get("prompt"), str):
+        item = InvalidItem('Item has no "prompt" string')
+    if isinstance(item, InvalidItem):
+        return {"id": item_id, "status": "error", "attempts": 0, "error": item.error, "elapsed_ms": 0.0}
+    prompt = item["prompt"] if isinstance(item, dict) else item
+    started = time.perf_counter()
+    try:
+        check_prompt_size(prompt, max_prompt_tokens)
+    except PromptTooLargeError as e:
+        return {"id": item_id, "status": "error", "attempts": 0, "error": str(e), "elapsed_ms": 0.0}
+
+    for attempt in range(1, max_retries + 2):
+        await throttle.wait()
+        try:
+            if semaphore is None:
+                output = await pipeline.process_async(prompt, raise_errors=True)
+            else:
+                async with semaphore:
+                    output = await pipeline.process_async(prompt, raise_errors=True)
+            return {"id": item_id, "status": "ok", "attempts": attempt, **output}
+        except Exception as e:
+            if attempt > max_retries:
+                return {
+                    "id": item_id,
+                    "status": "error",
+                    "attempts": attempt,
+                    "error": str(e),
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+                }
+            # Exponential backoff with full jitter; rate limits pause every worker
+            delay = random.uniform(0, base_delay * 2 ** (attempt - 1))
+            if is_rate_limit_error(e):
+                throttle.pause(base_delay * 2 ** attempt)
+            await asyncio.sleep(delay)
+
+
+class _Throttle:
+    """Shared cooldown so one 429 backs off the whole batch"""
+
+    def __init__(self):
+        self.resume_at = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    async def wait(self) -> None:
+        delay = self.resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _aiter(items: Union[Iterable[PromptItem], AsyncIterable[PromptItem]]) -> AsyncIterator[PromptItem]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+def _jsonl_item(number: int, line: Union[str, bytes]) -> Optional[Union[PromptItem, InvalidItem]]:
+    try:
+        return _decode_line(line)
+    except ValueError as e:
+        return InvalidItem(f"Invalid JSONL on line {number}: {e}")
+
+
+def _decode_line(line: Union[str, bytes]) -> Optional[PromptItem]:
+    line = line.strip()
+    if not line:
+        return None
+    item = json.loads(line)
+    if not isinstance(item, (str, dict)):
+        raise ValueError(f"Unsupported JSONL item: {line!r}")
+    return item
+
+
+# Example usage
+# async def main():
+#     config = Config()
+#     pipeline = PromptPipeline.from_config(config)
+#
+#     with open("prompts.jsonl") as prompts, open("results.jsonl", "w") as out:
+#         async for result in process_batch(iter_jsonl(prompts), pipeline, concurrency=16):
+#             out.write(json.dumps(result) + "\n")
+#
+# if __name__ == "__main__":
+#     asyncio.run(main())
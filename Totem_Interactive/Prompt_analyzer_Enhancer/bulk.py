@@ -0,0 +1,140 @@
+# bulk.py
+#
+# Columnar versions of LLMSelector.select_model and the enhancer's
+# improvement_metrics for offline routing studies over stored analyses.
+# Inputs are equal-length columns: a dict of lists/arrays or a DataFrame.
+# Every output matches the per-row path exactly.
+from typing import Any, Dict, List, Mapping, Optional
+import numpy as np
+from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
+
+TASK_TYPES = list(LLMSelector.LLM_MODELS)
+COMPLEXITIES = ["Low", "Medium", "High"]
+
+# reasoning_code indexes this table: task index * len(COMPLEXITIES) + complexity index
+REASONING = [LLMSelector._generate_reasoning(task, level) for task in TASK_TYPES for level in COMPLEXITIES]
+
+# Within this distance of a rounding midpoint, x * 100 may have landed on the wrong side
+_MIDPOINT_EPSILON = 1e-6
+
+
+def encode_tiers(task_type: Any, complexity: Any) -> Dict[str, np.ndarray]:
+    """
+    Integer codes for the normalized task type and complexity, using the
+    same defaults as select_model: unknown or missing task types map to
+    "general", unknown or missing complexities to "Medium".
+    """
+    return {
+        "task_code": _encode(task_type, {name: index for index, name in enumerate(TASK_TYPES)},
+                             TASK_TYPES.index("general"), str.lower),
+        "complexity_code": _encode(complexity, {name: index for index, name in enumerate(COMPLEXITIES)},
+                                   COMPLEXITIES.index("Medium")),
+    }
+
+
+def select_models_bulk(
+    task_type: Any,
+    complexity: Any,
+    selector: Optional[LLMSelector] = None,
+    missing_elements: Any = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Recommended model and reasoning code per row.
+
+    Policies whose choice depends only on the tier (the "score" policy) are
+    resolved once per tier and gathered with a table lookup. Other policies
+    are called row by row so the outcome, and for round_robin the shared
+    rotation state, is what the same sequence of select_model calls gives.
+    """
+    selector = selector or LLMSelector()
+    codes = encode_tiers(task_type, complexity)
+    tier = codes["task_code"] * len(COMPLEXITIES) + codes["complexity_code"]
+    tiers = [(task, level) for task in TASK_TYPES for level in COMPLEXITIES]
+
+    if selector.policy.per_tier:
+        table = np.array(
+            [selector.policy.choose(selector.LLM_MODELS[task][level], {}, f"{task}/{level}")[0]
+             for task, level in tiers],
+            dtype=object,
+        )
+        models = table[tier]
+    else:
+        # hash reads the raw fields, so rebuild each row's analysis from the original columns
+        raw_tasks, raw_levels = _as_list(task_type), _as_list(complexity)
+        missing = _as_list(missing_elements) if missing_elements is not None else [None] * len(raw_tasks)
+        models = np.empty(len(tier), dtype=object)
+        for row, code in enumerate(tier.tolist()):
+            task, level = tiers[code]
+            analysis = {"task_type": raw_tasks[row], "complexity": raw_levels[row]}
+            if missing[row] is not None:
+                analysis["missing_elements"] = missing[row]
+            models[row] = selector.policy.choose(selector.LLM_MODELS[task][level], analysis, f"{task}/{level}")[0]
+
+    return {"model": models, "reasoning_code": tier}
+
+
+def improvement_metrics_bulk(clarity_score: Any, context_score: Any) -> Dict[str, np.ndarray]:
+    """PromptEnhancer._build_result's improvement_metrics; NaN means the score is missing"""
+    clarity = _scores(clarity_score, 0.5)
+    context = _scores(context_score, 0.4)
+    return {
+        "clarity": _round2(np.minimum(clarity + 0.4, 1.0)),
+        "context": _round2(np.minimum(context + 0.5, 1.0)),
+        "specificity": np.full(len(clarity), round(0.6, 2)),
+    }
+
+
+def score_analyses(columns: Mapping[str, Any], selector: Optional[LLMSelector] = None) -> Dict[str, np.ndarray]:
+    """
+    Selection plus improvement metrics for columns named like the analysis
+    fields (task_type, complexity, clarity_score, context_score and,
+    optionally, missing_elements). Missing columns take the scalar defaults.
+    """
+    length = len(columns[next(iter(columns))])
+    result = select_models_bulk(
+        _column(columns, "task_type", "general", length),
+        _column(columns, "complexity", "Medium", length),
+        selector,
+        columns["missing_elements"] if "missing_elements" in columns else None,
+    )
+    result.update(improvement_metrics_bulk(
+        _column(columns, "clarity_score", np.nan, length),
+        _column(columns, "context_score", np.nan, length),
+    ))
+    return result
+
+
+def _encode(values: Any, codes: Dict[str, int], default: int, normalize=None) -> np.ndarray:
+    # Factorize first so the Python-level normalization runs once per distinct value
+    uniques, inverse = np.unique(np.asarray(_as_list(values), dtype=object).astype(str), return_inverse=True)
+    mapped = np.array(
+        [codes.get(normalize(value) if normalize else value, default) for value in uniques.tolist()],
+        dtype=np.int64,
+    )
+    return mapped[inverse.reshape(-1)] if len(uniques) else np.zeros(0, dtype=np.int64)
+
+
+def _scores(values: Any, default: float) -> np.ndarray:
+    scores = np.array(_as_list(values), dtype=np.float64)
+    scores[np.isnan(scores)] = default
+    return scores
+
+
+def _round2(values: np.ndarray) -> np.ndarray:
+    """round(x, 2) for every element, bit for bit"""
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    # Python's round decides midpoints on the exact decimal value; defer to it there
+    fraction = scaled - np.floor(scaled)
+    for index in np.flatnonzero(np.abs(fraction - 0.5) < _MIDPOINT_EPSILON).tolist():
+        rounded[index] = round(float(values[index]), 2)
+    return rounded
+
+
+def _column(columns: Mapping[str, Any], name: str, default: Any, length: int) -> Any:
+    return columns[name] if name in columns else [default] * length
+
+
+def _as_list(values: Any) -> List[Any]:
+    # DataFrame columns and arrays both expose tolist(); NaN stays NaN, None stays None
+    return values.tolist() if hasattr(values, "tolist") else list(values)
@@ -0,0 +1,131 @@
+# cache.py
+from typing import Dict, Any, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Content-addressed cache for raw LLM responses.
+
+    Entries live in an in-memory LRU tier bounded by entry count and TTL,
+    with an optional SQLite tier that survives restarts.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, db_path: str = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+        self._db = self._open_db(db_path) if db_path else None
+
+    @staticmethod
+    def make_key(template: str, llm: Any, inputs: Dict[str, Any]) -> str:
+        """Hash template text, model name, temperature and normalized inputs"""
+        payload = {
+            "template": template,
+            "model": getattr(llm, "model", type(llm).__name__),
+            "temperature": getattr(llm, "temperature", None),
+            "inputs": {name: _normalize(value) for name, value in sorted(inputs.items())},
+        }
+        encoded = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    self._stats["memory_hits"] += 1
+                    return json.loads(value)
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._store_in_memory(key, row[0], row[1])
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return json.loads(row[0])
+                if row:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self._stats["expirations"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        encoded = json.dumps(value)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store_in_memory(key, encoded, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, encoded, expires_at),
+                )
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size, for sizing the cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["max_entries"] = self.max_entries
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _store_in_memory(self, key: str, encoded: str, expires_at: float) -> None:
+        self._entries[key] = (expires_at, encoded)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        db.commit()
+        return db
+
+
+def _normalize(value: Any) -> Any:
+    """Collapse whitespace so trivially different inputs share a key"""
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    return value
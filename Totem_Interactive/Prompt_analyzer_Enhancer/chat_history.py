@@ -0,0 +1,94 @@
+# chat_history.py
+from typing import Any, Dict, List, Optional
+from collections import deque
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+Turn = Dict[str, Any]
+
+
+class ChatStore:
+    """
+    SQLite file for chat turns that have left a session's in-memory window,
+    shared by every session of the Streamlit app. Turns older than ttl
+    seconds are dropped when the store opens.
+    """
+
+    def __init__(self, db_path: str, ttl: float = 7 * 86400):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = self._open_db(db_path)
+        self.purge()
+
+    def add(self, session_id: str, seq: int, turn: Turn) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chat_turns (session_id, seq, user, assistant, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, turn["User"], json.dumps(turn["Assistant"]), time.time()),
+            )
+
+    def page(self, session_id: str, offset: int, limit: int) -> List[Turn]:
+        """A session's turns, newest first"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT user, assistant FROM chat_turns WHERE session_id = ? ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (session_id, limit, offset),
+            ).fetchall()
+        return [{"User": user, "Assistant": json.loads(assistant)} for user, assistant in rows]
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM chat_turns WHERE session_id = ?", (session_id,))
+
+    def purge(self) -> int:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM chat_turns WHERE created_at < ?", (time.time() - self.ttl,))
+        return cursor.rowcount
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_turns "
+            "(session_id TEXT NOT NULL, seq INTEGER NOT NULL, user TEXT NOT NULL, assistant TEXT NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (session_id, seq))"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS chat_turns_created_at ON chat_turns (created_at)")
+        return db
+
+
+class ChatHistory:
+    """
+    One session's chat turns: the latest window of them in memory, older
+    ones spilled to a ChatStore and read back a page at a time.
+    """
+
+    def __init__(self, store: ChatStore, window: int = 20, session_id: Optional[str] = None):
+        self.store = store
+        self.window = window
+        self.session_id = session_id or uuid.uuid4().hex
+        self.recent = deque()
+        self.spilled = 0
+
+    def append(self, user: str, assistant: Dict[str, Any]) -> None:
+        self.recent.append({"User": user, "Assistant": assistant})
+        while len(self.recent) > self.window:
+            self.store.add(self.session_id, self.spilled, self.recent.popleft())
+            self.spilled += 1
+
+    def earlier(self, page: int, page_size: int) -> List[Turn]:
+        """Spilled turns, newest first; page 0 holds the most recent of them"""
+        return self.store.page(self.session_id, page * page_size, page_size)
+
+    def clear(self) -> None:
+        self.store.delete(self.session_id)
+        self.recent.clear()
+        self.spilled = 0
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.recent)
@@ -0,0 +1,100 @@
+# chunking.py
+from typing import Any, Dict, List
+from collections import Counter
+import re
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
+
+COMPLEXITY_ORDER = ["Low", "Medium", "High"]
+# A merged analysis lists at most this many missing elements, most reported first
+MAX_MERGED_ELEMENTS = 10
+
+_PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+
+
+class PromptTooLargeError(ValueError):
+    """The prompt is over the configured maximum request size"""
+
+
+def check_prompt_size(prompt: str, max_tokens: int) -> str:
+    """The prompt, if its estimated token count is within max_tokens (0 for no limit)"""
+    if max_tokens > 0:
+        tokens = estimate_tokens(prompt)
+        if tokens > max_tokens:
+            raise PromptTooLargeError(f"Prompt is about {tokens} tokens; the limit is {max_tokens}")
+    return prompt
+
+
+def split_prompt(prompt: str, max_tokens: int) -> List[str]:
+    """
+    Split a prompt into chunks of at most max_tokens estimated tokens,
+    breaking between paragraphs, then lines, then words, and inside words
+    only when a single word is too long. Pieces are packed
+    greedily, so chunks stay close to max_tokens and in prompt order.
+    """
+    pieces = _pieces(prompt, max_tokens, ("\n\n", "\n", " "))
+    chunks, current, current_tokens = [], [], 0
+    for piece, separator in pieces:
+        tokens = estimate_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append("".join(current).strip())
+            current, current_tokens = [], 0
+        current.append(piece + separator)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current).strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def merge_analyses(analyses: List[Dict[str, Any]], weights: List[int]) -> Dict[str, Any]:
+    """
+    Reduce per-chunk analyses to one: the task type covering most of the
+    prompt, the highest complexity, missing elements ordered by how many
+    chunks reported them, and token-weighted mean scores.
+    """
+    task_weights = Counter()
+    for analysis, weight in zip(analyses, weights):
+        task_weights[analysis["task_type"]] += weight
+
+    reported = Counter()
+    spelling = {}
+    for analysis in analyses:
+        for element in dict.fromkeys(analysis["missing_elements"]):
+            key = " ".join(element.lower().split())
+            reported[key] += 1
+            spelling.setdefault(key, element)
+
+    total = sum(weights)
+    return {
+        "task_type": task_weights.most_common(1)[0][0],
+        "complexity": max((a["complexity"] for a in analyses), key=_complexity_rank),
+        "missing_elements": [spelling[key] for key, _ in reported.most_common(MAX_MERGED_ELEMENTS)],
+        "context_score": _weighted_mean([a["context_score"] for a in analyses], weights, total),
+        "clarity_score": _weighted_mean([a["clarity_score"] for a in analyses], weights, total),
+    }
+
+
+def _pieces(text: str, max_tokens: int, separators: tuple) -> List[tuple]:
+    """(piece, separator to restore) pairs, each piece within max_tokens where the text allows"""
+    if estimate_tokens(text) <= max_tokens:
+        return [(text, "")]
+    if not separators:
+        size = max(1, (max_tokens - 1) * 4)
+        return [(text[start:start + size], "") for start in range(0, len(text), size)]
+    separator, rest = separators[0], separators[1:]
+    parts = _PARAGRAPH_PATTERN.split(text) if separator == "\n\n" else text.split(separator)
+    pieces = []
+    for part in parts:
+        if estimate_tokens(part) > max_tokens:
+            pieces.extend(_pieces(part, max_tokens, rest))
+            pieces[-1] = (pieces[-1][0], separator)
+        else:
+            pieces.append((part, separator))
+    return pieces
+
+
+def _complexity_rank(complexity: str) -> int:
+    return COMPLEXITY_ORDER.index(complexity) if complexity in COMPLEXITY_ORDER else 1
+
+
+def _weighted_mean(values: List[float], weights: List[int], total: int) -> float:
+    return round(sum(value * weight for value, weight in zip(values, weights)) / total, 2)
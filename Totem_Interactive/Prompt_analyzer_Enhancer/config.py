@@ -1,21 +1,56 @@
 # config.py
-from typing import Dict, Any
+from typing import TYPE_CHECKING, Dict, Any, Optional
+import json
 import os
+import threading
 from dotenv import load_dotenv
-from langchain_google_genai import (
-    ChatGoogleGenerativeAI,
-    HarmBlockThreshold,
-    HarmCategory,
-)
+from Prompt_analyzer_Enhancer.cache import ResponseCache
+from Prompt_analyzer_Enhancer.resilience import CircuitBreaker, LLMGuard
+from Prompt_analyzer_Enhancer.rate_limit import TokenBucketLimiter
+from Prompt_analyzer_Enhancer.jobs import JobQueue
+
+# LangChain, the provider SDKs and NumPy load on first use, not at import
+if TYPE_CHECKING:
+    from Prompt_analyzer_Enhancer.backends import BackendRouter, RoutedChatModel
+    from Prompt_analyzer_Enhancer.semantic_cache import SemanticCache
 
 # Load environment variables
 load_dotenv()
 
 class Config:
-    def __init__(self, temperature: float = 0.4):
+    def __init__(self, temperature: float = 0.4, max_concurrency: int = None, cache: ResponseCache = None):
         self.api_key = self.load_api_key()
         self.temperature = temperature
-        self.llm = self.initialize_llm()
+        self.max_concurrency = max_concurrency or self.load_max_concurrency()
+        self.cache = cache if cache is not None else self.initialize_cache()
+        self.transport = os.getenv("GOOGLE_API_TRANSPORT") or None
+        self.fast_analysis = os.getenv("FAST_ANALYSIS", "false").lower() in ("1", "true", "yes")
+        self.fast_analysis_threshold = float(os.getenv("FAST_ANALYSIS_THRESHOLD", "0.75"))
+        self.structured_analysis = os.getenv("STRUCTURED_ANALYSIS", "false").lower() in ("1", "true", "yes")
+        self.speculative_enhancement = os.getenv("SPECULATIVE_ENHANCEMENT", "false").lower() in ("1", "true", "yes")
+        self.selection_policy = os.getenv("MODEL_SELECTION_POLICY", "score")
+        self.model_profiles_path = os.getenv("MODEL_PROFILES") or None
+        self.semantic_cache = self.initialize_semantic_cache()
+        self.analysis_batching = self.load_analysis_batching()
+        self.analysis_chunk_tokens = int(os.getenv("ANALYSIS_CHUNK_TOKENS", "4000"))
+        self.analysis_chunk_concurrency = max(1, int(os.getenv("ANALYSIS_CHUNK_CONCURRENCY", "4")))
+        self.guard = self.initialize_guard()
+        self.job_queue = self.initialize_job_queue()
+        # Model clients are built on first use of router or llm
+        self._router = None
+        self._router_lock = threading.Lock()
+
+    @property
+    def router(self) -> "BackendRouter":
+        if self._router is None:
+            with self._router_lock:
+                if self._router is None:
+                    self._router = self.initialize_router()
+        return self._router
+
+    @property
+    def llm(self) -> "RoutedChatModel":
+        return self.router.model("default")
 
     @staticmethod
     def load_api_key() -> str:
@@ -25,13 +60,158 @@ class Config:
             raise ValueError("GOOGLE_API_KEY environment variable is not set")
         return api_key
 
-    def initialize_llm(self):
-        """Initialize Google Generative AI model"""
-        return ChatGoogleGenerativeAI(
-            model="gemini-1.5-pro",
-            google_api_key=self.api_key,
-            temperature=self.temperature,
-            safety_settings={
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-            },
+    @staticmethod
+    def load_max_concurrency() -> int:
+        """Load the per-worker limit on in-flight LLM calls"""
+        return int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "32"))
+
+    @staticmethod
+    def load_max_prompt_tokens() -> int:
+        """Largest prompt, in estimated tokens, the API admits (0 for no limit)"""
+        return int(os.getenv("MAX_PROMPT_TOKENS", "32000"))
+
+    @staticmethod
+    def initialize_cache() -> Optional[ResponseCache]:
+        """Build the response cache from environment settings (size 0 disables it)"""
+        max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+        if max_entries <= 0:
+            return None
+        return ResponseCache(
+            max_entries=max_entries,
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            db_path=os.getenv("RESPONSE_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def initialize_semantic_cache() -> Optional["SemanticCache"]:
+        """Opt-in near-duplicate cache in front of prompt analysis"""
+        if os.getenv("SEMANTIC_CACHE", "false").lower() not in ("1", "true", "yes"):
+            return None
+        from Prompt_analyzer_Enhancer.semantic_cache import SemanticCache
+
+        return SemanticCache(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.6")),
+            max_bytes=int(float(os.getenv("SEMANTIC_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def load_analysis_batching() -> Optional[Dict[str, Any]]:
+        """
+        Window and limits for micro-batching concurrent analysis calls;
+        disabled when ANALYSIS_BATCH_WINDOW_MS is 0.
+        """
+        window_ms = float(os.getenv("ANALYSIS_BATCH_WINDOW_MS", "0"))
+        if window_ms <= 0:
+            return None
+        return {
+            "window": window_ms / 1000,
+            "max_size": int(os.getenv("ANALYSIS_BATCH_SIZE", "16")),
+            "max_tokens": int(os.getenv("ANALYSIS_BATCH_TOKENS", "4000")),
+        }
+
+    @staticmethod
+    def initialize_guard() -> LLMGuard:
+        """Deadline, retry and circuit-breaker policy shared by every LLM call"""
+        return LLMGuard(
+            timeout=float(os.getenv("LLM_TIMEOUT", "30")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+            ),
+            limiter=Config.initialize_rate_limiter(),
+        )
+
+    @staticmethod
+    def initialize_rate_limiter() -> Optional[TokenBucketLimiter]:
+        """
+        Request and token budgets for the shared API key; RATE_LIMIT_PATH
+        shares them across processes. Disabled when both limits are 0.
+        """
+        requests_per_minute = int(os.getenv("RATE_LIMIT_RPM", "0"))
+        tokens_per_minute = int(os.getenv("RATE_LIMIT_TPM", "0"))
+        if requests_per_minute <= 0 and tokens_per_minute <= 0:
+            return None
+        return TokenBucketLimiter(
+            requests_per_minute=requests_per_minute,
+            tokens_per_minute=tokens_per_minute,
+            db_path=os.getenv("RATE_LIMIT_PATH") or None,
+        )
+
+    @staticmethod
+    def initialize_job_queue(db_path: str = None) -> Optional[JobQueue]:
+        """
+        Durable queue behind the /jobs endpoints and the worker processes;
+        disabled unless JOB_QUEUE_PATH names its SQLite file.
+        """
+        db_path = db_path or os.getenv("JOB_QUEUE_PATH")
+        if not db_path:
+            return None
+        return JobQueue(
+            db_path,
+            lease_seconds=float(os.getenv("JOB_LEASE_SECONDS", "60")),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            result_ttl=float(os.getenv("JOB_RESULT_TTL", "86400")),
         )
+
+    def initialize_router(self) -> "BackendRouter":
+        """
+        Backends and per-stage routes. LLM_BACKENDS names a JSON file with
+        "backends", "routes" and "hedge"; without it, analysis runs on
+        ANALYSIS_MODEL (falling back to ENHANCEMENT_MODEL) and everything
+        else on ENHANCEMENT_MODEL.
+        """
+        from Prompt_analyzer_Enhancer.backends import BackendRouter
+
+        path = os.getenv("LLM_BACKENDS")
+        if path:
+            with open(path) as f:
+                spec = json.load(f)
+            backends = {name: self.initialize_llm(**options) for name, options in spec["backends"].items()}
+            return BackendRouter(
+                backends, spec.get("routes"), hedge=spec.get("hedge", True), limiter=self.guard.limiter
+            )
+
+        analysis_model = os.getenv("ANALYSIS_MODEL", "gemini-1.5-flash")
+        enhancement_model = os.getenv("ENHANCEMENT_MODEL", "gemini-1.5-pro")
+        backends = {name: self.initialize_llm(model=name) for name in dict.fromkeys([enhancement_model, analysis_model])}
+        routes = {
+            "default": [enhancement_model],
+            "analysis": list(dict.fromkeys([analysis_model, enhancement_model])),
+        }
+        return BackendRouter(
+            backends,
+            routes,
+            hedge=os.getenv("LLM_HEDGING", "true").lower() in ("1", "true", "yes"),
+            limiter=self.guard.limiter,
+        )
+
+    def initialize_llm(self, provider: str = "google", model: str = "gemini-1.5-pro", **options: Any):
+        """
+        Build one chat-model backend. Google clients keep a persistent,
+        pooled connection (grpc channel, or a pooled HTTP session when
+        GOOGLE_API_TRANSPORT=rest), so share one Config per process.
+        Other providers need their LangChain integration installed.
+        """
+        options.setdefault("temperature", self.temperature)
+        # Retries belong to the guard; one attempt per call at the client level
+        options.setdefault("timeout", self.guard.timeout)
+        options.setdefault("max_retries", 1)
+        if provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI, HarmBlockThreshold, HarmCategory
+            return ChatGoogleGenerativeAI(
+                model=model,
+                google_api_key=self.api_key,
+                transport=self.transport,
+                safety_settings={
+                    HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+                },
+                **options,
+            )
+        if provider == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model=model, **options)
+        if provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
+            return ChatAnthropic(model=model, **options)
+        raise ValueError(f"Unknown LLM provider: {provider}")
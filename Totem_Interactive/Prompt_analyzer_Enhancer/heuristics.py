@@ -0,0 +1,125 @@
+# heuristics.py
+from typing import Dict, Any, List, Tuple
+import re
+
+TASK_KEYWORDS = {
+    "code": ["code", "algorithm", "function", "implement", "programming"],
+    "writing": ["write", "essay", "article", "story", "draft", "blog"],
+    "analysis": ["analyze", "research", "data", "study", "investigate", "examine"],
+}
+
+# Elements a well-specified prompt of each task type usually mentions
+EXPECTED_ELEMENTS = {
+    "code": {
+        "Programming language": ["python", "java", "javascript", "typescript", "c++", "c#", "go", "rust", "sql", "ruby", "language"],
+        "Input data type or format": ["input", "array", "list", "string", "integer", "file", "json", "csv", "dataset"],
+        "Expected output format": ["output", "return", "print", "result", "format"],
+        "Performance or complexity constraints": ["o(n", "complexity", "performance", "efficient", "memory", "fast", "constraint"],
+    },
+    "writing": {
+        "Target audience": ["audience", "reader", "for beginners", "for students", "for experts", "customers"],
+        "Tone or style": ["tone", "style", "formal", "informal", "casual", "persuasive", "friendly"],
+        "Length or word count": ["words", "paragraph", "page", "length", "short", "long"],
+        "Topic focus or key points": ["about", "on the topic", "focus", "cover", "include"],
+    },
+    "analysis": {
+        "Data source or dataset": ["dataset", "data from", "source", "csv", "database", "survey", "report"],
+        "Scope or time period": ["between", "from", "period", "year", "scope", "region"],
+        "Analysis method": ["regression", "statistical", "compare", "trend", "correlation", "method"],
+        "Expected output format": ["table", "chart", "summary", "report", "format", "visualize"],
+    },
+    "general": {
+        "Clear objective": ["goal", "objective", "so that", "in order to", "need", "want"],
+        "Relevant context": ["because", "context", "background", "currently", "given"],
+        "Expected output format": ["list", "table", "steps", "summary", "format", "bullet"],
+    },
+}
+
+# Keywords that often appear outside their task type ("write code", "data structure")
+WEAK_KEYWORDS = {"write", "data"}
+
+VAGUE_TERMS = ["something", "stuff", "things", "etc", "whatever", "somehow", "some kind of"]
+COMPLEXITY_TERMS = ["optimize", "scalable", "distributed", "concurrent", "architecture", "production",
+                    "multiple", "integrate", "end-to-end", "comprehensive", "detailed", "advanced"]
+
+WORD_PATTERN = re.compile(r"[a-z0-9+#']+")
+SENTENCE_PATTERN = re.compile(r"[.!?]+(?:\s|$)")
+
+
+class HeuristicScorer:
+    """
+    Dependency-free prompt analysis from lexical features. Produces the same
+    fields as PromptAnalyzer plus a confidence used to decide whether the
+    LLM is needed at all.
+    """
+
+    def __init__(self, max_confident_words: int = 40):
+        self.max_confident_words = max_confident_words
+
+    def score(self, prompt: str) -> Tuple[Dict[str, Any], float]:
+        prompt_lower = prompt.lower()
+        words = WORD_PATTERN.findall(prompt_lower)
+        vocabulary = set(words)
+
+        task_type, task_confidence = self._task_type(prompt_lower)
+        expected = EXPECTED_ELEMENTS[task_type]
+        missing_elements = [
+            element for element, keywords in expected.items()
+            if not any(_mentions(prompt_lower, vocabulary, kw) for kw in keywords)
+        ]
+        coverage = 1 - len(missing_elements) / len(expected)
+        vague_terms = sum(_mentions(prompt_lower, vocabulary, term) for term in VAGUE_TERMS)
+
+        analysis = {
+            "task_type": task_type,
+            "complexity": self._complexity(prompt_lower, words),
+            "missing_elements": missing_elements,
+            "context_score": round(min(0.1 + 0.5 * coverage + min(len(words), 60) / 150, 1.0), 2),
+            "clarity_score": round(max(min(0.4 + 0.4 * coverage - 0.1 * vague_terms, 1.0), 0.0), 2),
+        }
+
+        # Long prompts carry nuance keywords miss; trust the heuristic less
+        length_confidence = 1.0 if len(words) <= self.max_confident_words else self.max_confident_words / len(words)
+        return analysis, round(task_confidence * length_confidence, 3)
+
+    @staticmethod
+    def detect_task_type(prompt: str) -> str:
+        """First task type whose keywords appear in the prompt, else general"""
+        prompt_lower = prompt.lower()
+        for task, keywords in TASK_KEYWORDS.items():
+            if any(kw in prompt_lower for kw in keywords):
+                return task
+        return "general"
+
+    @staticmethod
+    def _task_type(prompt_lower: str) -> Tuple[str, float]:
+        hits = {
+            task: sum((0.5 if kw in WEAK_KEYWORDS else 1.0) for kw in keywords if kw in prompt_lower)
+            for task, keywords in TASK_KEYWORDS.items()
+        }
+        ranked = sorted(hits.items(), key=lambda item: item[1], reverse=True)
+        (best, best_hits), (_, runner_up_hits) = ranked[0], ranked[1]
+        if best_hits == 0:
+            return "general", 0.5
+        if best_hits == runner_up_hits:
+            return HeuristicScorer.detect_task_type(prompt_lower), 0.4
+        return best, min(0.7 + 0.15 * (best_hits - runner_up_hits), 1.0)
+
+    @staticmethod
+    def _complexity(prompt_lower: str, words: List[str]) -> str:
+        vocabulary = set(words)
+        signals = sum(_mentions(prompt_lower, vocabulary, term) for term in COMPLEXITY_TERMS)
+        signals += len(SENTENCE_PATTERN.findall(prompt_lower)) > 2
+        signals += len(words) > 60
+        if signals >= 3:
+            return "High"
+        if signals >= 1 or len(words) > 25:
+            return "Medium"
+        return "Low"
+
+
+def _mentions(prompt_lower: str, vocabulary: set, keyword: str) -> bool:
+    """Whole-word match for single words ("go" must not match "algorithm"), substring otherwise"""
+    if keyword.isalnum():
+        return keyword in vocabulary
+    return keyword in prompt_lower
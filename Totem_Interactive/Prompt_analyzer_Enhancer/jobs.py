@@ -0,0 +1,310 @@
+# jobs.py
+#
+# Durable queue of prompt-processing jobs in SQLite, shared by the API (which
+# submits and reports on jobs) and a pool of worker processes (which run the
+# pipeline). Start workers with:
+#
+#   PYTHONPATH=$(pwd) python3 -m Prompt_analyzer_Enhancer.jobs --db jobs.db --processes 2
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+# Longest wait between retries of a failing job-queue operation, in seconds
+MAX_STORE_BACKOFF = 10.0
+
+_COLUMNS = (
+    "id", "prompt_hash", "prompt", "status", "attempts", "worker", "result", "error", "timings",
+    "created_at", "started_at", "finished_at", "lease_expires_at",
+)
+
+
+class JobQueue:
+    """
+    Jobs live in one SQLite table, so they survive API and worker restarts.
+
+    A worker claims a job under a lease that its heartbeat keeps renewing;
+    a job whose worker died is claimed again once the lease runs out, up to
+    max_attempts. Submitting a prompt that already has a queued, running or
+    (within result_ttl) finished job returns that job instead of a new one.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        lease_seconds: float = 60.0,
+        max_attempts: int = 3,
+        result_ttl: float = 86400.0,
+    ):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._db = self._open_db(db_path)
+
+    @staticmethod
+    def prompt_hash(prompt: str) -> str:
+        # Whitespace-only differences share a job, as they share a cache entry
+        return hashlib.sha256(" ".join(prompt.split()).encode("utf-8")).hexdigest()
+
+    def submit(self, prompt: str) -> Tuple[Dict[str, Any], bool]:
+        """The job for this prompt and whether it already existed"""
+        prompt_hash = self.prompt_hash(prompt)
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE prompt_hash = ? "
+                    "AND (status IN (?, ?) OR (status = ? AND finished_at > ?)) "
+                    "ORDER BY created_at DESC LIMIT 1",
+                    (prompt_hash, QUEUED, RUNNING, DONE, now - self.result_ttl),
+                ).fetchone()
+                if row is None:
+                    job_id = uuid.uuid4().hex
+                    self._db.execute(
+                        "INSERT INTO jobs (id, prompt_hash, prompt, status, attempts, created_at) "
+                        "VALUES (?, ?, ?, ?, 0, ?)",
+                        (job_id, prompt_hash, prompt, QUEUED, now),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if row is not None:
+            return _job(row), True
+        return self.get(job_id), False
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job to a worker, or None when there is none"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Jobs whose workers kept dying are not handed out again
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? "
+                    "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                    (FAILED, "Worker lost the job too many times", now, RUNNING, now, self.max_attempts),
+                )
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_expires_at < ?) "
+                    "ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, lease_expires_at = ? WHERE id = ?",
+                        (RUNNING, worker, now, now + self.lease_seconds, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row[0]) if row else None
+
+    def heartbeat(self, worker: str) -> None:
+        """Extend the lease on every job the worker is running"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE worker = ? AND status = ?",
+                (time.time() + self.lease_seconds, worker, RUNNING),
+            )
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any], timings: Dict[str, float]) -> None:
+        self._finish(job_id, worker, DONE, json.dumps(result), None, timings)
+
+    def fail(self, job_id: str, worker: str, error: str, timings: Dict[str, float]) -> None:
+        """Requeue the job, or mark it failed once it has used max_attempts"""
+        job = self.get(job_id)
+        if job and job["attempts"] < self.max_attempts:
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, error = ?, worker = NULL, lease_expires_at = NULL "
+                    "WHERE id = ? AND worker = ?",
+                    (QUEUED, error, job_id, worker),
+                )
+            return
+        self._finish(job_id, worker, FAILED, None, error, timings)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def purge(self) -> int:
+        """Drop finished jobs older than result_ttl"""
+        with self._lock:
+            cursor = self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (DONE, FAILED, time.time() - self.result_ttl),
+            )
+        return cursor.rowcount
+
+    def _finish(
+        self, job_id: str, worker: str, status: str, result: Optional[str], error: Optional[str],
+        timings: Dict[str, float],
+    ) -> None:
+        with self._lock:
+            # A job re-claimed after a lost lease belongs to its new worker; a late finish is dropped
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, timings = ?, finished_at = ?, "
+                "lease_expires_at = NULL WHERE id = ? AND worker = ?",
+                (status, result, error, json.dumps(timings), time.time(), job_id, worker),
+            )
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs "
+            "(id TEXT PRIMARY KEY, prompt_hash TEXT NOT NULL, prompt TEXT NOT NULL, status TEXT NOT NULL, "
+            "attempts INTEGER NOT NULL, worker TEXT, result TEXT, error TEXT, timings TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_expires_at REAL)"
+        )
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_prompt_hash ON jobs (prompt_hash)")
+        db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+        return db
+
+
+def _job(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    job = dict(zip(_COLUMNS, row))
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["timings"] = json.loads(job["timings"]) if job["timings"] else None
+    del job["prompt_hash"], job["lease_expires_at"]
+    return job
+
+
+async def work(queue: JobQueue, pipeline: Any, concurrency: int = 4, poll_interval: float = 0.5) -> None:
+    """
+    Run jobs from the queue through the pipeline, concurrency at a time, until
+    cancelled. Queue errors (e.g. "database is locked") are logged and retried
+    with backoff rather than ending the worker.
+    """
+    from Prompt_analyzer_Enhancer.rate_limit import BATCH, request_priority
+
+    worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    async def store(operation, *args):
+        delay = poll_interval
+        while True:
+            try:
+                return await asyncio.to_thread(operation, *args)
+            except sqlite3.Error as e:
+                logger.warning("Job queue %s failed, retrying in %.1fs: %s", operation.__name__, delay, e)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MAX_STORE_BACKOFF)
+
+    async def run_next():
+        job = await store(queue.claim, worker)
+        if job is None:
+            await asyncio.sleep(poll_interval)
+            return
+        started = time.perf_counter()
+        timings = {"queued_ms": round((job["started_at"] - job["created_at"]) * 1000, 2)}
+        try:
+            output = await pipeline.process_async(job["prompt"], raise_errors=True)
+        except Exception as e:
+            timings["run_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            logger.warning("Job %s failed on attempt %d: %s", job["id"], job["attempts"], e)
+            await store(queue.fail, job["id"], worker, str(e), timings)
+            return
+        timings["run_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        timings.update(output.pop("timings", {}))
+        await store(queue.complete, job["id"], worker, output, timings)
+
+    async def slot():
+        while True:
+            try:
+                await run_next()
+            except Exception:
+                # The job's lease runs out and it is claimed again
+                logger.exception("Job worker %s slot error, continuing", worker)
+                await asyncio.sleep(poll_interval)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(queue.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(queue.heartbeat, worker)
+                await asyncio.to_thread(queue.purge)
+            except sqlite3.Error as e:
+                logger.warning("Job queue heartbeat failed: %s", e)
+
+    # Jobs are background work; interactive requests go first at the rate limiter
+    with request_priority(BATCH):
+        await asyncio.gather(heartbeat(), *(slot() for _ in range(concurrency)))
+
+
+def run_worker(db_path: str, concurrency: int = 4) -> None:
+    """Worker process entry point: its own Config, LLM clients and pipeline"""
+    from Prompt_analyzer_Enhancer.config import Config
+    from Prompt_analyzer_Enhancer.logging_config import configure_logging
+    from Prompt_analyzer_Enhancer.pipeline import PromptPipeline
+
+    configure_logging()
+    config = Config()
+    queue = Config.initialize_job_queue(db_path)
+    try:
+        asyncio.run(work(queue, PromptPipeline.from_config(config), concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+def start_workers(db_path: str, processes: int, concurrency: int = 4) -> List[multiprocessing.Process]:
+    # spawn, not fork: gRPC channels and threads do not survive a fork
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, args=(db_path, concurrency), name=f"job-worker-{index}", daemon=True)
+        for index in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run prompt-processing job workers")
+    parser.add_argument("--db", default=os.getenv("JOB_QUEUE_PATH", "jobs.db"), help="SQLite job queue file")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs in flight per process")
+    args = parser.parse_args()
+
+    workers = start_workers(args.db, args.processes, args.concurrency)
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
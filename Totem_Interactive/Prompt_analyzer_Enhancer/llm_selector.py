@@ -1,6 +1,24 @@
 # llm_selector.py
 from typing import Dict, Any, List
-import random
+import threading
+from Prompt_analyzer_Enhancer.model_profiles import ModelProfiles
+from Prompt_analyzer_Enhancer.selection_policies import create_policy
+
+
+class _DefaultInstanceMethod:
+    """
+    Instance method that can also be called on the class, as select_model
+    was when it was a classmethod; class calls go to a shared instance
+    with the default policy.
+    """
+
+    def __init__(self, method):
+        self.method = method
+        self.__doc__ = method.__doc__
+
+    def __get__(self, instance, owner):
+        return self.method.__get__(instance if instance is not None else owner.default(), owner)
+
 
 class LLMSelector:
     # Extensible LLM model mapping
@@ -27,29 +45,55 @@ class LLMSelector:
         }
     }
 
+    def __init__(self, policy: str = "score", profiles: ModelProfiles = None):
+        """
+        policy is one of selection_policies.POLICIES ("score", "hash",
+        "round_robin"); profiles defaults to the built-in profile table.
+        """
+        self.profiles = profiles or ModelProfiles()
+        self.policy = create_policy(policy, self.profiles)
+
+    _default = None
+    _default_lock = threading.Lock()
+
     @classmethod
-    def select_model(cls, analysis: Dict[str, Any]) -> Dict[str, Any]:
+    def from_config(cls, config) -> "LLMSelector":
+        return cls(config.selection_policy, ModelProfiles(config.model_profiles_path))
+
+    @classmethod
+    def default(cls) -> "LLMSelector":
+        """Shared selector with the default policy and profiles"""
+        if cls._default is None:
+            with cls._default_lock:
+                if cls._default is None:
+                    cls._default = cls()
+        return cls._default
+
+    @_DefaultInstanceMethod
+    def select_model(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Dynamically select the most suitable LLM based on prompt analysis
+        Select the most suitable LLM based on prompt analysis
         """
         # Extract task type and complexity, with defaults
         task_type = analysis.get('task_type', 'general').lower()
         complexity = analysis.get('complexity', 'Medium')
 
         # Normalize inputs
-        task_type = task_type if task_type in cls.LLM_MODELS else 'general'
+        task_type = task_type if task_type in self.LLM_MODELS else 'general'
         complexity = complexity if complexity in ['Low', 'Medium', 'High'] else 'Medium'
 
         # Select models for the task type and complexity
-        available_models = cls.LLM_MODELS.get(task_type, cls.LLM_MODELS['general'])[complexity]
-        primary_model = random.choice(available_models)
+        available_models = self.LLM_MODELS.get(task_type, self.LLM_MODELS['general'])[complexity]
+        primary_model, breakdown = self.policy.choose(available_models, analysis, f"{task_type}/{complexity}")
 
-        reasoning = cls._generate_reasoning(task_type, complexity)
+        reasoning = self._generate_reasoning(task_type, complexity)
 
         return {
              "recommended_llm": {
                 "model": primary_model,
-                "reasoning": reasoning
+                "reasoning": reasoning,
+                "policy": self.policy.name,
+                "score_breakdown": breakdown
         }
     }
 
@@ -0,0 +1,31 @@
+# logging_config.py
+import logging
+import os
+import random
+
+
+class SamplingFilter(logging.Filter):
+    """Pass every WARNING and above, but only a sample of lower-level records"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def configure_logging() -> None:
+    """
+    LOG_LEVEL picks the level (default INFO); LOG_SAMPLE_RATE is the share
+    of DEBUG/INFO records kept, so per-request logging stays cheap under load.
+    Safe to call more than once.
+    """
+    logging.basicConfig(
+        level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, SamplingFilter) for f in handler.filters):
+            handler.addFilter(SamplingFilter(rate))
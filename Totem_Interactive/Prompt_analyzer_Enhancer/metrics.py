@@ -0,0 +1,175 @@
+# metrics.py
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# (name, type, help, labels, value) rows produced at scrape time
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(zip(self.labelnames, key))} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition layout"""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, [list(counts), total, count]) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics rendered in the Prometheus text format. Components
+    that already keep their own counters register a collector instead.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), **kwargs: Any) -> Histogram:
+        metric = Histogram(name, help, labelnames, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+
+        grouped = {}
+        for collector in self._collectors:
+            for name, kind, help, labels, value in collector():
+                grouped.setdefault(name, (kind, help, []))[2].append((labels, value))
+        for name, (kind, help, rows) in grouped.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{_labels(sorted(labels.items()))} {_number(value)}" for labels, value in rows)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    "prompt_stage_seconds", "Latency of each processing stage", ("stage",)
+)
+STAGE_ERRORS = METRICS.counter(
+    "prompt_stage_errors_total", "Stages that ended with an exception", ("stage",)
+)
+LLM_TOKENS = METRICS.counter(
+    "llm_tokens_total", "LLM tokens, from usage metadata or estimated", ("operation", "kind")
+)
+QUEUE_WAIT_SECONDS = METRICS.histogram(
+    "llm_queue_wait_seconds", "Time spent waiting on the rate limiter", ("priority",)
+)
+
+
+class Span:
+    __slots__ = ("stage", "ms")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.ms = 0.0
+
+
+@contextmanager
+def span(stage: str) -> Iterator[Span]:
+    """Time a stage into prompt_stage_seconds; span.ms holds the result afterwards"""
+    current = Span(stage)
+    started = time.perf_counter()
+    try:
+        yield current
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        current.ms = round(elapsed * 1000, 2)
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+
+
+def record_tokens(operation: str, input_tokens: int, output_tokens: int) -> None:
+    LLM_TOKENS.inc(input_tokens, operation=operation, kind="input")
+    LLM_TOKENS.inc(output_tokens, operation=operation, kind="output")
+
+
+def _labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
@@ -0,0 +1,182 @@
+# micro_batch.py
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import threading
+import time
+from Prompt_analyzer_Enhancer.metrics import METRICS, record_tokens, span
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
+from Prompt_analyzer_Enhancer.templates import create_batch_analysis_prompt_template
+
+logger = logging.getLogger(__name__)
+
+JSON_DECODER = json.JSONDecoder()
+
+BATCH_SIZE = METRICS.histogram(
+    "prompt_analysis_batch_size", "Prompts per batched analysis call", buckets=(2, 4, 8, 16, 32, 64)
+)
+BATCH_ITEMS = METRICS.counter(
+    "prompt_analysis_batch_items_total",
+    "Prompts seen by the analysis batcher: batched, sent alone, or retried alone after a failed batch",
+    ("outcome",),
+)
+
+# Seconds between submissions, smoothed over roughly the last five
+_GAP_SMOOTHING = 0.2
+
+
+class BatchItemError(Exception):
+    """The batched call failed or left this prompt out; analyze it on its own"""
+
+
+class _Batch:
+    def __init__(self):
+        self.items: List[Tuple[str, str, asyncio.Future]] = []
+        self.tokens = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class AnalysisBatcher:
+    """
+    Collects concurrent analysis requests for up to window seconds, or until
+    max_size prompts or max_tokens estimated prompt tokens, and analyzes them
+    in one call whose JSON array answer is fanned back out by id. The
+    instruction block is sent once per batch instead of once per prompt.
+
+    The window adapts to traffic: when prompts arrive further apart than the
+    window, submit returns None straight away and the caller makes its usual
+    single-prompt call, so a lone request never waits for company.
+    """
+
+    def __init__(self, llm: Any, guard: Any, window: float = 0.02, max_size: int = 16, max_tokens: int = 4000):
+        self.llm = llm
+        self.guard = guard
+        self.window = window
+        self.max_size = max_size
+        self.max_tokens = max_tokens
+        self.template = create_batch_analysis_prompt_template()
+        self._lock = threading.RLock()
+        self._open: Dict[asyncio.AbstractEventLoop, _Batch] = {}
+        self._tasks = set()
+        self._gap: Optional[float] = None
+        self._last_arrival: Optional[float] = None
+        self._stats = {"batches": 0, "batched": 0, "single": 0, "fallback": 0}
+
+    async def submit(self, prompt: str) -> Optional[str]:
+        """
+        The model's analysis of prompt as a JSON object, or None when the
+        caller should analyze it alone. Raises BatchItemError when the batch
+        failed or did not answer for this prompt.
+        """
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(prompt)
+        with self._lock:
+            dense = self._arrival(time.monotonic())
+            batch = self._open.get(loop)
+            if tokens > self.max_tokens or (batch is None and not dense):
+                self._count("single")
+                return None
+            if batch is not None and batch.tokens + tokens > self.max_tokens:
+                self._flush(loop, batch)
+                batch = None
+            if batch is None:
+                batch = self._open[loop] = _Batch()
+                batch.timer = loop.call_later(self.window, self._flush, loop, batch)
+            future = loop.create_future()
+            batch.items.append((str(len(batch.items)), prompt, future))
+            batch.tokens += tokens
+            if len(batch.items) >= self.max_size:
+                self._flush(loop, batch)
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        # Every fallback was sent in a batch that failed or skipped it
+        sent = stats["batched"] + stats["fallback"]
+        stats["mean_batch_size"] = round(sent / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
+
+    def _arrival(self, now: float) -> bool:
+        """Record a submission; True when prompts arrive often enough to fill a window"""
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            self._gap = gap if self._gap is None else (1 - _GAP_SMOOTHING) * self._gap + _GAP_SMOOTHING * gap
+        self._last_arrival = now
+        return self._gap is not None and self._gap < self.window
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: _Batch) -> None:
+        with self._lock:
+            # The timer of a batch already sent for size or tokens is a no-op
+            if self._open.get(loop) is not batch:
+                return
+            del self._open[loop]
+        batch.timer.cancel()
+        task = loop.create_task(self._run(batch.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: List[Tuple[str, str, asyncio.Future]]) -> None:
+        # Callers cancelled while the window was open are left out
+        items = [item for item in items if not item[2].done()]
+        if len(items) < 2:
+            for _, _, future in items:
+                self._count("single")
+                future.set_result(None)
+            return
+
+        try:
+            answers = await self._call(items)
+        except Exception as e:
+            logger.warning("Batched analysis of %d prompts failed, analyzing them one by one: %s", len(items), e)
+            answers = {}
+        with self._lock:
+            self._stats["batches"] += 1
+        BATCH_SIZE.observe(len(items))
+
+        for item_id, _, future in items:
+            if future.done():
+                continue
+            answer = answers.get(item_id)
+            if answer is None:
+                self._count("fallback")
+                future.set_exception(BatchItemError(f"No batched analysis for item {item_id}"))
+            else:
+                self._count("batched")
+                future.set_result(json.dumps(answer))
+
+    async def _call(self, items: List[Tuple[str, str, asyncio.Future]]) -> Dict[str, Dict[str, Any]]:
+        prompts = json.dumps([{"id": item_id, "prompt": prompt} for item_id, prompt, _ in items], ensure_ascii=False)
+        with span("analysis.batch_render"):
+            prompt_value = self.template.invoke({"prompts": prompts})
+        tokens = estimate_tokens(prompt_value.to_string())
+        with span("analysis.batch_llm"):
+            response = await self.guard.acall(lambda: self.llm.ainvoke(prompt_value), tokens=tokens)
+        usage = getattr(response, "usage_metadata", None) or {}
+        record_tokens(
+            "batch_analysis",
+            usage.get("input_tokens", tokens),
+            usage.get("output_tokens", estimate_tokens(response.content)),
+        )
+        return _parse_batch(response.content)
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+        BATCH_ITEMS.inc(outcome=outcome)
+
+
+def _parse_batch(response: str) -> Dict[str, Dict[str, Any]]:
+    """Analyses by id from the first JSON array in the response"""
+    start = response.find("[")
+    if start == -1:
+        raise ValueError("No JSON array in batched analysis response")
+    parsed, _ = JSON_DECODER.raw_decode(response, start)
+    if not isinstance(parsed, list):
+        raise ValueError("Batched analysis response is not a JSON array")
+    answers = {}
+    for entry in parsed:
+        if isinstance(entry, dict) and "id" in entry:
+            answers[str(entry.pop("id"))] = entry
+    return answers
@@ -0,0 +1,90 @@
+# model_profiles.py
+from typing import Any, Dict, Optional
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ("cost_per_1k_tokens", "p50_latency_ms", "context_window", "capacity")
+
+# Published list prices and typical latencies at the time of writing; override
+# them with a profile file (see MODEL_PROFILES) rather than editing this table.
+DEFAULT_PROFILES = {
+    "models": {
+        name: dict(zip(PROFILE_FIELDS, values))
+        for name, values in {
+            "claude-haiku": (0.00025, 600, 200000, 4000),
+            "mistral-small": (0.001, 700, 32000, 2000),
+            "gpt-3.5-turbo": (0.0005, 800, 16385, 3500),
+            "claude-opus": (0.015, 2500, 200000, 1000),
+            "anthropic-claude": (0.008, 2000, 100000, 1000),
+            "claude-3-5-sonnet": (0.003, 1500, 200000, 2000),
+            "gpt-4": (0.03, 3000, 8192, 500),
+            "gpt-4-turbo": (0.01, 2000, 128000, 800),
+        }.items()
+    },
+    # Relative importance of each profile field for the "score" policy
+    "weights": {"cost": 0.4, "latency": 0.3, "context": 0.15, "capacity": 0.15},
+}
+
+
+class ModelProfiles:
+    """
+    Per-model cost, latency, context window and capacity used by the
+    selection policies. With a path, the JSON file is re-read whenever its
+    modification time changes (checked at most every check_interval seconds);
+    a file that fails to parse keeps the last good table.
+    """
+
+    def __init__(self, path: Optional[str] = None, check_interval: float = 2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._table = copy.deepcopy(DEFAULT_PROFILES)
+        self._mtime = None
+        self._checked_at = 0.0
+        self.version = 0
+        if path:
+            self._reload_if_changed(force=True)
+
+    def table(self) -> Dict[str, Any]:
+        if self.path and time.monotonic() - self._checked_at >= self.check_interval:
+            self._reload_if_changed()
+        return self._table
+
+    def model(self, name: str) -> Optional[Dict[str, Any]]:
+        return self.table()["models"].get(name)
+
+    def weights(self) -> Dict[str, float]:
+        return self.table()["weights"]
+
+    def _reload_if_changed(self, force: bool = False) -> None:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError as e:
+                logger.warning("Model profile file unavailable, keeping current profiles: %s", e)
+                return
+            if mtime == self._mtime and not force:
+                return
+            # Recorded before parsing so a bad file is reported once, not on every check
+            self._mtime = mtime
+            try:
+                with open(self.path) as f:
+                    loaded = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Model profile file is invalid, keeping current profiles: %s", e)
+                return
+            # The file may override only some models, some fields or only the weights
+            table = copy.deepcopy(DEFAULT_PROFILES)
+            for name, fields in loaded.get("models", {}).items():
+                table["models"].setdefault(name, {}).update(fields)
+            table["weights"].update(loaded.get("weights", {}))
+            self._table = table
+            self.version += 1
+            logger.info("Loaded model profiles from %s (version %d)", self.path, self.version)
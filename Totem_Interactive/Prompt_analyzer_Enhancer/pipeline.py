@@ -0,0 +1,199 @@
+# pipeline.py
+from typing import Dict, Any, Iterator, Optional, Tuple
+import asyncio
+import logging
+import time
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from Prompt_analyzer_Enhancer.config import Config
+from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
+from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+from Prompt_analyzer_Enhancer.rate_limit import track_queue_wait
+from Prompt_analyzer_Enhancer.metrics import span
+from Prompt_analyzer_Enhancer.speculation import Speculation
+
+logger = logging.getLogger(__name__)
+
+# Heuristic analysis, the enhancement task started from it, and its start time
+Speculative = Tuple[Dict[str, Any], "asyncio.Task", float]
+
+
+class PromptPipeline:
+    """Runs analysis, model selection and enhancement for a prompt in one call"""
+
+    def __init__(
+        self,
+        analyzer: PromptAnalyzer,
+        selector: LLMSelector,
+        enhancer: PromptEnhancer,
+        speculation: Optional[Speculation] = None,
+    ):
+        self.analyzer = analyzer
+        self.selector = selector
+        self.enhancer = enhancer
+        self.speculation = speculation
+
+    @classmethod
+    def from_config(cls, config: Config) -> "PromptPipeline":
+        return cls(
+            PromptAnalyzer(config), LLMSelector.from_config(config), PromptEnhancer(config),
+            Speculation.from_config(config),
+        )
+
+    def process(self, prompt: str) -> Dict[str, Any]:
+        timings = {}
+
+        with span("pipeline") as total, track_queue_wait() as queue_wait:
+            with span("analysis") as stage:
+                analysis = self.analyzer.analyze_prompt(prompt)
+            timings["analysis_ms"] = stage.ms
+
+            with span("selection") as stage:
+                selected_model = self.selector.select_model(analysis)
+            timings["selection_ms"] = stage.ms
+
+            with span("enhancement") as stage:
+                enhanced_prompt = self.enhancer.enhance_prompt(prompt, analysis)
+            timings["enhancement_ms"] = stage.ms
+
+        timings["queue_wait_ms"] = round(queue_wait[0] * 1000, 2)
+        timings["total_ms"] = total.ms
+        return self._build_output(analysis, selected_model, enhanced_prompt, timings)
+
+    async def process_async(self, prompt: str, raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        Selection and enhancement both start as soon as the analysis is ready;
+        selection runs while the enhancement call is in flight. With
+        speculation, enhancement starts alongside the analysis from a
+        heuristic guess at it (see _settle_speculation).
+        With raise_errors LLM failures propagate instead of falling back.
+        """
+        timings = {}
+
+        with span("pipeline") as total, track_queue_wait() as queue_wait:
+            speculative = self._speculate(prompt)
+            try:
+                with span("analysis") as stage:
+                    analysis = await self.analyzer.analyze_prompt_async(prompt, raise_errors)
+            except BaseException:
+                if speculative is not None:
+                    speculative[1].cancel()
+                raise
+            timings["analysis_ms"] = stage.ms
+
+            # The task inherits the queue-wait tracker from this context
+            with span("enhancement") as enhancement_stage:
+                if speculative is not None:
+                    enhancement = asyncio.create_task(
+                        self._settle_speculation(speculative, prompt, analysis, raise_errors)
+                    )
+                else:
+                    enhancement = asyncio.create_task(
+                        self.enhancer.enhance_prompt_async(prompt, analysis, raise_errors)
+                    )
+
+                try:
+                    with span("selection") as stage:
+                        selected_model = self.selector.select_model(analysis)
+                except BaseException:
+                    # Nobody will await the enhancement; stop it rather than leak the call
+                    enhancement.cancel()
+                    raise
+                timings["selection_ms"] = stage.ms
+
+                enhanced_prompt = await enhancement
+            timings["enhancement_ms"] = enhancement_stage.ms
+
+        timings["queue_wait_ms"] = round(queue_wait[0] * 1000, 2)
+        timings["total_ms"] = total.ms
+        return self._build_output(analysis, selected_model, enhanced_prompt, timings)
+
+    def _speculate(self, prompt: str) -> Optional[Speculative]:
+        if self.speculation is None:
+            return None
+        guess = self.speculation.guess(prompt)
+        task = asyncio.create_task(self.enhancer.enhance_prompt_async(prompt, guess, raise_errors=True))
+        return guess, task, time.perf_counter()
+
+    async def _settle_speculation(
+        self, speculative: Speculative, prompt: str, analysis: Dict[str, Any], raise_errors: bool
+    ) -> Dict[str, Any]:
+        """
+        Keep the enhancement started from the heuristic guess if the real
+        analysis agrees with it; otherwise cancel it and enhance again.
+        """
+        guess, task, started = speculative
+        analysis_done = time.perf_counter()
+        if not self.speculation.agrees(guess, analysis):
+            task.cancel()
+            self.speculation.record("miss")
+            return await self.enhancer.enhance_prompt_async(prompt, analysis, raise_errors)
+
+        try:
+            enhanced_prompt = await task
+        except Exception as e:
+            logger.warning("Speculative enhancement failed, enhancing again: %s", e)
+            self.speculation.record("failed")
+            return await self.enhancer.enhance_prompt_async(prompt, analysis, raise_errors)
+        # Run in sequence, enhancement would have started when the analysis finished
+        self.speculation.record("hit", min(analysis_done, time.perf_counter()) - started)
+        return self.enhancer.with_analysis(enhanced_prompt, analysis)
+
+    def stream(self, prompt: str) -> Iterator[Dict[str, Any]]:
+        """
+        Like process, but forwards enhancement tokens as {"event": "token"}
+        events and ends with one {"event": "result"} holding the full output.
+        """
+        timings = {}
+        started = time.perf_counter()
+
+        with span("pipeline"), track_queue_wait() as queue_wait:
+            with span("analysis") as stage:
+                analysis = self.analyzer.analyze_prompt(prompt)
+            timings["analysis_ms"] = stage.ms
+
+            with span("selection") as stage:
+                selected_model = self.selector.select_model(analysis)
+            timings["selection_ms"] = stage.ms
+
+            with span("enhancement"):
+                stage_started = time.perf_counter()
+                for event in self.enhancer.stream_enhance_prompt(prompt, analysis):
+                    if event["event"] == "token":
+                        timings.setdefault("first_token_ms", _elapsed_ms(started))
+                        yield event
+                        continue
+                    timings["enhancement_ms"] = _elapsed_ms(stage_started)
+                    timings["queue_wait_ms"] = round(queue_wait[0] * 1000, 2)
+                    timings["total_ms"] = _elapsed_ms(started)
+                    yield {
+                        "event": "result",
+                        "data": self._build_output(analysis, selected_model, event["data"], timings),
+                    }
+
+    @staticmethod
+    def _build_output(
+        analysis: Dict[str, Any],
+        selected_model: Dict[str, Any],
+        enhanced_prompt: Dict[str, Any],
+        timings: Dict[str, float],
+    ) -> Dict[str, Any]:
+        # Structure the output
+        return {
+            "analysis": analysis,
+            "recommended_llm": {
+                "model": selected_model["recommended_llm"]["model"],
+                "reasoning": selected_model["recommended_llm"]["reasoning"],
+                "policy": selected_model["recommended_llm"].get("policy"),
+                "score_breakdown": selected_model["recommended_llm"].get("score_breakdown"),
+            },
+            "enhanced_prompt": {
+                "text": enhanced_prompt["enhanced_prompt"]["text"],
+                "technique": enhanced_prompt["enhanced_prompt"]["technique"],
+                "improvement_metrics": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]
+            },
+            "timings": timings,
+        }
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
@@ -1,67 +1,256 @@
 # prompt_enhancer.py
-from typing import Dict, Any
-from dotenv import load_dotenv
+from typing import Dict, Any, AsyncIterator, Iterator, Optional
+import logging
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 from Prompt_analyzer_Enhancer.config import Config
 from Prompt_analyzer_Enhancer.templates import create_prompt_enhancer_template
-from langchain.chains import LLMChain
+from Prompt_analyzer_Enhancer.cache import ResponseCache
+from Prompt_analyzer_Enhancer.resilience import CircuitOpenError
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
+from Prompt_analyzer_Enhancer.metrics import record_tokens, span
+from Prompt_analyzer_Enhancer.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
 
 
 class PromptEnhancer:
     def __init__(self, config: Config):
         self.llm = config.llm
+        self.router = config.router
         self.prompt_enhancer_template = create_prompt_enhancer_template()
+        self.cache = config.cache
+        self.guard = config.guard
+        # Identical prompt and analysis enhanced concurrently share one LLM call
+        self.in_flight = SingleFlight("enhancement")
 
     def enhance_prompt(self, original_prompt: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
-        # Create LLM Chain for enhancement
-        chain = LLMChain(
-            llm=self.llm, 
-            prompt=self.prompt_enhancer_template
-        )
+        analysis = analysis or {}
+        try:
+            # Create LLM Chain for enhancement
+            llm = self._llm_for(analysis)
+            chain = self._build_chain(llm)
+            inputs = self._chain_inputs(original_prompt, analysis)
+            cache_key = self._cache_key(inputs, llm)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                return self._build_result(cached, analysis)
+
+            # Generate enhanced prompt
+            def generate() -> str:
+                tokens = self._estimate_tokens(inputs)
+                with span("enhancement.llm"):
+                    enhanced_result = self.guard.call(lambda: chain.invoke(inputs), tokens=tokens)
+                record_tokens("enhancement", tokens, estimate_tokens(enhanced_result))
+                if cache_key:
+                    self.cache.set(cache_key, enhanced_result)
+                return enhanced_result
+
+            enhanced_result, _ = self.in_flight.do(self._flight_key(inputs, llm), generate)
+            return self._build_result(enhanced_result, analysis)
+        except Exception as e:
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            return self._fallback_enhancement(original_prompt)
+
+    async def enhance_prompt_async(
+        self, original_prompt: str, analysis: Dict[str, Any], raise_errors: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Non-blocking prompt enhancement for use inside an event loop.
+        With raise_errors the LLM error is re-raised instead of falling back.
+        """
+        analysis = analysis or {}
+        try:
+            llm = self._llm_for(analysis)
+            chain = self._build_chain(llm)
+            inputs = self._chain_inputs(original_prompt, analysis)
+            cache_key = self._cache_key(inputs, llm)
+            cached = self.cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                return self._build_result(cached, analysis)
+
+            async def generate() -> str:
+                tokens = self._estimate_tokens(inputs)
+                with span("enhancement.llm"):
+                    enhanced_result = await self.guard.acall(lambda: chain.ainvoke(inputs), tokens=tokens)
+                record_tokens("enhancement", tokens, estimate_tokens(enhanced_result))
+                if cache_key:
+                    self.cache.set(cache_key, enhanced_result)
+                return enhanced_result
+
+            enhanced_result, _ = await self.in_flight.ado(self._flight_key(inputs, llm), generate)
+            return self._build_result(enhanced_result, analysis)
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            return self._fallback_enhancement(original_prompt)
+
+    def stream_enhance_prompt(self, original_prompt: str, analysis: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Yield {"event": "token"} chunks as the model produces them, followed by
+        one {"event": "result"} carrying the structured enhancement.
+        """
+        analysis = analysis or {}
+        try:
+            llm = self._llm_for(analysis)
+            inputs = self._chain_inputs(original_prompt, analysis)
+            cache_key = self._cache_key(inputs, llm)
+            cached = self.cache.get(cache_key) if cache_key else None
+        except Exception as e:
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            yield {"event": "result", "data": self._fallback_enhancement(original_prompt)}
+            return
+        if cached is not None:
+            yield {"event": "token", "data": cached}
+            yield {"event": "result", "data": self._build_result(cached, analysis)}
+            return
+
+        chain = self.prompt_enhancer_template | llm
+        chunks = []
+        tokens = self._estimate_tokens(inputs)
+        probe = False
+        try:
+            with span("enhancement.llm"):
+                probe = self.guard.before_attempt()
+                self.guard.throttle(tokens)
+                for chunk in chain.stream(inputs):
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield {"event": "token", "data": chunk.content}
+            self.guard.record_success()
+            enhanced_result = "".join(chunks)
+            record_tokens("enhancement", tokens, estimate_tokens(enhanced_result))
+            if cache_key:
+                self.cache.set(cache_key, enhanced_result)
+            result = self._build_result(enhanced_result, analysis)
+        except Exception as e:
+            self._record_stream_failure(e)
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            result = self._fallback_enhancement(original_prompt)
+        except BaseException:
+            # The client went away mid-stream: neither a success nor a provider failure
+            self.guard.release(probe)
+            raise
+        yield {"event": "result", "data": result}
 
-        # Generate enhanced prompt
+    async def astream_enhance_prompt(
+        self, original_prompt: str, analysis: Dict[str, Any]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Async counterpart of stream_enhance_prompt"""
+        analysis = analysis or {}
         try:
-            # print("Invoking chain with:")
-            # print("Prompt:", original_prompt)
-            # print("Task Type:", analysis.get("task_type", "general"))
-            # print("Missing Elements:", ", ".join(analysis.get("missing_elements", [])))
-
-            enhanced_result = chain.run(
-                prompt=original_prompt,
-                task_type=analysis.get("task_type", "general"),
-                complexity=analysis.get("complexity", "medium"),
-                missing_elements=", ".join(analysis.get("missing_elements", []))
-            )
-
-            # print("Raw Enhanced Result:", enhanced_result)
-
-            # Clean and structure the enhanced prompt
-            cleaned_text = enhanced_result.strip()
-            
-            return {
-                "enhanced_prompt": {
-                    "text": cleaned_text,
-                    "technique": "Specification Expansion",
-                    "improvement_metrics": {
-                        "clarity": round(min(analysis.get("clarity_score", 0.5) + 0.4, 1.0), 2),
-                        "context": round(min(analysis.get("context_score", 0.4) + 0.5, 1.0), 2),
-                        "specificity": round(0.6, 2)
-                    }
+            llm = self._llm_for(analysis)
+            inputs = self._chain_inputs(original_prompt, analysis)
+            cache_key = self._cache_key(inputs, llm)
+            cached = self.cache.get(cache_key) if cache_key else None
+        except Exception as e:
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            yield {"event": "result", "data": self._fallback_enhancement(original_prompt)}
+            return
+        if cached is not None:
+            yield {"event": "token", "data": cached}
+            yield {"event": "result", "data": self._build_result(cached, analysis)}
+            return
+
+        chain = self.prompt_enhancer_template | llm
+        chunks = []
+        tokens = self._estimate_tokens(inputs)
+        probe = False
+        try:
+            with span("enhancement.llm"):
+                probe = self.guard.before_attempt()
+                await self.guard.athrottle(tokens)
+                async for chunk in chain.astream(inputs):
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield {"event": "token", "data": chunk.content}
+            self.guard.record_success()
+            enhanced_result = "".join(chunks)
+            record_tokens("enhancement", tokens, estimate_tokens(enhanced_result))
+            if cache_key:
+                self.cache.set(cache_key, enhanced_result)
+            result = self._build_result(enhanced_result, analysis)
+        except Exception as e:
+            self._record_stream_failure(e)
+            logger.warning("Enhancement failed, using fallback: %s", e)
+            result = self._fallback_enhancement(original_prompt)
+        except BaseException:
+            # The client went away mid-stream: neither a success nor a provider failure
+            self.guard.release(probe)
+            raise
+        yield {"event": "result", "data": result}
+
+    def with_analysis(self, result: Dict[str, Any], analysis: Dict[str, Any]) -> Dict[str, Any]:
+        """The same enhanced text, with improvement metrics for another analysis"""
+        return self._build_result(result["enhanced_prompt"]["text"], analysis)
+
+    def _record_stream_failure(self, error: Exception) -> None:
+        # A partially streamed response cannot be retried, so no backoff here
+        if not isinstance(error, CircuitOpenError):
+            self.guard.record_failure(error, self.guard.max_retries)
+
+    def _estimate_tokens(self, inputs: Dict[str, Any]) -> int:
+        return estimate_tokens(self.prompt_enhancer_template.template, *map(str, inputs.values()))
+
+    def _llm_for(self, analysis: Dict[str, Any]) -> Any:
+        """Model routed for the prompt's task type and complexity tier"""
+        if self.router is None:
+            return self.llm
+        return self.router.model("enhancement", analysis.get("task_type"), analysis.get("complexity"))
+
+    def _build_chain(self, llm: Any) -> Runnable:
+        return self.prompt_enhancer_template | llm | StrOutputParser()
+
+    def _flight_key(self, inputs: Dict[str, str], llm: Any) -> str:
+        """Same normalization as the response cache, whether or not caching is on"""
+        return ResponseCache.make_key(self.prompt_enhancer_template.template, llm, inputs)
+
+    def _cache_key(self, inputs: Dict[str, str], llm: Any) -> Optional[str]:
+        """Content-addressed key for the raw enhancement response, if caching is on"""
+        if self.cache is None:
+            return None
+        return ResponseCache.make_key(self.prompt_enhancer_template.template, llm, inputs)
+
+    @staticmethod
+    def _chain_inputs(original_prompt: str, analysis: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            "prompt": original_prompt,
+            "task_type": analysis.get("task_type", "general"),
+            "complexity": analysis.get("complexity", "medium"),
+            "missing_elements": ", ".join(analysis.get("missing_elements", []))
+        }
+
+    @staticmethod
+    def _build_result(enhanced_result: str, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        # Clean and structure the enhanced prompt
+        cleaned_text = enhanced_result.strip()
+
+        return {
+            "enhanced_prompt": {
+                "text": cleaned_text,
+                "technique": "Specification Expansion",
+                "improvement_metrics": {
+                    "clarity": round(min(analysis.get("clarity_score", 0.5) + 0.4, 1.0), 2),
+                    "context": round(min(analysis.get("context_score", 0.4) + 0.5, 1.0), 2),
+                    "specificity": round(0.6, 2)
                 }
             }
-        except Exception as e:
-            print(f"Error occurred: {e}")
-            # Fallback enhancement
-            return {
-                "enhanced_prompt": {
-                    "text": f"{original_prompt}. Please provide more specific details and context.",
-                    "technique": "Basic Enhancement",
-                    "improvement_metrics": {
-                        "clarity": 0.4,
-                        "context": 0.5,
-                        "specificity": 0.6
-                    }
+        }
+
+    @staticmethod
+    def _fallback_enhancement(original_prompt: str) -> Dict[str, Any]:
+        return {
+            "enhanced_prompt": {
+                "text": f"{original_prompt}. Please provide more specific details and context.",
+                "technique": "Basic Enhancement",
+                "improvement_metrics": {
+                    "clarity": 0.4,
+                    "context": 0.5,
+                    "specificity": 0.6
                 }
             }
+        }
 
 # Example usage
 # def main():
@@ -0,0 +1,239 @@
+# rate_limit.py
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+import asyncio
+import heapq
+import itertools
+import sqlite3
+import threading
+import time
+from Prompt_analyzer_Enhancer.metrics import QUEUE_WAIT_SECONDS
+
+# Lower values are served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# How often a waiter that is not at the head of the queue re-checks its turn
+POLL_INTERVAL = 0.05
+MAX_SLEEP = 1.0
+
+_priority = ContextVar("llm_priority", default=INTERACTIVE)
+_queue_wait = ContextVar("llm_queue_wait", default=None)
+
+
+@contextmanager
+def request_priority(priority: int) -> Iterator[None]:
+    """LLM calls made inside the block queue at the given priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@contextmanager
+def track_queue_wait() -> Iterator[List[float]]:
+    """
+    Collect the seconds spent waiting on the rate limiter inside the block,
+    including tasks started from it; the total is in holder[0].
+    """
+    holder = [0.0]
+    token = _queue_wait.set(holder)
+    try:
+        yield holder
+    finally:
+        _queue_wait.reset(token)
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Rough input token count (about four characters per token)"""
+    return sum(len(text) for text in texts) // 4 + 1
+
+
+class TokenBucketLimiter:
+    """
+    Requests-per-minute and tokens-per-minute token buckets for one API key.
+
+    Bucket levels live in memory, or in a SQLite file so every process that
+    points at the same path (uvicorn workers, Streamlit) shares one budget.
+    Waiters within a process are served in priority order, then FIFO.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        db_path: str = None,
+        key: str = "default",
+    ):
+        limits = {"requests": requests_per_minute, "tokens": tokens_per_minute}
+        self.capacity = {name: float(limit) for name, limit in limits.items() if limit > 0}
+        self.rates = {name: limit / 60.0 for name, limit in self.capacity.items()}
+        self.db_path = db_path
+        self.key = key
+        self._lock = threading.Lock()
+        # Serializes the shared SQLite connection, so _lock is never held across database I/O
+        self._db_lock = threading.Lock()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._levels = {name: (capacity, time.time()) for name, capacity in self.capacity.items()}
+        self._stats = {
+            name: {"acquired": 0, "waited": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+            for name in PRIORITY_NAMES.values()
+        }
+        self._db = self._open_db(db_path) if db_path else None
+
+    def acquire(self, tokens: int = 0, priority: Optional[int] = None) -> float:
+        """Block until one request and `tokens` tokens fit; return seconds waited"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            delay = self._try_acquire(ticket, tokens)
+            while delay:
+                time.sleep(delay)
+                delay = self._try_acquire(ticket, tokens)
+        finally:
+            self._dequeue(ticket)
+        return self._record(ticket[0], time.monotonic() - started)
+
+    async def aacquire(self, tokens: int = 0, priority: Optional[int] = None) -> float:
+        """Non-blocking acquire for use inside an event loop"""
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            delay = await self._atry_acquire(ticket, tokens)
+            while delay:
+                await asyncio.sleep(delay)
+                delay = await self._atry_acquire(ticket, tokens)
+        finally:
+            self._dequeue(ticket)
+        return self._record(ticket[0], time.monotonic() - started)
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """
+        Take one request and `tokens` tokens only if they fit now and nobody
+        is queued; never waits. For optional extra calls such as hedges.
+        """
+        with self._lock:
+            if self._waiters:
+                return False
+            costs = self._costs(tokens)
+            if self._db is None:
+                return not self._take(self._levels, costs)
+        return not self._take_shared(costs)
+
+    async def atry_acquire(self, tokens: int = 0) -> bool:
+        if self._db is None:
+            return self.try_acquire(tokens)
+        return await asyncio.to_thread(self.try_acquire, tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+            stats["queued"] = len(self._waiters)
+        for name in PRIORITY_NAMES.values():
+            acquired = stats[name]["acquired"]
+            stats[name]["wait_ms_avg"] = round(stats[name]["wait_ms_total"] / acquired, 2) if acquired else 0.0
+        stats["limits_per_minute"] = dict(self.capacity)
+        stats["shared"] = self._db is not None
+        return stats
+
+    def _enqueue(self, priority: Optional[int]) -> tuple:
+        ticket = (_priority.get() if priority is None else priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket: tuple) -> None:
+        with self._lock:
+            self._waiters.remove(ticket)
+            heapq.heapify(self._waiters)
+
+    def _try_acquire(self, ticket: tuple, tokens: int) -> float:
+        """0 once the budget is taken, otherwise how long to sleep before retrying"""
+        with self._lock:
+            if self._waiters[0] != ticket:
+                return POLL_INTERVAL
+            costs = self._costs(tokens)
+            if self._db is None:
+                return min(self._take(self._levels, costs), MAX_SLEEP)
+        # Only the head of the queue gets here, so waiters behind it are not held up by the database
+        return min(self._take_shared(costs), MAX_SLEEP)
+
+    async def _atry_acquire(self, ticket: tuple, tokens: int) -> float:
+        if self._db is None:
+            return self._try_acquire(ticket, tokens)
+        # BEGIN IMMEDIATE can wait out the busy timeout on other processes; keep it off the event loop
+        return await asyncio.to_thread(self._try_acquire, ticket, tokens)
+
+    def _costs(self, tokens: int) -> Dict[str, float]:
+        costs = {"requests": 1.0, "tokens": float(tokens)}
+        # A call larger than the whole bucket waits for a full bucket instead of forever
+        return {name: min(costs[name], capacity) for name, capacity in self.capacity.items()}
+
+    def _take(self, levels: Dict[str, tuple], costs: Dict[str, float]) -> float:
+        now = time.time()
+        current = {
+            name: min(self.capacity[name], level + max(now - updated, 0.0) * self.rates[name])
+            for name, (level, updated) in levels.items()
+        }
+        shortfall = max(
+            ((costs[name] - current[name]) / self.rates[name] for name in current if costs[name] > current[name]),
+            default=0.0,
+        )
+        if shortfall:
+            return shortfall
+        for name in current:
+            levels[name] = (current[name] - costs[name], now)
+        return 0.0
+
+    def _take_shared(self, costs: Dict[str, float]) -> float:
+        with self._db_lock:
+            # BEGIN IMMEDIATE serializes the read-modify-write across processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT bucket, level, updated FROM rate_limits WHERE key = ?", (self.key,)
+                ).fetchall()
+                levels = {name: (self.capacity[name], time.time()) for name in self.capacity}
+                levels.update({name: (level, updated) for name, level, updated in rows if name in levels})
+                delay = self._take(levels, costs)
+                if not delay:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO rate_limits (key, bucket, level, updated) VALUES (?, ?, ?, ?)",
+                        [(self.key, name, level, updated) for name, (level, updated) in levels.items()],
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return delay
+
+    def _record(self, priority: int, waited: float) -> float:
+        waited_ms = waited * 1000
+        name = PRIORITY_NAMES.get(priority, PRIORITY_NAMES[BATCH])
+        QUEUE_WAIT_SECONDS.observe(waited, priority=name)
+        with self._lock:
+            stats = self._stats[name]
+            stats["acquired"] += 1
+            if waited_ms >= 1:
+                stats["waited"] += 1
+            stats["wait_ms_total"] = round(stats["wait_ms_total"] + waited_ms, 2)
+            stats["wait_ms_max"] = round(max(stats["wait_ms_max"], waited_ms), 2)
+        holder = _queue_wait.get()
+        if holder is not None:
+            holder[0] += waited
+        return waited
+
+    @staticmethod
+    def _open_db(db_path: str) -> sqlite3.Connection:
+        db = sqlite3.connect(db_path, check_same_thread=False, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limits "
+            "(key TEXT NOT NULL, bucket TEXT NOT NULL, level REAL NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (key, bucket))"
+        )
+        return db
@@ -0,0 +1,92 @@
+# registry.py
+from typing import TYPE_CHECKING, Any, Callable
+import logging
+import threading
+from Prompt_analyzer_Enhancer.config import Config
+
+# Components, and LangChain with them, are imported when first requested
+if TYPE_CHECKING:
+    from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+    from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
+    from Prompt_analyzer_Enhancer.pipeline import PromptPipeline
+    from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentRegistry:
+    """
+    Lazily built, process-wide components sharing one Config and therefore
+    one LLM client, so connections to the model endpoint are reused.
+    """
+
+    def __init__(self, config_factory: Callable[[], Config] = Config):
+        self._config_factory = config_factory
+        self._lock = threading.RLock()
+        self._components = {}
+
+    @property
+    def config(self) -> Config:
+        return self._get("config", self._config_factory)
+
+    @property
+    def analyzer(self) -> "PromptAnalyzer":
+        from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+
+        return self._get("analyzer", lambda: PromptAnalyzer(self.config))
+
+    @property
+    def selector(self) -> "LLMSelector":
+        from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
+
+        return self._get("selector", lambda: LLMSelector.from_config(self.config))
+
+    @property
+    def enhancer(self) -> "PromptEnhancer":
+        from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+
+        return self._get("enhancer", lambda: PromptEnhancer(self.config))
+
+    @property
+    def pipeline(self) -> "PromptPipeline":
+        from Prompt_analyzer_Enhancer.pipeline import PromptPipeline
+        from Prompt_analyzer_Enhancer.speculation import Speculation
+
+        return self._get(
+            "pipeline",
+            lambda: PromptPipeline(self.analyzer, self.selector, self.enhancer, Speculation.from_config(self.config)),
+        )
+
+    def warm_up(self, ping: bool = False) -> None:
+        """
+        Build every component up front; with ping, also send a tiny request so
+        the connection to the model endpoint is open before real traffic.
+        """
+        self.pipeline
+        if ping:
+            try:
+                self.config.llm.invoke("ping")
+            except Exception as e:
+                logger.warning("Warm-up ping failed: %s", e)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._components.clear()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = factory()
+                    self._components[name] = component
+        return component
+
+
+_registry = ComponentRegistry()
+
+
+def get_registry() -> ComponentRegistry:
+    """Return the process-wide component registry"""
+    return _registry
@@ -0,0 +1,228 @@
+# resilience.py
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import random
+import threading
+import time
+from Prompt_analyzer_Enhancer.rate_limit import TokenBucketLimiter
+
+RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resourceexhausted", "rate limit", "quota")
+TRANSIENT_MARKERS = (
+    "timeout", "timed out", "deadline", "unavailable", "503", "500", "502", "504",
+    "internal", "connection", "reset by peer", "temporarily",
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate limits, timeouts and transient provider/network errors are worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if is_rate_limit_error(error):
+        return True
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+class CircuitBreaker:
+    """
+    Opens after failure_threshold consecutive failures, rejects calls for
+    reset_timeout seconds, then lets a single probe through (half-open).
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return self._state
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def admit(self) -> Optional[bool]:
+        """None if the call is rejected, else whether it is the half-open probe"""
+        with self._lock:
+            if self._state == "closed":
+                return False
+            if self._state == "open" and time.monotonic() - self._opened_at < self.reset_timeout:
+                return None
+            if self._probe_in_flight:
+                return None
+            self._state = "half_open"
+            self._probe_in_flight = True
+            return True
+
+    def release(self) -> None:
+        """Give back a half-open probe that ended without an outcome (cancelled)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self.times_opened += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+
+class LLMGuard:
+    """
+    Wraps provider calls with a per-call deadline, jittered exponential
+    backoff on retryable errors and a shared circuit breaker. With a
+    limiter, every attempt first waits for its rate-limit budget.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 30.0,
+        max_retries: int = 2,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: CircuitBreaker = None,
+        limiter: TokenBucketLimiter = None,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "timeouts": 0,
+            "rate_limited": 0,
+            "short_circuited": 0,
+        }
+
+    def call(self, fn: Callable[[], Any], tokens: int = 0) -> Any:
+        """Run a blocking provider call; the client's own timeout is the deadline"""
+        for attempt in range(self.max_retries + 1):
+            probe = self.before_attempt()
+            try:
+                self.throttle(tokens)
+                result = fn()
+            except Exception as e:
+                delay = self.record_failure(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self.release(probe)
+                raise
+            self.record_success()
+            return result
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """Run an async provider call under an asyncio deadline"""
+        for attempt in range(self.max_retries + 1):
+            probe = self.before_attempt()
+            try:
+                await self.athrottle(tokens)
+                result = await asyncio.wait_for(fn(), self.timeout)
+            except Exception as e:
+                delay = self.record_failure(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self.release(probe)
+                raise
+            self.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opened"] = self.breaker.times_opened
+        if self.limiter is not None:
+            stats["rate_limiter"] = self.limiter.stats()
+        return stats
+
+    def throttle(self, tokens: int = 0) -> float:
+        """Wait for rate-limit budget for one call; return seconds waited"""
+        return self.limiter.acquire(tokens) if self.limiter is not None else 0.0
+
+    async def athrottle(self, tokens: int = 0) -> float:
+        return await self.limiter.aacquire(tokens) if self.limiter is not None else 0.0
+
+    def before_attempt(self) -> bool:
+        """
+        Raise CircuitOpenError if the breaker rejects the call, else count it
+        and return whether it is the half-open probe
+        """
+        probe = self.breaker.admit()
+        if probe is None:
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM provider circuit is open")
+        self._count("calls")
+        return probe
+
+    def release(self, probe: bool) -> None:
+        """End an attempt that was cancelled before it succeeded or failed"""
+        if probe:
+            self.breaker.release()
+
+    def record_success(self) -> None:
+        self.breaker.record_success()
+        self._count("successes")
+
+    def record_failure(self, error: Exception, attempt: int):
+        """Record the failure; return the backoff delay, or None to give up"""
+        self._count("failures")
+        if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+            self._count("timeouts")
+        rate_limited = is_rate_limit_error(error)
+        if rate_limited:
+            self._count("rate_limited")
+
+        # Only provider degradation trips the breaker; a rejected request means it answered
+        if not is_retryable_error(error):
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+
+        self._count("retries")
+        # Full jitter; rate limits back off one step further
+        ceiling = self.base_delay * 2 ** (attempt + (1 if rate_limited else 0))
+        return random.uniform(0, min(ceiling, self.max_delay))
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
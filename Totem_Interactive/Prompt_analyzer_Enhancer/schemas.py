@@ -0,0 +1,13 @@
+# schemas.py
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+
+class PromptAnalysis(BaseModel):
+    """Analysis result bound to the model's structured output"""
+
+    task_type: Literal["code", "writing", "analysis", "general"] = Field(description="Primary task type")
+    complexity: Literal["Low", "Medium", "High"] = Field(description="Prompt complexity")
+    missing_elements: List[str] = Field(description="Contextual elements the prompt is missing")
+    context_score: float = Field(ge=0, le=1, description="How much context the prompt gives")
+    clarity_score: float = Field(ge=0, le=1, description="How clear the prompt is")
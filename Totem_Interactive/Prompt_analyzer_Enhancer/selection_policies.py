@@ -0,0 +1,124 @@
+# selection_policies.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Tuple
+import json
+import threading
+import zlib
+from Prompt_analyzer_Enhancer.model_profiles import ModelProfiles
+
+# Score component -> (profile field, lower is better)
+SCORE_METRICS = {
+    "cost": ("cost_per_1k_tokens", True),
+    "latency": ("p50_latency_ms", True),
+    "context": ("context_window", False),
+    "capacity": ("capacity", False),
+}
+
+
+class SelectionPolicy(ABC):
+    """Picks one model from a tier's candidates and explains the choice"""
+
+    name = "base"
+    # True when the choice depends only on the candidates, never on the analysis or call order
+    per_tier = False
+
+    @abstractmethod
+    def choose(self, candidates: List[str], analysis: Dict[str, Any], tier: str) -> Tuple[str, Dict[str, Any]]:
+        """The chosen candidate and the per-candidate breakdown behind it"""
+
+
+class HashPolicy(SelectionPolicy):
+    """The same analysis always maps to the same candidate"""
+
+    name = "hash"
+
+    def __init__(self, profiles: ModelProfiles = None):
+        self.profiles = profiles
+
+    def choose(self, candidates: List[str], analysis: Dict[str, Any], tier: str) -> Tuple[str, Dict[str, Any]]:
+        key = json.dumps(
+            {field: analysis.get(field) for field in ("task_type", "complexity", "missing_elements")},
+            sort_keys=True,
+            default=str,
+        )
+        digest = zlib.crc32(key.encode("utf-8"))
+        index = digest % len(candidates)
+        return candidates[index], {"hash": f"{digest:08x}", "index": index, "candidates": list(candidates)}
+
+
+class WeightedRoundRobinPolicy(SelectionPolicy):
+    """Smooth weighted round-robin within each tier, weighted by profile capacity"""
+
+    name = "round_robin"
+
+    def __init__(self, profiles: ModelProfiles):
+        self.profiles = profiles
+        self._lock = threading.Lock()
+        self._current = {}
+
+    def choose(self, candidates: List[str], analysis: Dict[str, Any], tier: str) -> Tuple[str, Dict[str, Any]]:
+        weights = {model: (self.profiles.model(model) or {}).get("capacity", 1) for model in candidates}
+        total = sum(weights.values())
+        with self._lock:
+            current = self._current.setdefault(tier, {})
+            for model in candidates:
+                current[model] = current.get(model, 0) + weights[model]
+            chosen = max(candidates, key=lambda model: current[model])
+            current[chosen] -= total
+        return chosen, {"weights": weights}
+
+
+class ScoringPolicy(SelectionPolicy):
+    """
+    Weighted sum of profile fields, each normalized against the best
+    candidate in the tier (1.0 = best). Deterministic for a given profile
+    table; ties go to the earlier candidate.
+    """
+
+    name = "score"
+    per_tier = True
+
+    def __init__(self, profiles: ModelProfiles):
+        self.profiles = profiles
+
+    def choose(self, candidates: List[str], analysis: Dict[str, Any], tier: str) -> Tuple[str, Dict[str, Any]]:
+        weights = self.profiles.weights()
+        profiles = {model: self.profiles.model(model) or {} for model in candidates}
+
+        breakdown = {}
+        for model in candidates:
+            parts = {}
+            for metric, (field, lower_is_better) in SCORE_METRICS.items():
+                parts[metric] = _normalized(
+                    profiles[model].get(field),
+                    [profile[field] for profile in profiles.values() if profile.get(field) is not None],
+                    lower_is_better,
+                )
+            parts["total"] = round(sum(weights.get(metric, 0.0) * parts[metric] for metric in SCORE_METRICS), 4)
+            breakdown[model] = parts
+
+        chosen = max(candidates, key=lambda model: (breakdown[model]["total"], -candidates.index(model)))
+        return chosen, {"weights": dict(weights), "candidates": breakdown}
+
+
+POLICIES = {
+    HashPolicy.name: HashPolicy,
+    WeightedRoundRobinPolicy.name: WeightedRoundRobinPolicy,
+    ScoringPolicy.name: ScoringPolicy,
+}
+
+
+def create_policy(name: str, profiles: ModelProfiles) -> SelectionPolicy:
+    if name not in POLICIES:
+        raise ValueError(f"Unknown model selection policy: {name} (expected one of {sorted(POLICIES)})")
+    return POLICIES[name](profiles)
+
+
+def _normalized(value: Any, values: List[float], lower_is_better: bool) -> float:
+    """1.0 for the best candidate on this field, 0.5 when the profile lacks it"""
+    if value is None or not values:
+        return 0.5
+    if lower_is_better:
+        return round(min(values) / value, 4) if value else 1.0
+    best = max(values)
+    return round(value / best, 4) if best else 1.0
@@ -0,0 +1,195 @@
+# semantic_cache.py
+from typing import Any, Callable, Dict, FrozenSet, Optional, Tuple
+import json
+import re
+import threading
+import zlib
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#]+")
+# Words that do not change what a prompt asks for
+STOP_WORDS = frozenset(
+    "a an the this that these those of in on to into for from with about by as at and or vs versus "
+    "is are be it its me my i you your please can could would how what does do which".split()
+)
+# Request verbs and nouns that paraphrases add or drop without changing the task
+GENERIC_TERMS = frozenset(
+    "write create make generate give draft explain show produce code program implement "
+    "implementation comparison compare".split()
+)
+
+
+def key_terms(text: str) -> FrozenSet[str]:
+    """
+    The words that decide what a prompt asks for: everything but stop words
+    and generic request words, with plural, -ing/-ed and -ise/-ize endings
+    normalized. Numbers, languages ("c", "c++", "java") and names stay
+    distinct. Word order is not kept, so a prompt and its reversal
+    ("python to javascript", "javascript to python") still match.
+    """
+    terms = set()
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if word.isalpha():
+            word = _stem(word)
+        if word not in GENERIC_TERMS:
+            terms.add(word)
+    return frozenset(terms)
+
+
+def _stem(word: str) -> str:
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for ending in ("ing", "ed"):
+        if len(word) > len(ending) + 3 and word.endswith(ending):
+            return word[:-len(ending)]
+    if len(word) > 5 and word.endswith("ise"):
+        return word[:-3] + "ize"
+    return word
+
+
+class HashedNgramEmbedder:
+    """
+    Dependency-light text embedding: word unigrams and character trigrams
+    hashed into a fixed number of signed buckets, L2-normalized.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def __call__(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = TOKEN_PATTERN.findall(text.lower())
+        features = list(words)
+        for word in words:
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+        for feature in features:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            sign = 1.0 if digest & 1 else -1.0
+            vector[(digest >> 1) % self.dim] += sign
+
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache: returns the stored value of the most similar
+    previous prompt when cosine similarity reaches the threshold and both
+    prompts have the same key terms, so "sort in python" is not served for
+    "sort in java" however close the embeddings are.
+
+    Embeddings live in one contiguous matrix so a lookup is a single
+    matrix-vector product; least recently used entries are evicted once
+    the matrix, including its spare rows, and the stored values exceed
+    max_bytes.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.6,
+        max_bytes: int = 64 * 1024 * 1024,
+        embedder: Callable[[str], np.ndarray] = None,
+        terms: Callable[[str], FrozenSet[str]] = key_terms,
+    ):
+        self.threshold = threshold
+        self.max_bytes = max_bytes
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.terms = terms
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._values = []
+        self._terms = []
+        self._value_bytes = []
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._clock = 0
+        self._size = 0
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "term_mismatches": 0, "evictions": 0}
+
+    def lookup(self, prompt: str) -> Optional[Tuple[Any, float]]:
+        """Return (value, similarity) for the nearest stored prompt, if close enough"""
+        query = self.embedder(prompt)
+        terms = self.terms(prompt)
+        with self._lock:
+            if self._size == 0:
+                self._stats["misses"] += 1
+                return None
+            similarities = self._vectors[:self._size] @ query
+            close = np.flatnonzero(similarities >= self.threshold)
+            matching = [index for index in close if self._terms[index] == terms]
+            if not matching:
+                self._stats["misses"] += 1
+                if len(close):
+                    self._stats["term_mismatches"] += 1
+                return None
+            best = int(max(matching, key=lambda index: similarities[index]))
+            similarity = float(similarities[best])
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self._stats["hits"] += 1
+            return json.loads(self._values[best]), similarity
+
+    def add(self, prompt: str, value: Any) -> None:
+        vector = self.embedder(prompt).astype(np.float32)
+        terms = self.terms(prompt)
+        encoded = json.dumps(value)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((16, vector.shape[0]), dtype=np.float32)
+                self._last_used = np.zeros(16, dtype=np.int64)
+            elif self._size == self._vectors.shape[0]:
+                # Double the matrix while the budget allows, otherwise reuse the least recently used row
+                if self._bytes + self._matrix_bytes() * 2 <= self.max_bytes:
+                    self._vectors = np.concatenate([self._vectors, np.zeros_like(self._vectors)])
+                    self._last_used = np.concatenate([self._last_used, np.zeros_like(self._last_used)])
+                else:
+                    self._evict_lru()
+
+            self._clock += 1
+            self._vectors[self._size] = vector
+            self._last_used[self._size] = self._clock
+            self._values.append(encoded)
+            self._terms.append(terms)
+            self._value_bytes.append(len(encoded) + sum(len(term) for term in terms))
+            self._bytes += self._value_bytes[-1]
+            self._size += 1
+
+            while self._bytes + self._matrix_bytes() > self.max_bytes and self._size > 1:
+                self._evict_lru()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._size
+            stats["bytes"] = self._bytes + self._matrix_bytes()
+            stats["max_bytes"] = self.max_bytes
+            stats["threshold"] = self.threshold
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _matrix_bytes(self) -> int:
+        """Allocated embedding and recency rows, used or spare"""
+        return 0 if self._vectors is None else self._vectors.nbytes + self._last_used.nbytes
+
+    def _evict_lru(self) -> None:
+        self._evict(int(np.argmin(self._last_used[:self._size])))
+
+    def _evict(self, index: int) -> None:
+        # Move the last row into the evicted slot to keep the matrix dense
+        last = self._size - 1
+        self._bytes -= self._value_bytes[index]
+        self._vectors[index] = self._vectors[last]
+        self._last_used[index] = self._last_used[last]
+        self._values[index] = self._values[last]
+        self._terms[index] = self._terms[last]
+        self._value_bytes[index] = self._value_bytes[last]
+        self._values.pop()
+        self._terms.pop()
+        self._value_bytes.pop()
+        self._size -= 1
+        self._stats["evictions"] += 1
@@ -0,0 +1,119 @@
+# single_flight.py
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+import copy
+import threading
+from Prompt_analyzer_Enhancer.metrics import METRICS
+
+SINGLE_FLIGHT_CALLS = METRICS.counter(
+    "prompt_single_flight_calls_total",
+    "Calls that went upstream (leader) or shared an identical in-flight call (follower)",
+    ("operation", "role"),
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncCall:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    In-flight request table: concurrent calls with the same key share one
+    execution. The first caller (leader) runs the function; callers that
+    arrive while it is running (followers) wait for it and get a copy of its
+    result, or its exception. Nothing is remembered once the call finishes.
+
+    Async callers share a task per event loop. A cancelled caller stops
+    waiting without disturbing the others; the shared call is cancelled
+    only when every caller has gone.
+    """
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._async_calls: Dict[Tuple[Any, str], _AsyncCall] = {}
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """fn's result and whether it was shared from another caller's call"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        self._count(leader)
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async counterpart of do"""
+        loop = asyncio.get_running_loop()
+        flight = (loop, key)
+        with self._lock:
+            call = self._async_calls.get(flight)
+            leader = call is None
+            if leader:
+                call = self._async_calls[flight] = _AsyncCall(loop.create_task(fn()))
+                call.task.add_done_callback(lambda _: self._forget(flight, call))
+            call.waiters += 1
+        self._count(leader)
+
+        try:
+            # shield: cancelling this caller must not cancel the call others wait on
+            result = await asyncio.shield(call.task)
+        finally:
+            with self._lock:
+                call.waiters -= 1
+                if call.waiters == 0 and not call.task.done():
+                    # Forget the call before cancelling it, so a caller arriving
+                    # now starts a new one instead of joining the cancelled task
+                    self._forget_locked(flight, call)
+                    call.task.cancel()
+        return (result, False) if leader else (copy.deepcopy(result), True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._async_calls)
+        calls = stats["leaders"] + stats["followers"]
+        stats["saved_rate"] = round(stats["followers"] / calls, 4) if calls else 0.0
+        return stats
+
+    def _count(self, leader: bool) -> None:
+        role = "leader" if leader else "follower"
+        with self._lock:
+            self._stats[f"{role}s"] += 1
+        SINGLE_FLIGHT_CALLS.inc(operation=self.operation, role=role)
+
+    def _forget(self, flight: Tuple[Any, str], call: _AsyncCall) -> None:
+        with self._lock:
+            self._forget_locked(flight, call)
+
+    def _forget_locked(self, flight: Tuple[Any, str], call: _AsyncCall) -> None:
+        if self._async_calls.get(flight) is call:
+            del self._async_calls[flight]
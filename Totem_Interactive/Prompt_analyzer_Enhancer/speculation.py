@@ -0,0 +1,61 @@
+# speculation.py
+from typing import Any, Dict, Optional
+import threading
+from Prompt_analyzer_Enhancer.heuristics import HeuristicScorer
+from Prompt_analyzer_Enhancer.metrics import METRICS
+
+SPECULATIONS = METRICS.counter(
+    "prompt_speculation_total",
+    "Speculative enhancements kept (hit), cancelled for a different analysis (miss) or failed",
+    ("outcome",),
+)
+SPECULATION_SAVED_SECONDS = METRICS.counter(
+    "prompt_speculation_saved_seconds_total", "Enhancement time that kept speculations overlapped with analysis"
+)
+
+
+class Speculation:
+    """
+    Guesses a prompt's analysis locally so enhancement can start before the
+    real analysis returns, and decides whether that enhancement still fits
+    once it does. task_type and complexity choose the enhancement model and
+    wording, so they must match. The missing elements are not compared: the
+    heuristic's canned labels rarely share wording with a model's.
+    """
+
+    def __init__(self):
+        self.heuristic_scorer = HeuristicScorer()
+        self._lock = threading.Lock()
+        self._stats = {"hit": 0, "miss": 0, "failed": 0, "saved_ms": 0.0}
+
+    @classmethod
+    def from_config(cls, config: Any) -> Optional["Speculation"]:
+        """Speculation, or None when it is off"""
+        if not config.speculative_enhancement:
+            return None
+        return cls()
+
+    def guess(self, prompt: str) -> Dict[str, Any]:
+        return self.heuristic_scorer.score(prompt)[0]
+
+    def agrees(self, guess: Dict[str, Any], analysis: Dict[str, Any]) -> bool:
+        return (guess.get("task_type"), guess.get("complexity")) == (
+            analysis.get("task_type"), analysis.get("complexity")
+        )
+
+    def record(self, outcome: str, saved_seconds: float = 0.0) -> None:
+        with self._lock:
+            self._stats[outcome] += 1
+            self._stats["saved_ms"] += saved_seconds * 1000
+        SPECULATIONS.inc(outcome=outcome)
+        if saved_seconds:
+            SPECULATION_SAVED_SECONDS.inc(saved_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        settled = stats["hit"] + stats["miss"] + stats["failed"]
+        stats["hit_rate"] = round(stats["hit"] / settled, 4) if settled else 0.0
+        stats["mean_saved_ms"] = round(stats["saved_ms"] / stats["hit"], 2) if stats["hit"] else 0.0
+        stats["saved_ms"] = round(stats["saved_ms"], 2)
+        return stats
@@ -1,9 +1,14 @@
 # templates.py
-from langchain.prompts import PromptTemplate
+from typing import Any, Dict
+import re
+from langchain_core.prompts import PromptTemplate
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
 
-def create_analysis_prompt_template() -> PromptTemplate:
-    """Create comprehensive analysis prompt template"""
-    analysis_template = """Perform an in-depth prompt analysis with these guidelines:
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+# Every template keeps its variables after the instructions, so the text up to
+# the first placeholder is an identical prefix on every call (see static_prefix)
+_ANALYSIS_TEMPLATE = """Perform an in-depth prompt analysis with these guidelines:
 
     Analysis Criteria:
     1. Identify primary task type
@@ -20,26 +25,107 @@ def create_analysis_prompt_template() -> PromptTemplate:
 
     Prompt: {prompt}
     """
-    return PromptTemplate(input_variables=["prompt"], template=analysis_template)
 
+_STRUCTURED_ANALYSIS_TEMPLATE = """Analyze this prompt: identify its task type and complexity, list missing contextual elements, and score its context and clarity from 0 to 1.
 
-def create_prompt_enhancer_template() -> PromptTemplate:
-    """Enhance prompt by addressing missing elements and improving clarity"""
-    prompt_enhancer_template = """Enhance the given prompt to be concise and clear, addressing any missing elements.
-    Ensure the prompt is specific and includes detailed instructions.
+    Prompt: {prompt}
+    """
+
+_BATCH_ANALYSIS_TEMPLATE = """Perform an in-depth prompt analysis of each prompt below with these guidelines:
+
+    Analysis Criteria:
+    1. Identify primary task type
+    2. Assess prompt complexity
+    3. Determine missing contextual elements
+    4. Evaluate context and clarity scores
+
+    Provide output as a JSON array with one object per prompt, each with:
+    - id (the prompt's id, unchanged)
+    - task_type (string)
+    - complexity (Low/Medium/High)
+    - missing_elements (list)
+    - context_score (0-1)
+    - clarity_score (0-1)
+
+    Prompts (JSON array of id and prompt):
+    {prompts}
+    """
+
+_PROMPT_ENHANCER_TEMPLATE = """Enhance the given prompt to be concise, clear and specific, addressing the missing elements.
+    State the task first, then add detailed steps, the missing elements and any necessary context.
+    Focus on adding specificity and clarity without unnecessary details.
 
-    Original Prompt: {prompt}
     Task Type: {task_type}
     Complexity: {complexity}
     Missing Elements: {missing_elements}
+    Original Prompt: {prompt}
+
+    Enhanced Prompt:
+    """
 
-    Provide a concise, clear enhancement of the original prompt that addresses any missing elements.
-    Focus on adding specificity and clarity without unnecessary details.
 
-    Enhanced Prompt: Write a {task_type} to {prompt}. 
-    Include detailed steps, {missing_elements}, and any necessary context for clarity.
+def compile_template(template: str) -> str:
+    """
+    Strip indentation, trailing and repeated whitespace from a template;
+    blank lines collapse to one. Each placeholder may appear only once, so
+    no call sends the same user text twice.
     """
+    lines = [" ".join(line.split()) for line in template.strip().splitlines()]
+    compiled = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+    variables = _PLACEHOLDER.findall(compiled)
+    repeated = sorted({name for name in variables if variables.count(name) > 1})
+    if repeated:
+        raise ValueError(f"Template interpolates {repeated} more than once")
+    return compiled
+
+
+def static_prefix(template: str) -> str:
+    """The instruction text before the first placeholder, identical on every call"""
+    match = _PLACEHOLDER.search(template)
+    return template[:match.start()] if match else template
+
+
+def create_analysis_prompt_template() -> PromptTemplate:
+    """Create comprehensive analysis prompt template"""
+    return PromptTemplate(input_variables=["prompt"], template=compile_template(_ANALYSIS_TEMPLATE))
+
+
+def create_structured_analysis_prompt_template() -> PromptTemplate:
+    """Short analysis prompt for structured output; the schema carries the format"""
+    return PromptTemplate(input_variables=["prompt"], template=compile_template(_STRUCTURED_ANALYSIS_TEMPLATE))
+
+
+def create_batch_analysis_prompt_template() -> PromptTemplate:
+    """Analysis of several prompts in one call; {prompts} is a JSON array of id and prompt"""
+    return PromptTemplate(input_variables=["prompts"], template=compile_template(_BATCH_ANALYSIS_TEMPLATE))
+
+
+def create_prompt_enhancer_template() -> PromptTemplate:
+    """Enhance prompt by addressing missing elements and improving clarity"""
     return PromptTemplate(
         input_variables=["prompt","task_type","complexity","missing_elements"],
-        template=prompt_enhancer_template,
+        template=compile_template(_PROMPT_ENHANCER_TEMPLATE),
     )
+
+
+TEMPLATES = {
+    "analysis": (_ANALYSIS_TEMPLATE, create_analysis_prompt_template),
+    "structured_analysis": (_STRUCTURED_ANALYSIS_TEMPLATE, create_structured_analysis_prompt_template),
+    "batch_analysis": (_BATCH_ANALYSIS_TEMPLATE, create_batch_analysis_prompt_template),
+    "enhancement": (_PROMPT_ENHANCER_TEMPLATE, create_prompt_enhancer_template),
+}
+
+
+def template_report() -> Dict[str, Dict[str, Any]]:
+    """Estimated input tokens per template before and after compilation, excluding variables"""
+    report = {}
+    for name, (source, factory) in TEMPLATES.items():
+        template = factory().template
+        static = _PLACEHOLDER.sub("", template)
+        report[name] = {
+            "source_tokens": estimate_tokens(_PLACEHOLDER.sub("", source)),
+            "tokens": estimate_tokens(static),
+            "prefix_tokens": estimate_tokens(static_prefix(template)),
+            "variables": _PLACEHOLDER.findall(template),
+        }
+    return report
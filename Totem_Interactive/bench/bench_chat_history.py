@@ -0,0 +1,111 @@
+# bench_chat_history.py
+#
+# Streamlit rerun time as the chat history grows: the app as it is (bounded
+# window in memory, older turns in SQLite, drawn once) against the previous
+# app, which kept every turn in session state and drew them all twice. Runs
+# the scripts headless with streamlit.testing, no model calls.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_chat_history.py
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict
+from streamlit.testing.v1 import AppTest
+from Prompt_analyzer_Enhancer.chat_history import ChatHistory, ChatStore
+
+SAMPLE_OUTPUT = {
+    "analysis": {
+        "task_type": "code",
+        "complexity": "Medium",
+        "missing_elements": ["Input data format", "Expected output", "Constraints"],
+        "context_score": 0.4,
+        "clarity_score": 0.6,
+    },
+    "recommended_llm": {"model": "gpt-4", "reasoning": "Best overall score for code at Medium complexity"},
+    "enhanced_prompt": {
+        "text": "Write a Python function that sorts a list of integers in ascending order. " * 8,
+        "technique": "Specification Expansion",
+        "improvement_metrics": {"clarity": 1.0, "context": 0.9, "specificity": 0.6},
+    },
+    "timings": {"analysis_ms": 812.4, "selection_ms": 0.2, "enhancement_ms": 1530.9, "total_ms": 2343.5},
+}
+
+
+def legacy_app():
+    # The chat section of streamlit_app.main before the history was bounded
+    import streamlit as st
+
+    st.title("Prompt Analyzer and Enhancer")
+    for chat in st.session_state.chat_history:
+        st.markdown(f"**User:** {chat['User']}")
+        st.json(chat["Assistant"])
+    with st.form(key="user_input_form", clear_on_submit=True):
+        st.text_input("You:")
+        st.checkbox("Stream the enhanced prompt", value=True)
+        st.form_submit_button(label="Send")
+    for chat in st.session_state.chat_history:
+        st.markdown(f"**User:** {chat['User']}")
+        st.json(chat["Assistant"])
+
+
+def rerun_ms(app: AppTest, runs: int) -> float:
+    app.run()  # first run builds the page; reruns are what a user waits on after each message
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        app.run()
+        times.append(time.perf_counter() - started)
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    return round(statistics.median(times) * 1000, 1)
+
+
+def measure(turns: int, args: argparse.Namespace, store: ChatStore) -> Dict[str, Any]:
+    legacy = AppTest.from_function(legacy_app, default_timeout=120)
+    legacy.session_state["chat_history"] = [{"User": f"prompt {i}", "Assistant": SAMPLE_OUTPUT} for i in range(turns)]
+
+    history = ChatHistory(store, window=args.window)
+    for i in range(turns):
+        history.append(f"prompt {i}", SAMPLE_OUTPUT)
+    current = AppTest.from_file("../streamlit_app.py", default_timeout=120)
+    current.session_state["chat_history"] = history
+
+    return {
+        "legacy_ms": rerun_ms(legacy, args.runs),
+        "bounded_ms": rerun_ms(current, args.runs),
+        "legacy_turns_in_memory": turns,
+        "bounded_turns_in_memory": len(history.recent),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit rerun time against chat history length")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--window", type=int, default=20, help="CHAT_HISTORY_WINDOW")
+    parser.add_argument("--runs", type=int, default=5, help="timed reruns per length")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    # Filling session state from outside a script run warns on every access
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["CHAT_HISTORY_PATH"] = os.path.join(directory, "chat_history.db")
+        store = ChatStore(os.environ["CHAT_HISTORY_PATH"])
+        report: Dict[str, Any] = {str(turns): measure(turns, args, store) for turns in args.turns}
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"{'turns':>6}{'legacy ms':>11}{'bounded ms':>12}{'turns in memory':>17}")
+    for turns, row in report.items():
+        memory = f"{row['legacy_turns_in_memory']} -> {row['bounded_turns_in_memory']}"
+        print(f"{turns:>6}{row['legacy_ms']:>11}{row['bounded_ms']:>12}{memory:>17}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench_long_prompts.py
+#
+# Analysis latency against prompt length, sending the whole prompt in one
+# call versus chunked map-reduce analysis, against a FakeChatModel whose
+# latency grows with input and output tokens. Also reports the LLM calls per
+# analysis, the local split/merge overhead and which lengths the admission
+# limit would reject.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_long_prompts.py
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import time
+from typing import Any, Dict
+from bench.bench_pipeline import PROMPTS, build_config
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from Prompt_analyzer_Enhancer.chunking import merge_analyses, split_prompt
+from Prompt_analyzer_Enhancer.rate_limit import estimate_tokens
+
+FILLER = (
+    "The quarterly report covers revenue, churn and support volume for each region. "
+    "def normalize(rows):\n    return [row.strip().lower() for row in rows if row]\n"
+    "Customers in the northern region renewed at a higher rate after the pricing change. "
+)
+
+
+def long_prompt(tokens: int, seed: int) -> str:
+    """An instruction followed by a pasted document of roughly the given size"""
+    rng = random.Random(seed)
+    paragraphs = [rng.choice(PROMPTS)]
+    while estimate_tokens("\n\n".join(paragraphs)) < tokens:
+        sentences = FILLER.split(". ")
+        paragraphs.append(". ".join(rng.sample(sentences, len(sentences))))
+    return "\n\n".join(paragraphs)
+
+
+async def measure(args: argparse.Namespace, tokens: int, chunk_tokens: int) -> Dict[str, Any]:
+    config = build_config(args)
+    config.analysis_chunk_tokens = chunk_tokens
+    config.analysis_chunk_concurrency = args.chunk_concurrency
+    fake = config.router.backends["fake-0"]
+    fake.input_token_latency = args.input_token_latency
+    fake.output_token_latency = args.output_token_latency
+    analyzer = PromptAnalyzer(config)
+
+    latencies = []
+    for run in range(args.runs):
+        # A fresh prompt per run so nothing is served from a cache or an in-flight call
+        prompt = long_prompt(tokens, seed=run)
+        started = time.perf_counter()
+        await analyzer.analyze_prompt_async(prompt, raise_errors=True)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "median_ms": round(statistics.median(latencies) * 1000, 1),
+        "calls_per_analysis": round(fake.calls / args.runs, 1),
+    }
+
+
+def local_overhead_ms(tokens: int, chunk_tokens: int) -> float:
+    """Time to split the prompt and merge per-chunk analyses, without any model call"""
+    prompt = long_prompt(tokens, seed=0)
+    started = time.perf_counter()
+    chunks = split_prompt(prompt, chunk_tokens)
+    analyses = [
+        {"task_type": "code", "complexity": "Medium", "missing_elements": ["Expected output"],
+         "context_score": 0.5, "clarity_score": 0.5}
+        for _ in chunks
+    ]
+    merge_analyses(analyses, [estimate_tokens(chunk) for chunk in chunks])
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    logging.disable(logging.WARNING)
+    results = {}
+    for tokens in args.lengths:
+        results[str(tokens)] = {
+            "whole": await measure(args, tokens, chunk_tokens=0),
+            "chunked": await measure(args, tokens, args.chunk_tokens),
+            "split_merge_ms": local_overhead_ms(tokens, args.chunk_tokens),
+            "admitted": not args.max_prompt_tokens or tokens <= args.max_prompt_tokens,
+        }
+    return {"settings": {key: value for key, value in vars(args).items() if key != "json"}, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis latency against prompt length, whole versus chunked")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[250, 1000, 4000, 16000, 32000, 64000])
+    parser.add_argument("--chunk-tokens", type=int, default=4000, help="ANALYSIS_CHUNK_TOKENS")
+    parser.add_argument("--chunk-concurrency", type=int, default=4, help="ANALYSIS_CHUNK_CONCURRENCY")
+    parser.add_argument("--max-prompt-tokens", type=int, default=32000, help="MAX_PROMPT_TOKENS")
+    parser.add_argument("--runs", type=int, default=3, help="analyses per length and mode")
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed fake model latency in seconds")
+    parser.add_argument("--input-token-latency", type=float, default=0.00005, help="seconds per input token")
+    parser.add_argument("--output-token-latency", type=float, default=0.004, help="seconds per output token")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    # build_config reads the bench_pipeline options too
+    args.jitter, args.error_rate, args.slow_rate, args.slow_latency, args.seed = 0.0, 0.0, 0.0, 0.0, 0
+    args.backends, args.hedge, args.retries, args.concurrency = 1, False, 0, [1]
+    args.heuristic_agreement = 0.0
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'tokens':>7}{'whole ms':>10}{'chunked ms':>12}{'chunks':>8}{'split+merge ms':>16}  admitted")
+    for tokens, row in report["results"].items():
+        print(
+            f"{tokens:>7}{row['whole']['median_ms']:>10}{row['chunked']['median_ms']:>12}"
+            f"{row['chunked']['calls_per_analysis']:>8}{row['split_merge_ms']:>16}  {'yes' if row['admitted'] else 'no'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# bench_micro_batch.py
+#
+# Analysis throughput, latency and input tokens per prompt with and without
+# micro-batching, against FakeChatModel. Each mode analyzes the same distinct
+# prompts; batched answers are checked against the per-request ones, and
+# --error-rate exercises the per-item fallback of failed batches.
+#
+# With unlimited parallel calls a batch is slower than its prompts sent
+# separately, since its answers are generated one after another; --rpm puts
+# the run under a steady requests-per-minute budget, where it is not.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_micro_batch.py
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict
+from bench.bench_pipeline import PROMPTS, _percentile_ms, build_config
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from Prompt_analyzer_Enhancer.rate_limit import TokenBucketLimiter
+from Prompt_analyzer_Enhancer.resilience import CircuitBreaker
+
+
+async def run_mode(args: argparse.Namespace, concurrency: int, batching: Dict[str, Any] = None) -> Dict[str, Any]:
+    config = build_config(argparse.Namespace(**{**vars(args), "concurrency": [concurrency], "backends": 1}))
+    config.analysis_batching = batching
+    # Injected failures should reach the retries and the per-item fallback, not open the breaker
+    config.guard.breaker = CircuitBreaker(failure_threshold=args.requests * 4)
+    if args.rpm:
+        config.guard.limiter = TokenBucketLimiter(requests_per_minute=args.rpm)
+        # Start from an empty bucket: the steady rate, not the one-minute burst
+        for _ in range(args.rpm):
+            config.guard.limiter.acquire()
+    analyzer = PromptAnalyzer(config)
+    fake = config.router.backends["fake-0"]
+    fake.output_token_latency = args.output_token_latency
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    analyses = {}
+
+    async def one(index: int) -> None:
+        prompt = f"{PROMPTS[index % len(PROMPTS)]} (request {index})"
+        async with semaphore:
+            started = time.perf_counter()
+            analyses[prompt] = await analyzer.analyze_prompt_async(prompt)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(args.requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    row = {
+        "throughput_rps": round(args.requests / wall, 2),
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p95_ms": _percentile_ms(latencies, 95),
+        "llm_calls": fake.calls,
+        "input_tokens_per_prompt": round(fake.input_tokens / args.requests, 1),
+    }
+    if analyzer.batcher is not None:
+        row["batching"] = analyzer.batcher.stats()
+    return {"row": row, "analyses": analyses}
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # Injected failures would otherwise log a warning per batch
+    logging.disable(logging.WARNING)
+    batching = {"window": args.window_ms / 1000, "max_size": args.max_size, "max_tokens": args.max_tokens}
+    results = {}
+    for concurrency in args.concurrency:
+        single = await run_mode(args, concurrency)
+        batched = await run_mode(args, concurrency, batching)
+        mismatches = sum(batched["analyses"][prompt] != analysis for prompt, analysis in single["analyses"].items())
+        results[str(concurrency)] = {
+            "per_request": single["row"],
+            "batched": {**batched["row"], "mismatches": mismatches},
+        }
+    return {"settings": {key: value for key, value in vars(args).items() if key != "json"}, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analysis micro-batching benchmark with a fake chat model")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--window-ms", type=float, default=20.0, help="batch collection window")
+    parser.add_argument("--max-size", type=int, default=16, help="prompts per batch")
+    parser.add_argument("--max-tokens", type=int, default=4000, help="estimated prompt tokens per batch")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--output-token-latency", type=float, default=0.001, help="seconds per output token")
+    parser.add_argument("--rpm", type=int, default=0, help="requests-per-minute budget, 0 for none")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake model calls that fail")
+    parser.add_argument("--retries", type=int, default=2, help="guard retries per LLM call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    # build_config reads the bench_pipeline options too
+    args.slow_rate, args.slow_latency, args.hedge = 0.0, 0.0, False
+    args.heuristic_agreement = 0.0
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'conc':>5} {'mode':<12}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'calls':>7}{'tokens/prompt':>15}  batching")
+    for concurrency, modes in report["results"].items():
+        for mode, row in modes.items():
+            batching = row.get("batching")
+            detail = "-"
+            if batching:
+                detail = (
+                    f"mean size {batching['mean_batch_size']}, single {batching['single']}, "
+                    f"fallback {batching['fallback']}, mismatches {row['mismatches']}"
+                )
+            print(
+                f"{concurrency:>5} {mode:<12}{row['throughput_rps']:>9}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                f"{row['llm_calls']:>7}{row['input_tokens_per_prompt']:>15}  {detail}"
+            )
+
+
+if __name__ == "__main__":
+    main()
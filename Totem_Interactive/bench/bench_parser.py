@@ -0,0 +1,104 @@
+# bench_parser.py
+#
+# Micro-benchmark for PromptAnalyzer._parse_analysis over real and malformed
+# LLM responses, compared with the previous regex-scraping parser.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_parser.py
+
+import argparse
+import json
+import re
+import timeit
+from types import SimpleNamespace
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+
+PROMPT = "Write a sorting algorithm in Python."
+
+REAL_RESPONSE = """```json
+{
+  "task_type": "code",
+  "complexity": "Low",
+  "missing_elements": [
+    "Sorting algorithm type (e.g., bubble sort, merge sort, quicksort)",
+    "Input data type (e.g., integers, floats, strings)",
+    "Desired output format (e.g., in-place sorting, return a new sorted list)",
+    "Constraints on space and time complexity"
+  ],
+  "context_score": 0.2,
+  "clarity_score": 0.7
+}
+```"""
+
+CORPUS = {
+    "fenced_json": REAL_RESPONSE,
+    "bare_json": REAL_RESPONSE.strip("`").replace("json\n", "", 1),
+    "prose_wrapped": "Here is my analysis of the prompt.\n\n" + REAL_RESPONSE + "\n\nLet me know if you need more.",
+    "trailing_comma": '{"task_type": "writing", "complexity": "Medium", "missing_elements": ["audience", "tone",], '
+                      '"context_score": 0.4, "clarity_score": 0.6,}',
+    "unquoted_keys": "{task_type: analysis, complexity: High, missing elements: [\"dataset\", \"time range\"], "
+                     "context_score: 0.3, clarity_score: 0.5}",
+    "no_json": "The prompt is a coding request of low complexity but it lacks detail about inputs.",
+    "long_output": "Analysis notes:\n" + ("The prompt could mention more constraints. " * 400) + REAL_RESPONSE
+                   + ("\nAdditional commentary {not json} follows. " * 200),
+    "long_unfenced": ("The prompt could mention more constraints. " * 400) + REAL_RESPONSE.strip("`")[4:]
+                     + ("\nAdditional commentary {not json} follows. " * 200),
+}
+
+
+def legacy_parse(response: str, prompt: str) -> dict:
+    """The previous parser: greedy DOTALL search plus per-field rescans"""
+    json_match = re.search(r"\{.*\}", response, re.DOTALL)
+    if not json_match:
+        return {"task_type": "general"}
+    parsed = json_match.group(0)
+    task_type = next((t for t in ["code", "writing", "analysis", "general"] if t in parsed.lower()), "general")
+    complexity = next((c for c in ["Low", "Medium", "High"] if c.lower() in parsed.lower()), "Medium")
+    missing = ["Insufficient context details"]
+    for pattern in [r'"missing_elements":\s*\[(.*?)\]', r"missing\s*elements?:\s*\[(.*?)\]"]:
+        match = re.search(pattern, parsed, re.IGNORECASE | re.DOTALL)
+        if match:
+            missing = [e.strip() for e in re.findall(r'"([^"]*)"', match.group(1)) if e.strip()]
+            break
+    scores = {}
+    for score_type in ["context", "clarity"]:
+        match = re.search(f'"{score_type}_score":\\s*(\\d+\\.?\\d*)', parsed)
+        scores[score_type] = float(match.group(1)) if match else 0.5
+    return {"task_type": task_type, "complexity": complexity, "missing_elements": missing, **scores}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzer response parser micro-benchmark")
+    parser.add_argument("--number", type=int, default=2000, help="parses per corpus entry")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    analyzer = PromptAnalyzer(SimpleNamespace(
+        llm=None, cache=None, fast_analysis=False, fast_analysis_threshold=1.0, structured_analysis=False,
+        semantic_cache=None, analysis_batching=None, analysis_chunk_tokens=0, analysis_chunk_concurrency=1,
+        guard=None, router=None,
+    ))
+
+    report = {}
+    for name, response in CORPUS.items():
+        current = timeit.timeit(lambda: analyzer._parse_analysis(response, PROMPT), number=args.number)
+        legacy = timeit.timeit(lambda: legacy_parse(response, PROMPT), number=args.number)
+        report[name] = {
+            "chars": len(response),
+            "current_us": round(current / args.number * 1e6, 2),
+            "legacy_us": round(legacy / args.number * 1e6, 2),
+            "result": analyzer._parse_analysis(response, PROMPT),
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'response':<16}{'chars':>8}{'current us':>12}{'legacy us':>12}  task_type/complexity")
+    for name, row in report.items():
+        result = row["result"]
+        print(f"{name:<16}{row['chars']:>8}{row['current_us']:>12}{row['legacy_us']:>12}  "
+              f"{result['task_type']}/{result['complexity']}")
+
+
+if __name__ == "__main__":
+    main()
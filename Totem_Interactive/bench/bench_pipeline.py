@@ -0,0 +1,270 @@
+# bench_pipeline.py
+#
+# Offline load test of PromptAnalyzer, LLMSelector, PromptEnhancer, the full
+# pipeline (also with speculative enhancement) and the FastAPI endpoints
+# against FakeChatModel. Reports
+# throughput, p50/p95/p99 latency, error rate and peak traced memory per
+# concurrency level; --output saves the JSON report and --baseline compares
+# against a saved one (exit status 1 on a regression beyond --tolerance).
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_pipeline.py
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+import httpx
+from bench.fake_llm import FakeChatModel
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from Prompt_analyzer_Enhancer.backends import BackendRouter
+from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
+from Prompt_analyzer_Enhancer.pipeline import PromptPipeline
+from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+from Prompt_analyzer_Enhancer.registry import ComponentRegistry
+from Prompt_analyzer_Enhancer.resilience import LLMGuard
+from Prompt_analyzer_Enhancer.speculation import Speculation
+
+PROMPTS = [
+    "Write a sorting algorithm in Python.",
+    "Write a blog post about remote work for engineering managers",
+    "Analyze the sales data for 2023 and find the top regions",
+    "Explain how binary search works",
+    "Create a SQL query to find duplicate rows in the orders table",
+    "Draft an email asking for a deadline extension",
+    "Implement a linked list in C++ with insert and delete",
+    "Summarize this article about climate change",
+]
+
+SAMPLE_ANALYSIS = {
+    "task_type": "code",
+    "complexity": "Medium",
+    "missing_elements": ["Input data format", "Expected output"],
+    "context_score": 0.4,
+    "clarity_score": 0.6,
+}
+
+Call = Callable[[str], Awaitable[Any]]
+
+
+def build_config(args: argparse.Namespace) -> SimpleNamespace:
+    """Stand-in for Config: fake backends, no caches, the production guard"""
+    backends = {
+        f"fake-{index}": FakeChatModel(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            slow_rate=args.slow_rate,
+            slow_latency=args.slow_latency,
+            seed=args.seed + index,
+            heuristic_agreement=args.heuristic_agreement,
+        )
+        for index in range(args.backends)
+    }
+    # With several backends every stage routes across all of them
+    router = BackendRouter(backends, {"default": list(backends)}, hedge=args.hedge)
+    return SimpleNamespace(
+        llm=router.model("default"),
+        router=router,
+        cache=None,
+        fast_analysis=False,
+        fast_analysis_threshold=1.0,
+        structured_analysis=False,
+        speculative_enhancement=False,
+        selection_policy="score",
+        model_profiles_path=None,
+        semantic_cache=None,
+        analysis_batching=None,
+        analysis_chunk_tokens=4000,
+        analysis_chunk_concurrency=4,
+        guard=LLMGuard(max_retries=args.retries, base_delay=0.01),
+        job_queue=None,
+        max_concurrency=max(args.concurrency),
+    )
+
+
+def build_scenarios(config: SimpleNamespace) -> Tuple[Dict[str, Call], Speculation]:
+    analyzer = PromptAnalyzer(config)
+    selector = LLMSelector()
+    enhancer = PromptEnhancer(config)
+    pipeline = PromptPipeline(analyzer, selector, enhancer)
+    speculative = PromptPipeline(analyzer, selector, enhancer, Speculation())
+
+    import main
+
+    # Point the app at the fake-model components; the lifespan warm-up is not run
+    main.registry = ComponentRegistry(lambda: config)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+    async def select(prompt: str) -> Any:
+        return selector.select_model(SAMPLE_ANALYSIS)
+
+    async def api(prompt: str) -> Any:
+        response = await client.post("/process-prompt", json={"prompt": prompt})
+        response.raise_for_status()
+        return response.json()
+
+    return {
+        "analyzer": lambda prompt: analyzer.analyze_prompt_async(prompt, raise_errors=True),
+        "selector": select,
+        "enhancer": lambda prompt: enhancer.enhance_prompt_async(prompt, SAMPLE_ANALYSIS, raise_errors=True),
+        "pipeline": lambda prompt: pipeline.process_async(prompt, raise_errors=True),
+        "speculative": lambda prompt: speculative.process_async(prompt, raise_errors=True),
+        "api": api,
+    }, speculative.speculation
+
+
+async def run_level(call: Call, requests: int, concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        # Distinct prompts so no layer can serve a repeat
+        prompt = f"{PROMPTS[index % len(PROMPTS)]} (request {index})"
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(prompt)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / wall, 2),
+        "p50_ms": _percentile_ms(latencies, 50),
+        "p95_ms": _percentile_ms(latencies, 95),
+        "p99_ms": _percentile_ms(latencies, 99),
+        "error_rate": round(errors / requests, 4),
+    }
+
+
+async def peak_memory_kb(call: Call, requests: int, concurrency: int) -> float:
+    """Peak Python allocations while serving a run, measured in a separate pass"""
+    tracemalloc.start()
+    try:
+        await run_level(call, requests, concurrency)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lines describing throughput drops or p95 increases beyond tolerance"""
+    regressions = []
+    for scenario, levels in report["results"].items():
+        for level, current in levels.items():
+            previous = baseline.get("results", {}).get(scenario, {}).get(level)
+            if not previous:
+                continue
+            if current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+                regressions.append(
+                    f"{scenario} c={level}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps"
+                )
+            if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(f"{scenario} c={level}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+    return regressions
+
+
+def _percentile_ms(sorted_values: List[float], percentile: float) -> float:
+    index = max(0, math.ceil(percentile / 100 * len(sorted_values)) - 1)
+    return round(sorted_values[index] * 1000, 2)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios, speculation = build_scenarios(build_config(args))
+    # Injected failures would otherwise log a fallback warning per request
+    logging.disable(logging.WARNING)
+
+    results = {}
+    for name in args.scenarios:
+        results[name] = {}
+        for concurrency in args.concurrency:
+            row = await run_level(scenarios[name], args.requests, concurrency)
+            if args.memory:
+                row["peak_memory_kb"] = await peak_memory_kb(
+                    scenarios[name], min(args.requests, 50), concurrency
+                )
+            results[name][str(concurrency)] = row
+    return {
+        "settings": {
+            "requests": args.requests,
+            "latency_ms": args.latency * 1000,
+            "jitter_ms": args.jitter * 1000,
+            "error_rate": args.error_rate,
+            "slow_rate": args.slow_rate,
+            "retries": args.retries,
+            "backends": args.backends,
+            "hedge": args.hedge,
+            "seed": args.seed,
+            "heuristic_agreement": args.heuristic_agreement,
+        },
+        "results": results,
+        "speculation": speculation.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline and API benchmark with a fake chat model")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--scenarios", nargs="+", default=["analyzer", "selector", "enhancer", "pipeline", "speculative", "api"])
+    parser.add_argument("--latency", type=float, default=0.02, help="fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.005, help="uniform +/- latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake model calls that fail")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="share of fake model calls that stall")
+    parser.add_argument("--slow-latency", type=float, default=0.5, help="latency of a stalled call in seconds")
+    parser.add_argument("--retries", type=int, default=2, help="guard retries per LLM call")
+    parser.add_argument("--backends", type=int, default=1, help="identical fake backends to route across")
+    parser.add_argument("--no-hedge", dest="hedge", action="store_false", help="disable hedged requests")
+    parser.add_argument("--heuristic-agreement", type=float, default=0.5,
+                        help="share of fake analyses that match the heuristic guess")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip the tracemalloc pass")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'scenario':<12}{'conc':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'peak KB':>10}")
+        for name, levels in report["results"].items():
+            for concurrency, row in levels.items():
+                print(f"{name:<12}{concurrency:>6}{row['throughput_rps']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+                      f"{row['p99_ms']:>10}{row['error_rate']:>8}{row.get('peak_memory_kb', '-'):>10}")
+        if "speculative" in report["results"]:
+            speculation = report["speculation"]
+            print(f"speculation: hit rate {speculation['hit_rate']}, {speculation['hit']} hits, "
+                  f"{speculation['miss']} misses, mean saved {speculation['mean_saved_ms']} ms per hit")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
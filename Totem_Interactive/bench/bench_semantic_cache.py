@@ -0,0 +1,135 @@
+# bench_semantic_cache.py
+#
+# Hit rate versus similarity threshold for SemanticCache, with its key-term
+# check, on paraphrase pairs (should hit), near misses that differ in one key
+# detail and unrelated prompts (both should miss), plus lookup latency and
+# memory as the store grows.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_semantic_cache.py
+
+import argparse
+import json
+import random
+import time
+from Prompt_analyzer_Enhancer.semantic_cache import SemanticCache
+
+PARAPHRASES = [
+    ("write a sort in python", "python sorting code"),
+    ("Write a sorting algorithm in Python.", "write a python sorting algorithm"),
+    ("write code for sorting array", "code to sort an array"),
+    ("Write a blog post about remote work", "blog post on remote work"),
+    ("analyze the sales data for 2023", "analyze 2023 sales data"),
+    ("explain how binary search works", "how does binary search work"),
+    ("summarize this article about climate change", "summarise the climate change article"),
+    ("write a function to reverse a string in javascript", "javascript function that reverses a string"),
+    ("draft an email asking for a deadline extension", "email draft asking to extend the deadline"),
+    ("create a SQL query to find duplicate rows", "sql query finding duplicate rows"),
+    ("implement a linked list in C++", "c++ linked list implementation"),
+    ("give me a recipe for banana bread", "banana bread recipe"),
+    ("what is the capital of australia", "capital of australia?"),
+    ("translate this paragraph into french", "translate the paragraph to french"),
+    ("write unit tests for the login function", "unit tests for the login function"),
+    ("compare react and vue for a small project", "react vs vue comparison for a small project"),
+    ("plot monthly revenue for 2022 as a bar chart", "bar chart of 2022 monthly revenue"),
+    ("write a cover letter for a data engineer role", "cover letter for a data engineer position"),
+]
+
+# Same wording, different meaning: a hit here returns a wrong analysis
+NEAR_MISSES = [
+    ("write a sort in python", "write a sort in java"),
+    ("analyze the sales data for 2023", "analyze the sales data for 2021"),
+    ("write a short story for children", "write a short story for adults"),
+    ("explain how binary search works", "explain how linear search works"),
+    ("create a SQL query to find duplicate rows", "create a SQL query to delete duplicate rows"),
+    ("implement a linked list in C++", "implement a linked list in C"),
+    ("give me a recipe for banana bread", "give me a recipe for banana cake"),
+    ("what is the capital of australia", "what is the capital of austria"),
+    ("translate this paragraph into french", "translate this paragraph into german"),
+    ("write unit tests for the login function", "write unit tests for the logout function"),
+    ("plot monthly revenue for 2022 as a bar chart", "plot monthly revenue for 2022 as a pie chart"),
+    ("summarize the article in 3 bullet points", "summarize the article in 5 bullet points"),
+    ("convert this python script to javascript", "convert this javascript script to python"),
+]
+
+UNRELATED = [
+    "write a poem about the ocean",
+    "implement a hash map in rust",
+    "analyze customer churn in the telecom dataset",
+    "suggest a weekly meal plan for a vegetarian",
+    "explain the causes of the first world war",
+    "write a resignation letter",
+    "design a REST API for a todo app",
+    "how tall is mount everest",
+    "review this pull request for security issues",
+    "outline a marketing plan for a coffee shop",
+]
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9, 0.95]
+
+
+def hit_rates(threshold: float) -> dict:
+    cache = SemanticCache(threshold=threshold)
+    for original, _ in PARAPHRASES:
+        cache.add(original, {"prompt": original})
+
+    true_hits = sum(cache.lookup(paraphrase) is not None for _, paraphrase in PARAPHRASES)
+    unrelated_hits = sum(cache.lookup(prompt) is not None for prompt in UNRELATED)
+
+    near_miss_cache = SemanticCache(threshold=threshold)
+    for original, _ in NEAR_MISSES:
+        near_miss_cache.add(original, {"prompt": original})
+    near_miss_hits = sum(near_miss_cache.lookup(variant) is not None for _, variant in NEAR_MISSES)
+    return {
+        "threshold": threshold,
+        "paraphrase_hit_rate": round(true_hits / len(PARAPHRASES), 2),
+        "near_miss_hit_rate": round(near_miss_hits / len(NEAR_MISSES), 2),
+        "unrelated_hit_rate": round(unrelated_hits / len(UNRELATED), 2),
+    }
+
+
+def lookup_latency(store_size: int, lookups: int = 200) -> dict:
+    rng = random.Random(0)
+    vocabulary = " ".join(p for pair in PARAPHRASES for p in pair).split() + " ".join(UNRELATED).split()
+    cache = SemanticCache()
+    for i in range(store_size):
+        cache.add(" ".join(rng.choices(vocabulary, k=8)) + f" {i}", {"i": i})
+
+    queries = [" ".join(rng.choices(vocabulary, k=8)) for _ in range(lookups)]
+    started = time.perf_counter()
+    for query in queries:
+        cache.lookup(query)
+    elapsed = time.perf_counter() - started
+    return {
+        "entries": store_size,
+        "lookup_us": round(elapsed / lookups * 1e6, 1),
+        "store_mb": round(cache.stats()["bytes"] / 1024 / 1024, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Semantic cache hit-rate and latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {
+        "hit_rate": [hit_rates(threshold) for threshold in THRESHOLDS],
+        "latency": [lookup_latency(size) for size in args.sizes],
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'threshold':>10}{'paraphrase hits':>18}{'near-miss hits':>17}{'unrelated hits':>17}")
+    for row in report["hit_rate"]:
+        print(f"{row['threshold']:>10}{row['paraphrase_hit_rate']:>18}"
+              f"{row['near_miss_hit_rate']:>17}{row['unrelated_hit_rate']:>17}")
+    print()
+    print(f"{'entries':>10}{'lookup us':>12}{'store MB':>10}")
+    for row in report["latency"]:
+        print(f"{row['entries']:>10}{row['lookup_us']:>12}{row['store_mb']:>10}")
+
+
+if __name__ == "__main__":
+    main()
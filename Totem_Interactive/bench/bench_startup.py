@@ -0,0 +1,104 @@
+# bench_startup.py
+#
+# Cold-start cost of the API and of selector-only use, each measured in fresh
+# interpreters: import time, time to ready (import plus the lifespan hook, with
+# the environment's WARM_UP), Config construction and the first pipeline build
+# (which is where LangChain and the model clients load). Fails when importing
+# main.py or reaching readiness exceeds --target-ms or pulls in a heavy module.
+#
+# Run from Totem_Interactive/ with: PYTHONPATH=$(pwd) python3 bench/bench_startup.py
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Each snippet prints the milliseconds it spent and the heavy modules it loaded
+SCENARIOS = {
+    "import_main": "import main",
+    "app_ready": (
+        "import asyncio\n"
+        "import main\n"
+        "async def ready():\n"
+        "    async with main.lifespan(main.app):\n"
+        "        pass\n"
+        "asyncio.run(ready())"
+    ),
+    "import_selector": "from Prompt_analyzer_Enhancer.llm_selector import LLMSelector",
+    "selector_select": (
+        "from Prompt_analyzer_Enhancer.llm_selector import LLMSelector\n"
+        "LLMSelector().select_model({'task_type': 'code', 'complexity': 'High'})"
+    ),
+    "config": "from Prompt_analyzer_Enhancer.config import Config\nConfig()",
+    "first_pipeline": (
+        "from Prompt_analyzer_Enhancer.registry import get_registry\n"
+        "get_registry().pipeline"
+    ),
+}
+
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_google_genai", "langsmith", "numpy", "grpc")
+
+HARNESS = """
+import sys, time
+started = time.perf_counter()
+{snippet}
+elapsed = (time.perf_counter() - started) * 1000
+heavy = sorted({{name.split(".")[0] for name in sys.modules}} & set({heavy!r}))
+print(elapsed, ",".join(heavy))
+"""
+
+
+def measure(snippet: str, runs: int) -> Dict[str, object]:
+    env = {**os.environ, "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "bench-key"), "PYTHONWARNINGS": "ignore"}
+    times: List[float] = []
+    heavy = ""
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", HARNESS.format(snippet=snippet, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, env=env, check=True,
+        )
+        elapsed, _, heavy = completed.stdout.strip().splitlines()[-1].partition(" ")
+        times.append(float(elapsed))
+    return {
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "heavy_modules": [name for name in heavy.split(",") if name],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import and construction times")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per scenario")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    parser.add_argument("--target-ms", type=float, default=300.0, help="budget for importing main.py and for readiness")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = {name: measure(SCENARIOS[name], args.runs) for name in args.scenarios}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'scenario':<18}{'median ms':>10}{'min ms':>10}  heavy modules loaded")
+        for name, row in report.items():
+            print(f"{name:<18}{row['median_ms']:>10}{row['min_ms']:>10}  {', '.join(row['heavy_modules']) or '-'}")
+
+    failures = []
+    for name, label in (("import_main", "importing main"), ("app_ready", "starting the app")):
+        if name not in report:
+            continue
+        row = report[name]
+        if row["median_ms"] > args.target_ms:
+            failures.append(f"{label} took {row['median_ms']} ms, target {args.target_ms} ms")
+        if row["heavy_modules"]:
+            failures.append(f"{label} loaded {', '.join(row['heavy_modules'])}")
+    for line in failures:
+        print(f"FAIL {line}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# fake_llm.py
+#
+# Deterministic stand-in for ChatGoogleGenerativeAI so the pipeline can be
+# benchmarked offline: seeded latency, jitter, slow-tail and error injection,
+# canned analysis JSON for analysis prompts (a JSON array for batched ones)
+# and a fixed-length enhancement otherwise. heuristic_agreement sets the share
+# of analyses whose task type and complexity match the local HeuristicScorer, for speculative enhancement.
+
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+from Prompt_analyzer_Enhancer.heuristics import HeuristicScorer
+
+BATCH_MARKER = "Prompts (JSON array of id and prompt):"
+PROMPT_MARKER = "Prompt: "
+TASK_TYPES = ["code", "writing", "analysis", "general"]
+COMPLEXITIES = ["Low", "Medium", "High"]
+ENHANCEMENT_WORDS = (
+    "Write a well structured solution that states the inputs, the expected output format, "
+    "the constraints on time and memory, edge cases to handle and an example of usage. "
+).split()
+
+
+class FakeProviderError(Exception):
+    """Injected failure; the message looks transient so the guard retries it"""
+
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.02
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    # Share of calls that stall for slow_latency instead, to model a heavy tail
+    slow_rate: float = 0.0
+    slow_latency: float = 1.0
+    # Time per input token read and per output token generated, so longer prompts and answers take longer
+    input_token_latency: float = 0.0
+    output_token_latency: float = 0.0
+    heuristic_agreement: float = 0.0
+    seed: int = 0
+    enhancement_words: int = 60
+    stream_chunks: int = 10
+    # Read by ResponseCache.make_key like the real client's fields
+    model: str = "fake-chat"
+    temperature: float = 0.4
+
+    _rng: random.Random = PrivateAttr()
+    _lock: Any = PrivateAttr()
+    _calls: int = PrivateAttr(default=0)
+    _input_tokens: int = PrivateAttr(default=0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def calls(self) -> int:
+        return self._calls
+
+    @property
+    def input_tokens(self) -> int:
+        return self._input_tokens
+
+    def _generate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        delay, fail = self._draw()
+        result = self._result(messages, fail)
+        time.sleep(delay + self._generation_time(result))
+        return result
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> ChatResult:
+        delay, fail = self._draw()
+        result = self._result(messages, fail)
+        await asyncio.sleep(delay + self._generation_time(result))
+        return result
+
+    def _stream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        delay, fail = self._draw()
+        chunks = self._chunks(messages, fail)
+        for chunk in chunks:
+            time.sleep(delay / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        delay, fail = self._draw()
+        chunks = self._chunks(messages, fail)
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    def _draw(self):
+        """Latency and failure for the next call, from the seeded generator"""
+        with self._lock:
+            self._calls += 1
+            delay = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+            if self._rng.random() < self.slow_rate:
+                delay = self.slow_latency
+            fail = self._rng.random() < self.error_rate
+        return delay, fail
+
+    def _result(self, messages: List[BaseMessage], fail: bool) -> ChatResult:
+        if fail:
+            raise FakeProviderError("503 Service Unavailable (injected)")
+        prompt = _text(messages)
+        content = self._respond(prompt)
+        with self._lock:
+            self._input_tokens += len(prompt) // 4
+        message = AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(prompt) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(prompt) + len(content)) // 4,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _analysis(self, prompt: str) -> dict:
+        analysis = _analysis(prompt)
+        if zlib.crc32(prompt.encode("utf-8")) % 1000 < self.heuristic_agreement * 1000:
+            guess = HeuristicScorer().score(prompt)[0]
+            analysis.update({name: guess[name] for name in ("task_type", "complexity")})
+        return analysis
+
+    def _generation_time(self, result: ChatResult) -> float:
+        usage = result.generations[0].message.usage_metadata
+        return self.input_token_latency * usage["input_tokens"] + self.output_token_latency * usage["output_tokens"]
+
+    def _chunks(self, messages: List[BaseMessage], fail: bool) -> List[str]:
+        if fail:
+            raise FakeProviderError("503 Service Unavailable (injected)")
+        words = self._respond(_text(messages)).split(" ")
+        size = max(1, len(words) // self.stream_chunks)
+        return [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+
+    def _respond(self, prompt: str) -> str:
+        digest = zlib.crc32(prompt.encode("utf-8"))
+        if BATCH_MARKER in prompt:
+            items = json.loads(prompt.split(BATCH_MARKER, 1)[1])
+            answers = [{"id": item["id"], **self._analysis(item["prompt"])} for item in items]
+            return "```json\n" + json.dumps(answers, indent=2) + "\n```"
+        if "missing_elements" in prompt and "clarity_score" in prompt:
+            # Keyed on the user's prompt alone, so batched and single answers agree
+            analysis = self._analysis(prompt.rsplit(PROMPT_MARKER, 1)[-1].strip())
+            return "```json\n" + json.dumps(analysis, indent=2) + "\n```"
+        words = [ENHANCEMENT_WORDS[(digest + i) % len(ENHANCEMENT_WORDS)] for i in range(self.enhancement_words)]
+        return " ".join(words)
+
+
+def _analysis(prompt: str) -> dict:
+    digest = zlib.crc32(prompt.encode("utf-8"))
+    return {
+        "task_type": TASK_TYPES[digest % len(TASK_TYPES)],
+        "complexity": COMPLEXITIES[digest % len(COMPLEXITIES)],
+        "missing_elements": ["Input data format", "Expected output", "Constraints"][: 1 + digest % 3],
+        "context_score": round((digest % 100) / 100, 2),
+        "clarity_score": round((digest // 100 % 100) / 100, 2),
+    }
+
+
+def _text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
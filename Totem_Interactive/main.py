@@ -1,25 +1,81 @@
 # main.py
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import List, Union
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, field_validator
 from Prompt_analyzer_Enhancer.config import Config
-from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
-from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+from Prompt_analyzer_Enhancer.chunking import check_prompt_size
+from Prompt_analyzer_Enhancer.registry import get_registry
+from Prompt_analyzer_Enhancer.batch import aiter_jsonl, process_batch
+from Prompt_analyzer_Enhancer.jobs import FINISHED, start_workers
+from Prompt_analyzer_Enhancer.rate_limit import track_queue_wait
+from Prompt_analyzer_Enhancer.metrics import METRICS
+from Prompt_analyzer_Enhancer.logging_config import configure_logging
+
+configure_logging()
+
+# Shared, lazily built configuration and components
+registry = get_registry()
+
+HTTP_REQUESTS = METRICS.counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_SECONDS = METRICS.histogram("http_request_seconds", "Time to response headers by route", ("route",))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # WARM_UP: "none" (default), "components" or "ping" to also open the model connection
+    warm_up = os.getenv("WARM_UP", "none").lower()
+    if warm_up != "none":
+        await asyncio.to_thread(registry.warm_up, warm_up == "ping")
+    # JOB_WORKERS > 0 runs job worker processes alongside a single API process
+    job_workers = []
+    job_queue = registry.config.job_queue
+    if job_queue is not None and int(os.getenv("JOB_WORKERS", "0")) > 0:
+        job_workers = start_workers(
+            job_queue.db_path, int(os.getenv("JOB_WORKERS")), int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+        )
+    yield
+    # Jobs a terminated worker was running are picked up again after their lease expires
+    for process in job_workers:
+        process.terminate()
+        process.join(timeout=5)
 
 app = FastAPI(
     title="Prompt Processing API",
     description="API for analyzing, enhancing, and selecting LLM for prompts",
     version="1.0.0",
     docs_url="/swagger",
-    redoc_url="/documentation"
+    redoc_url="/documentation",
+    lifespan=lifespan
 )
 
+# Larger prompts are rejected at admission (422), before any model call
+MAX_PROMPT_TOKENS = Config.load_max_prompt_tokens()
+
+@app.exception_handler(RequestValidationError)
+async def validation_error(request: Request, exc: RequestValidationError):
+    # FastAPI's default body echoes each rejected input, which for an oversized prompt is the whole prompt
+    errors = [{key: value for key, value in error.items() if key not in ("input", "ctx")} for error in exc.errors()]
+    return JSONResponse(status_code=422, content={"detail": jsonable_encoder(errors)})
+
 class PromptRequest(BaseModel):
     prompt: str
     analysis: dict = None
 
+    @field_validator("prompt")
+    @classmethod
+    def within_size_limit(cls, prompt: str) -> str:
+        return check_prompt_size(prompt, MAX_PROMPT_TOKENS)
+
 class AnalysisResponse(BaseModel):
     analysis: dict
 
@@ -28,6 +84,16 @@ class LLMResponse(BaseModel):
 
 class EnhancedPromptResponse(BaseModel):
     enhanced_prompt: dict
+    timings: dict = None
+
+class PipelineResponse(BaseModel):
+    analysis: dict
+    recommended_llm: dict
+    enhanced_prompt: dict
+    timings: dict
+
+class BatchRequest(BaseModel):
+    prompts: List[Union[str, dict]]
 
 # Add CORS middleware to allow cross-origin requests
 app.add_middleware(
@@ -38,11 +104,21 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Initialize configuration and components
-config = Config()
-analyzer = PromptAnalyzer(config)
-selector = LLMSelector()
-enhancer = PromptEnhancer(config)
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(method=request.method, route=route, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - started, route=route)
+
+# Caps the number of concurrent LLM calls this worker keeps in flight
+llm_semaphore = asyncio.Semaphore(Config.load_max_concurrency())
 
 @app.get("/", response_class=HTMLResponse)
 async def welcome():
@@ -54,7 +130,8 @@ async def welcome():
 @app.post("/analyze-prompt", response_model=AnalysisResponse)
 async def analyze_prompt(request: PromptRequest):
     try:
-        analysis = analyzer.analyze_prompt(request.prompt)
+        async with llm_semaphore:
+            analysis = await registry.analyzer.analyze_prompt_async(request.prompt)
         return {"analysis": analysis}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -62,7 +139,7 @@ async def analyze_prompt(request: PromptRequest):
 @app.post("/select-llm", response_model=LLMResponse)
 async def select_llm(request: PromptRequest):
     try:
-        selected_model = selector.select_model(request.analysis)
+        selected_model = registry.selector.select_model(request.analysis)
         return {"recommended_llm": selected_model["recommended_llm"]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -70,10 +147,201 @@ async def select_llm(request: PromptRequest):
 @app.post("/enhance-prompt", response_model=EnhancedPromptResponse)
 async def enhance_prompt(request: PromptRequest):
     try:
-        enhanced_prompt = enhancer.enhance_prompt(request.prompt, request.analysis)
-        return {"enhanced_prompt": enhanced_prompt["enhanced_prompt"]}
+        with track_queue_wait() as queue_wait:
+            async with llm_semaphore:
+                enhanced_prompt = await registry.enhancer.enhance_prompt_async(request.prompt, request.analysis)
+        return {
+            "enhanced_prompt": enhanced_prompt["enhanced_prompt"],
+            "timings": {"queue_wait_ms": round(queue_wait[0] * 1000, 2)},
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/enhance-prompt/stream")
+async def enhance_prompt_stream(request: PromptRequest):
+    """
+    Server-sent events: "token" events carry text as the model produces it,
+    the final "result" event carries the enhanced_prompt payload.
+    """
+    async def events():
+        async with llm_semaphore:
+            async for event in registry.enhancer.astream_enhance_prompt(request.prompt, request.analysis or {}):
+                data = event["data"]
+                if event["event"] == "result":
+                    data = data["enhanced_prompt"]
+                yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/process-prompt", response_model=PipelineResponse)
+async def process_prompt(request: PromptRequest):
+    try:
+        async with llm_semaphore:
+            return await registry.pipeline.process_async(request.prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/batch/process")
+async def batch_process(
+    request: Request,
+    concurrency: int = Query(8, ge=1),
+    max_retries: int = Query(3, ge=0),
+):
+    """
+    Accepts {"prompts": [...]} or a JSONL body (application/x-ndjson) and
+    streams one NDJSON result per prompt as soon as it finishes.
+    JSONL uploads are spooled to a temporary file and read lazily.
+    """
+    upload = None
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("application/x-ndjson", "application/jsonl")):
+        upload = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        # Past max_size the spool is a disk file; keep its I/O off the event loop
+        async for chunk in request.stream():
+            await asyncio.to_thread(upload.write, chunk)
+        upload.seek(0)
+        prompts = aiter_jsonl(upload)
+    else:
+        try:
+            prompts = BatchRequest(**await request.json()).prompts
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    results = process_batch(
+        prompts,
+        registry.pipeline,
+        # Leave semaphore slots free so interactive calls can reach the limiter's priority queue
+        concurrency=min(concurrency, max(1, registry.config.max_concurrency // 2)),
+        max_retries=max_retries,
+        semaphore=llm_semaphore,
+        max_prompt_tokens=MAX_PROMPT_TOKENS,
+    )
+    return StreamingResponse(
+        (json.dumps(result) + "\n" async for result in results),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(upload.close) if upload else None,
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: PromptRequest):
+    """
+    Queue the prompt for the job workers and return at once. A prompt that
+    is already queued, running or recently done returns the existing job.
+    """
+    job, deduplicated = await asyncio.to_thread(_job_queue().submit, request.prompt)
+    return {"job_id": job["id"], "status": job["status"], "deduplicated": deduplicated}
+
+
+@app.get("/jobs/stats")
+async def job_stats():
+    return await asyncio.to_thread(_job_queue().stats)
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str, wait: float = Query(0, ge=0, le=60)):
+    """Job state, result and timings; wait > 0 long-polls up to that many seconds for it to finish"""
+    queue = _job_queue()
+    deadline = time.monotonic() + wait
+    while True:
+        job = await asyncio.to_thread(queue.get, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+        if job["status"] in FINISHED or time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(min(0.25, max(0.0, deadline - time.monotonic())))
+
+
+def _job_queue():
+    queue = registry.config.job_queue
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Job queue is disabled; set JOB_QUEUE_PATH")
+    return queue
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    cache = registry.config.cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@app.get("/analysis/stats")
+async def analysis_stats():
+    semantic_cache = registry.analyzer.semantic_cache
+    return {
+        "paths": registry.analyzer.path_counts,
+        "semantic_cache": semantic_cache.stats() if semantic_cache else {"enabled": False},
+    }
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    from Prompt_analyzer_Enhancer.templates import template_report
+
+    return {
+        **registry.config.guard.stats(),
+        "routing": registry.config.router.snapshot(),
+        "templates": template_report(),
+        "coalescing": {
+            "analysis": registry.analyzer.in_flight.stats(),
+            "enhancement": registry.enhancer.in_flight.stats(),
+        },
+        "analysis_batching": registry.analyzer.batcher.stats() if registry.analyzer.batcher else None,
+        "speculation": registry.pipeline.speculation.stats() if registry.pipeline.speculation else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of stage latencies, tokens, caches and errors"""
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4")
+
+
+def _component_samples():
+    """Export the counters components already keep, read at scrape time"""
+    cache = registry.config.cache
+    if cache is not None:
+        stats = cache.stats()
+        yield "response_cache_lookups_total", "counter", "Response cache lookups", {"result": "hit"}, stats["hits"]
+        yield "response_cache_lookups_total", "counter", "Response cache lookups", {"result": "miss"}, stats["misses"]
+        yield "response_cache_entries", "gauge", "Entries in the in-memory response cache", {}, stats["size"]
+
+    for path, count in registry.analyzer.path_counts.items():
+        yield "analysis_path_total", "counter", "Analyses by how they were produced", {"path": path}, count
+
+    semantic_cache = registry.analyzer.semantic_cache
+    if semantic_cache is not None:
+        stats = semantic_cache.stats()
+        yield "semantic_cache_lookups_total", "counter", "Semantic cache lookups", {"result": "hit"}, stats["hits"]
+        yield "semantic_cache_lookups_total", "counter", "Semantic cache lookups", {"result": "miss"}, stats["misses"]
+        yield "semantic_cache_bytes", "gauge", "Semantic cache memory use", {}, stats["bytes"]
+
+    stats = registry.config.guard.stats()
+    for outcome in ("successes", "failures", "retries", "timeouts", "rate_limited", "short_circuited"):
+        yield "llm_call_events_total", "counter", "LLM call attempts and outcomes", {"event": outcome}, stats[outcome]
+    yield "llm_breaker_open", "gauge", "1 while the circuit breaker rejects calls", {}, int(stats["breaker_state"] == "open")
+
+    routing = registry.config.router.snapshot()
+    for name, backend in routing["backends"].items():
+        yield "llm_backend_calls_total", "counter", "Calls per backend", {"backend": name}, backend["calls"]
+        yield "llm_backend_errors_total", "counter", "Failed calls per backend", {"backend": name}, backend["errors"]
+        if backend["latency_ewma_ms"] is not None:
+            latency = backend["latency_ewma_ms"] / 1000
+            yield "llm_backend_latency_ewma_seconds", "gauge", "Latency EWMA per backend", {"backend": name}, latency
+    yield "llm_hedged_requests_total", "counter", "Calls raced against a second backend", {}, routing["hedges"]
+    yield "llm_hedge_wins_total", "counter", "Hedged calls won by the second backend", {}, routing["hedge_wins"]
+    yield "llm_hedges_throttled_total", "counter", "Hedges skipped for lack of rate-limit budget", {}, routing["hedges_throttled"]
+    yield "llm_failovers_total", "counter", "Failed calls sent again to the next backend", {}, routing["failovers"]
+
+    job_queue = registry.config.job_queue
+    if job_queue is not None:
+        for status, count in job_queue.stats().items():
+            yield "jobs", "gauge", "Jobs in the durable queue by status", {"status": status}, count
+
+
+METRICS.add_collector(_component_samples)
+
 
 # Run with: uvicorn main:app --reload
\ No newline at end of file
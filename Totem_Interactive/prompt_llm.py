@@ -1,53 +1,27 @@
 # prompt_llm.py
 
 import json
-from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
-from Prompt_analyzer_Enhancer.config import Config
-from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
-from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+from Prompt_analyzer_Enhancer.registry import get_registry
+from Prompt_analyzer_Enhancer.logging_config import configure_logging
 import traceback
 
 def main():
+    configure_logging()
     try:
-        # Initialize configuration
-        config = Config()
+        # Initialize configuration and components
+        pipeline = get_registry().pipeline
 
-        # Step 1: Analyze the Prompt
-        analyzer = PromptAnalyzer(config)
+        # Analyze the prompt, select the model and enhance the prompt
         prompt = "Write a sorting algorithm in Python."
-        analysis = analyzer.analyze_prompt(prompt)
+        output = pipeline.process(prompt)
         print(f"Prompt: {prompt}")
-        print(f"Analysis: {analysis}\n")
+        print(f"Analysis: {output['analysis']}\n")
 
-        # Step 2: Select the Model
-        selector = LLMSelector()
-        selected_model = selector.select_model(analysis)
         print("\nSelected Model:")
-        print(selected_model)
+        print(output["recommended_llm"])
 
-        # Step 3: Enhance the Prompt
-        enhancer = PromptEnhancer(config)
-        enhanced_prompt = enhancer.enhance_prompt(prompt, analysis)
         print("\nOriginal Prompt:", prompt)
-        print("Enhanced Prompt:", enhanced_prompt["enhanced_prompt"]["text"])
-
-        # Structure the output
-        output = {
-            "analysis": analysis,
-            "recommended_llm": {
-                "model": selected_model["recommended_llm"]["model"],
-                "reasoning": selected_model["recommended_llm"]["reasoning"]
-            },
-            "enhanced_prompt": {
-                "text": enhanced_prompt["enhanced_prompt"]["text"],
-                "technique": "Specification Expansion",
-                "improvement_metrics": {
-                    "clarity": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["clarity"],
-                    "context": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["context"],
-                    "specificity": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["specificity"]
-                }
-            }
-        }
+        print("Enhanced Prompt:", output["enhanced_prompt"]["text"])
 
         # Print the structured output as beautiful JSON
         print("\nStructured Output:\n")
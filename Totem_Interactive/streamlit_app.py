@@ -2,79 +2,102 @@
 
 import streamlit as st
 import json
-from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+import math
+import os
+import tempfile
+from Prompt_analyzer_Enhancer.chat_history import ChatHistory, ChatStore
+from Prompt_analyzer_Enhancer.chunking import PromptTooLargeError, check_prompt_size
 from Prompt_analyzer_Enhancer.config import Config
-from Prompt_analyzer_Enhancer.llm_selector import LLMSelector
-from Prompt_analyzer_Enhancer.prompt_enhancer import PromptEnhancer
+from Prompt_analyzer_Enhancer.registry import get_registry
+from Prompt_analyzer_Enhancer.logging_config import configure_logging
 
-def analyze_prompt(prompt: str):
-    config = Config()
-
-    # Analyze the Prompt
-    analyzer = PromptAnalyzer(config)
-    analysis = analyzer.analyze_prompt(prompt)
-
-    # Select the Model
-    selector = LLMSelector()
-    selected_model = selector.select_model(analysis)
-
-    # Enhance the Prompt
-    enhancer = PromptEnhancer(config)
-    enhanced_prompt = enhancer.enhance_prompt(prompt, analysis)
-
-    # Structure the output
-    output = {
-        "analysis": analysis,
-        "recommended_llm": {
-            "model": selected_model["recommended_llm"]["model"],
-            "reasoning": selected_model["recommended_llm"]["reasoning"]
-        },
-        "enhanced_prompt": {
-            "text": enhanced_prompt["enhanced_prompt"]["text"],
-            "technique": "Specification Expansion",
-            "improvement_metrics": {
-                "clarity": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["clarity"],
-                "context": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["context"],
-                "specificity": enhanced_prompt["enhanced_prompt"]["improvement_metrics"]["specificity"]
-            }
-        }
-    }
+# Earlier turns are read back from the store this many at a time
+EARLIER_PAGE_SIZE = 10
+# Same admission limit as the API
+MAX_PROMPT_TOKENS = Config.load_max_prompt_tokens()
 
+def analyze_prompt(prompt: str):
+    # Analyze the prompt, select the model and enhance the prompt
+    pipeline = get_registry().pipeline
+    return pipeline.process(prompt)
+
+def stream_prompt(prompt: str):
+    pipeline = get_registry().pipeline
+    output = {}
+
+    def tokens():
+        for event in pipeline.stream(prompt):
+            if event["event"] == "token":
+                yield event["data"]
+            else:
+                output.update(event["data"])
+
+    # Show the enhanced prompt as it is generated
+    st.markdown("**Enhanced Prompt:**")
+    st.write_stream(tokens())
     return output
 
+@st.cache_resource
+def chat_store() -> ChatStore:
+    # One SQLite store for every session of this server
+    return ChatStore(
+        os.getenv("CHAT_HISTORY_PATH", os.path.join(tempfile.gettempdir(), "totem_chat_history.db")),
+        ttl=float(os.getenv("CHAT_HISTORY_TTL", str(7 * 86400))),
+    )
+
+def render_turn(turn):
+    st.markdown(f"**User:** {turn['User']}")
+    st.json(turn["Assistant"])
+
+def render_earlier_turns(history: ChatHistory):
+    # Spilled turns are only read and drawn when asked for, one page at a time
+    if not history.spilled or not st.toggle(f"Show {history.spilled} earlier turns", key="show_earlier_turns"):
+        return
+    pages = math.ceil(history.spilled / EARLIER_PAGE_SIZE)
+    page = st.number_input("Page (1 is the most recent)", min_value=1, max_value=pages, value=1)
+    for turn in reversed(history.earlier(page - 1, EARLIER_PAGE_SIZE)):
+        render_turn(turn)
+
 def main():
     st.set_page_config(page_title="Prompt Analyzer and Enhancer", layout="wide")
+    configure_logging()
 
-    # Initialize session state for chat history
+    # Initialize session state for chat history: a bounded window in memory, older turns in SQLite
     if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
+        st.session_state.chat_history = ChatHistory(
+            chat_store(), window=int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+        )
+    history = st.session_state.chat_history
 
     st.title("Prompt Analyzer and Enhancer")
     st.write("Enter a prompt to analyze, select the appropriate model, and enhance it.")
 
-    # Chat interface
-    for chat in st.session_state.chat_history:
-        st.markdown(f"**User:** {chat['User']}")
-        st.json(chat["Assistant"])
+    # Chat interface, drawn once per rerun
+    render_earlier_turns(history)
+    for turn in history.recent:
+        render_turn(turn)
+    # A turn sent in this run is drawn here, below the history and above the form
+    new_turn = st.container()
 
     # User input
     with st.form(key="user_input_form", clear_on_submit=True):
         user_input = st.text_input("You:")
+        stream_output = st.checkbox("Stream the enhanced prompt", value=True)
         submit_button = st.form_submit_button(label="Send")
 
-        if submit_button and user_input:
-            output = analyze_prompt(user_input)
-
-            # Store the conversation in session state
-            st.session_state.chat_history.append({
-                "User": user_input,
-                "Assistant": output
-            })
-
-    # Display the current chat history
-    for chat in st.session_state.chat_history:
-        st.markdown(f"**User:** {chat['User']}")
-        st.json(chat["Assistant"])
+    if submit_button and user_input:
+        try:
+            check_prompt_size(user_input, MAX_PROMPT_TOKENS)
+        except PromptTooLargeError as e:
+            new_turn.error(str(e))
+            return
+        with new_turn:
+            st.markdown(f"**User:** {user_input}")
+            output = stream_prompt(user_input) if stream_output else analyze_prompt(user_input)
+            st.json(output)
+
+        # Store the conversation; on later reruns it is drawn with the history
+        history.append(user_input, output)
 
 if __name__ == "__main__":
     main()
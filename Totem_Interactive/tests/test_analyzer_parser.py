@@ -0,0 +1,101 @@
+# test_analyzer_parser.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+from types import SimpleNamespace
+import pytest
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+
+PROMPT = "Write a sorting algorithm in Python."
+
+MISSING = [
+    "Sorting algorithm type (e.g., bubble sort, merge sort, quicksort)",
+    "Input data type (e.g., integers, floats, strings)",
+    "Constraints on space and time complexity",
+]
+
+BARE_JSON = """{
+  "task_type": "code",
+  "complexity": "Low",
+  "missing_elements": [
+    "Sorting algorithm type (e.g., bubble sort, merge sort, quicksort)",
+    "Input data type (e.g., integers, floats, strings)",
+    "Constraints on space and time complexity"
+  ],
+  "context_score": 0.2,
+  "clarity_score": 0.7
+}"""
+
+FENCED_JSON = "```json\n" + BARE_JSON + "\n```"
+
+WELL_FORMED = {
+    "fenced_json": FENCED_JSON,
+    "bare_json": BARE_JSON,
+    "prose_wrapped": "Here is my analysis of the prompt.\n\n" + FENCED_JSON + "\n\nLet me know if you need more.",
+    "long_output": "Analysis notes:\n" + "The prompt could mention more constraints. " * 400 + FENCED_JSON
+                   + "\nAdditional commentary {not json} follows. " * 200,
+    "long_unfenced": "The prompt could mention more constraints. " * 400 + BARE_JSON
+                     + "\nAdditional commentary {not json} follows. " * 200,
+}
+
+
+@pytest.fixture
+def analyzer():
+    return PromptAnalyzer(SimpleNamespace(
+        llm=None, cache=None, fast_analysis=False, fast_analysis_threshold=1.0, structured_analysis=False,
+        semantic_cache=None, analysis_batching=None, analysis_chunk_tokens=0, analysis_chunk_concurrency=1,
+        guard=None, router=None,
+    ))
+
+
+@pytest.mark.parametrize("name", list(WELL_FORMED))
+def test_well_formed_json_is_decoded(analyzer, name):
+    analysis = analyzer._parse_analysis(WELL_FORMED[name], PROMPT)
+    assert analysis == {
+        "task_type": "code",
+        "complexity": "Low",
+        "missing_elements": MISSING,
+        "context_score": 0.2,
+        "clarity_score": 0.7,
+    }
+    assert not analyzer._is_fallback(analysis)
+
+
+def test_trailing_commas_fall_back_to_the_field_scan(analyzer):
+    response = ('{"task_type": "writing", "complexity": "Medium", "missing_elements": ["audience", "tone",], '
+                '"context_score": 0.4, "clarity_score": 0.6,}')
+    analysis = analyzer._parse_analysis(response, PROMPT)
+    assert (analysis["task_type"], analysis["complexity"]) == ("writing", "Medium")
+    assert analysis["missing_elements"] == ["audience", "tone"]
+    assert (analysis["context_score"], analysis["clarity_score"]) == (0.4, 0.6)
+
+
+def test_unquoted_keys_and_spaced_field_names_are_recognised(analyzer):
+    response = ('{task_type: analysis, complexity: High, missing elements: ["dataset", "time range"], '
+                'context_score: 0.3, clarity_score: 0.5}')
+    analysis = analyzer._parse_analysis(response, PROMPT)
+    assert (analysis["task_type"], analysis["complexity"]) == ("analysis", "High")
+    assert analysis["missing_elements"] == ["dataset", "time range"]
+    assert (analysis["context_score"], analysis["clarity_score"]) == (0.3, 0.5)
+
+
+def test_task_type_aliases_and_unknown_values_are_normalized(analyzer):
+    response = '{"task_type": "Programming", "complexity": "very high", "missing_elements": "Expected output"}'
+    analysis = analyzer._parse_analysis(response, PROMPT)
+    assert (analysis["task_type"], analysis["complexity"]) == ("code", "High")
+    assert analysis["missing_elements"] == ["Expected output"]
+    assert (analysis["context_score"], analysis["clarity_score"]) == (0.5, 0.5)
+
+
+@pytest.mark.parametrize("response", [
+    "The prompt is a coding request of low complexity but it lacks detail about inputs.",
+    '{"task_type": "code"',
+    "",
+])
+def test_responses_without_an_object_get_the_parse_error_fallback(analyzer, response):
+    analysis = analyzer._parse_analysis(response, PROMPT)
+    assert analysis["missing_elements"] == ["Insufficient context", "Parse error: No structured response"]
+    assert analysis["task_type"] == "code"
+    assert analysis["complexity"] == "Medium"
+    assert analyzer._is_fallback(analysis)
+    assert analyzer.path_counts["fallback"] == 1
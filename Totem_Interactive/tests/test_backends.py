@@ -0,0 +1,130 @@
+# test_backends.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import time
+from typing import Any, List, Optional
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from Prompt_analyzer_Enhancer.backends import MIN_HEDGE_SAMPLES, BackendRouter
+from Prompt_analyzer_Enhancer.rate_limit import TokenBucketLimiter
+
+MESSAGES = [HumanMessage(content="Write a sorting function")]
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Answers with its own name after a delay, or raises the given error"""
+
+    name: str
+    delay: float = 0.0
+    error: Optional[Exception] = None
+    temperature: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any):
+        time.sleep(self.delay)
+        return self._answer()
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Any = None, run_manager: Any = None, **kwargs: Any):
+        await asyncio.sleep(self.delay)
+        return self._answer()
+
+    def _answer(self) -> ChatResult:
+        if self.error is not None:
+            raise self.error
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.name))])
+
+
+def router(primary: ScriptedChatModel, secondary: ScriptedChatModel, **options: Any) -> BackendRouter:
+    backends = {"primary": primary, "secondary": secondary}
+    routed = BackendRouter(backends, {"default": ["primary", "secondary"]}, **options)
+    # Enough latency history for a p95, with the primary clearly preferred
+    for _ in range(MIN_HEDGE_SAMPLES):
+        routed.stats["primary"].record(0.01, True)
+        routed.stats["secondary"].record(0.05, True)
+    return routed
+
+
+def drained_limiter() -> TokenBucketLimiter:
+    limiter = TokenBucketLimiter(requests_per_minute=1)
+    limiter._levels["requests"] = (0.0, time.time())
+    return limiter
+
+
+def test_routes_resolve_most_specific_first_and_are_not_mutated():
+    routes = {"analysis": ["a"], "analysis/code": ["b"], "analysis/*/High": ["a", "b"]}
+    routed = BackendRouter({"a": ScriptedChatModel(name="a"), "b": ScriptedChatModel(name="b")}, routes, hedge=False)
+    assert routed.resolve("analysis", "code", "High") == "analysis/code"
+    assert routed.resolve("analysis", "writing", "High") == "analysis/*/High"
+    assert routed.resolve("analysis", "writing", "Low") == "analysis"
+    assert routed.resolve("enhancement") == "default"
+    assert "default" not in routes
+
+
+def test_unknown_backend_in_a_route_is_rejected():
+    with pytest.raises(ValueError, match="unknown backends"):
+        BackendRouter({"a": ScriptedChatModel(name="a")}, {"analysis": ["missing"]})
+
+
+def test_retryable_error_fails_over_to_the_next_backend():
+    routed = router(
+        ScriptedChatModel(name="primary", error=ConnectionError("503 unavailable")),
+        ScriptedChatModel(name="secondary"),
+        hedge=False,
+    )
+    assert routed.model("default").invoke(MESSAGES).content == "secondary"
+    assert routed.failovers == 1
+    assert routed.stats["primary"].errors == 1
+
+
+def test_rejected_request_is_not_failed_over():
+    routed = router(
+        ScriptedChatModel(name="primary", error=ValueError("400 invalid argument")),
+        ScriptedChatModel(name="secondary"),
+        hedge=False,
+    )
+    with pytest.raises(ValueError):
+        routed.model("default").invoke(MESSAGES)
+    assert routed.failovers == 0
+
+
+def test_failover_is_skipped_without_limiter_budget():
+    routed = router(
+        ScriptedChatModel(name="primary", error=ConnectionError("503 unavailable")),
+        ScriptedChatModel(name="secondary"),
+        hedge=False,
+        limiter=drained_limiter(),
+    )
+    with pytest.raises(ConnectionError):
+        routed.model("default").invoke(MESSAGES)
+    assert routed.failovers == 0
+
+
+def test_slow_primary_is_hedged_and_the_faster_answer_wins():
+    routed = router(ScriptedChatModel(name="primary", delay=0.5), ScriptedChatModel(name="secondary"))
+    assert routed.model("default").invoke(MESSAGES).content == "secondary"
+    assert (routed.hedges, routed.hedge_wins) == (1, 1)
+
+
+def test_slow_primary_is_hedged_async():
+    routed = router(ScriptedChatModel(name="primary", delay=0.5), ScriptedChatModel(name="secondary"))
+    message = asyncio.run(routed.model("default").ainvoke(MESSAGES))
+    assert message.content == "secondary"
+    assert (routed.hedges, routed.hedge_wins) == (1, 1)
+
+
+def test_hedge_is_skipped_without_limiter_budget():
+    routed = router(
+        ScriptedChatModel(name="primary", delay=0.1),
+        ScriptedChatModel(name="secondary"),
+        limiter=drained_limiter(),
+    )
+    message = asyncio.run(routed.model("default").ainvoke(MESSAGES))
+    assert message.content == "primary"
+    assert (routed.hedges, routed.hedges_throttled) == (0, 1)
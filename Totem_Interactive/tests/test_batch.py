@@ -0,0 +1,46 @@
+# test_batch.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import io
+from Prompt_analyzer_Enhancer.batch import InvalidItem, aiter_jsonl, iter_jsonl, process_batch
+
+JSONL = b'"Write a sort"\n{bad json\n\n42\n{"id": "x", "prompt": "Explain binary search"}\n'
+
+
+class EchoPipeline:
+    async def process_async(self, prompt, raise_errors=False):
+        return {"prompt": prompt}
+
+
+def describe(items):
+    return [item.error if isinstance(item, InvalidItem) else item for item in items]
+
+
+def test_jsonl_lines_decode_with_per_line_errors():
+    assert describe(iter_jsonl(io.BytesIO(JSONL))) == [
+        "Write a sort",
+        "Invalid JSONL on line 2: Expecting property name enclosed in double quotes: line 1 column 2 (char 1)",
+        "Invalid JSONL on line 4: Unsupported JSONL item: b'42'",
+        {"id": "x", "prompt": "Explain binary search"},
+    ]
+
+
+def test_async_reader_matches_the_sync_one():
+    async def collect():
+        return [item async for item in aiter_jsonl(io.BytesIO(JSONL), chunk_bytes=8)]
+
+    assert describe(asyncio.run(collect())) == describe(iter_jsonl(io.BytesIO(JSONL)))
+
+
+def test_items_without_a_prompt_are_reported_not_sent():
+    async def collect():
+        items = ["Write a sort", {"id": "a"}, {"id": "b", "prompt": 5}, InvalidItem("Invalid JSONL on line 4")]
+        return [row async for row in process_batch(items, EchoPipeline(), concurrency=2)]
+
+    rows = {row["id"]: row for row in asyncio.run(collect())}
+    assert rows[0] == {"id": 0, "status": "ok", "attempts": 1, "prompt": "Write a sort"}
+    assert rows["a"]["error"] == rows["b"]["error"] == 'Item has no "prompt" string'
+    assert rows[3]["error"] == "Invalid JSONL on line 4"
+    assert all(rows[key]["attempts"] == 0 for key in ("a", "b", 3))
@@ -0,0 +1,129 @@
+# test_jobs.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import sqlite3
+import time
+import pytest
+from Prompt_analyzer_Enhancer.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, work
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def test_duplicate_prompts_share_a_job(db_path):
+    queue = JobQueue(db_path)
+    job, existed = queue.submit("Write a sorting function")
+    again, existed_again = queue.submit("  Write a   sorting function\n")
+    assert (existed, existed_again) == (False, True)
+    assert again["id"] == job["id"] and again["status"] == QUEUED
+
+
+def test_completed_job_is_reused_until_its_result_expires(db_path):
+    queue = JobQueue(db_path, result_ttl=0.05)
+    job, _ = queue.submit("Write a sorting function")
+    claimed = queue.claim("w1")
+    queue.complete(claimed["id"], "w1", {"enhanced_prompt": "text"}, {"run_ms": 1.0})
+    done, existed = queue.submit("Write a sorting function")
+    assert existed and done["status"] == DONE and done["result"] == {"enhanced_prompt": "text"}
+    time.sleep(0.1)
+    fresh, existed = queue.submit("Write a sorting function")
+    assert not existed and fresh["id"] != job["id"]
+
+
+def test_failed_job_is_requeued_until_max_attempts(db_path):
+    queue = JobQueue(db_path, max_attempts=2)
+    job, _ = queue.submit("Write a sorting function")
+    queue.fail(queue.claim("w1")["id"], "w1", "503 unavailable", {})
+    assert queue.get(job["id"])["status"] == QUEUED
+    queue.fail(queue.claim("w1")["id"], "w1", "503 unavailable", {})
+    failed = queue.get(job["id"])
+    assert (failed["status"], failed["attempts"], failed["error"]) == (FAILED, 2, "503 unavailable")
+    assert queue.claim("w1") is None
+
+
+def test_expired_lease_is_claimed_by_another_worker(db_path):
+    queue = JobQueue(db_path, lease_seconds=0.05)
+    job, _ = queue.submit("Write a sorting function")
+    assert queue.claim("w1")["id"] == job["id"]
+    assert queue.claim("w2") is None
+    time.sleep(0.1)
+    reclaimed = queue.claim("w2")
+    assert (reclaimed["id"], reclaimed["worker"], reclaimed["attempts"]) == (job["id"], "w2", 2)
+
+    # The first worker's late answer is dropped
+    queue.complete(job["id"], "w1", {"from": "w1"}, {})
+    assert queue.get(job["id"])["status"] == RUNNING
+    queue.complete(job["id"], "w2", {"from": "w2"}, {})
+    assert queue.get(job["id"])["result"] == {"from": "w2"}
+
+
+def test_heartbeat_keeps_the_lease(db_path):
+    queue = JobQueue(db_path, lease_seconds=0.1)
+    queue.submit("Write a sorting function")
+    queue.claim("w1")
+    time.sleep(0.06)
+    queue.heartbeat("w1")
+    time.sleep(0.06)
+    assert queue.claim("w2") is None
+
+
+def test_job_that_keeps_losing_its_worker_is_failed(db_path):
+    queue = JobQueue(db_path, lease_seconds=0.01, max_attempts=1)
+    job, _ = queue.submit("Write a sorting function")
+    queue.claim("w1")
+    time.sleep(0.05)
+    assert queue.claim("w2") is None
+    assert queue.get(job["id"])["status"] == FAILED
+
+
+def test_purge_drops_only_expired_finished_jobs(db_path):
+    queue = JobQueue(db_path, result_ttl=0.05)
+    finished, _ = queue.submit("first")
+    queue.complete(queue.claim("w1")["id"], "w1", {}, {})
+    waiting, _ = queue.submit("second")
+    time.sleep(0.1)
+    assert queue.purge() == 1
+    assert queue.get(finished["id"]) is None
+    assert queue.get(waiting["id"])["status"] == QUEUED
+
+
+class FlakyQueue(JobQueue):
+    """Claims fail with a locked database a few times before succeeding"""
+
+    def __init__(self, db_path, failures):
+        super().__init__(db_path)
+        self.failures = failures
+
+    def claim(self, worker):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        return super().claim(worker)
+
+
+class EchoPipeline:
+    async def process_async(self, prompt, raise_errors=False):
+        return {"prompt": prompt, "timings": {"total_ms": 1.0}}
+
+
+def test_worker_survives_queue_errors(db_path):
+    async def scenario():
+        queue = FlakyQueue(db_path, failures=2)
+        job, _ = queue.submit("Write a sorting function")
+        worker = asyncio.create_task(work(queue, EchoPipeline(), concurrency=2, poll_interval=0.01))
+        deadline = time.monotonic() + 5
+        while queue.get(job["id"])["status"] != DONE and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        assert not worker.done()
+        worker.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await worker
+        done = queue.get(job["id"])
+        assert done["status"] == DONE and done["result"] == {"prompt": "Write a sorting function"}
+        assert done["timings"]["total_ms"] == 1.0
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+# test_micro_batch.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+import pytest
+from langchain_core.messages import AIMessage
+from Prompt_analyzer_Enhancer.analyzer import PromptAnalyzer
+from Prompt_analyzer_Enhancer.micro_batch import AnalysisBatcher, BatchItemError
+from Prompt_analyzer_Enhancer.resilience import LLMGuard
+
+BATCH_MARKER = "Prompts (JSON array of id and prompt):"
+
+PROMPTS = [f"Write a function that sorts list number {index}" for index in range(4)]
+
+
+class BatchAwareLLM:
+    """Answers batched prompts with a JSON array and single prompts with one object"""
+
+    def __init__(self, fail_batches=False, skip_ids=()):
+        self.fail_batches = fail_batches
+        self.skip_ids = set(skip_ids)
+        self.batch_sizes = []
+        self.single_calls = 0
+
+    async def ainvoke(self, prompt_value):
+        text = prompt_value.to_string()
+        if BATCH_MARKER not in text:
+            self.single_calls += 1
+            return AIMessage(content=json.dumps(self._analysis()))
+        items = json.loads(text.split(BATCH_MARKER, 1)[1])
+        self.batch_sizes.append(len(items))
+        if self.fail_batches:
+            raise ValueError("malformed batch answer")
+        answers = [{"id": item["id"], **self._analysis()} for item in items if item["id"] not in self.skip_ids]
+        return AIMessage(content="```json\n" + json.dumps(answers) + "\n```")
+
+    @staticmethod
+    def _analysis():
+        return {
+            "task_type": "code", "complexity": "Low", "missing_elements": ["Input size"],
+            "context_score": 0.3, "clarity_score": 0.8,
+        }
+
+
+def busy(batcher: AnalysisBatcher) -> AnalysisBatcher:
+    """Mark traffic as dense enough that the next prompts open a batch"""
+    batcher._gap, batcher._last_arrival = 0.0, time.monotonic()
+    return batcher
+
+
+def submit_all(batcher: AnalysisBatcher, prompts):
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(prompt) for prompt in prompts), return_exceptions=True)
+
+    return asyncio.run(scenario())
+
+
+def test_lone_prompt_is_not_held_for_a_window():
+    llm = BatchAwareLLM()
+    batcher = AnalysisBatcher(llm, LLMGuard(max_retries=0), window=5.0)
+    assert submit_all(batcher, PROMPTS[:1]) == [None]
+    assert llm.batch_sizes == [] and batcher.stats()["single"] == 1
+
+
+def test_concurrent_prompts_share_one_call():
+    llm = BatchAwareLLM()
+    batcher = busy(AnalysisBatcher(llm, LLMGuard(max_retries=0), window=0.05))
+    results = submit_all(batcher, PROMPTS)
+    assert llm.batch_sizes == [4]
+    assert [json.loads(result)["task_type"] for result in results] == ["code"] * 4
+    assert batcher.stats()["batched"] == 4 and batcher.stats()["mean_batch_size"] == 4.0
+
+
+def test_batch_is_sent_once_it_reaches_max_size():
+    llm = BatchAwareLLM()
+    batcher = busy(AnalysisBatcher(llm, LLMGuard(max_retries=0), window=5.0, max_size=2))
+    submit_all(batcher, PROMPTS)
+    assert llm.batch_sizes == [2, 2]
+
+
+def test_failed_batch_sends_every_prompt_back_to_its_caller():
+    llm = BatchAwareLLM(fail_batches=True)
+    batcher = busy(AnalysisBatcher(llm, LLMGuard(max_retries=0), window=0.05))
+    results = submit_all(batcher, PROMPTS)
+    assert all(isinstance(result, BatchItemError) for result in results)
+    assert batcher.stats()["fallback"] == 4
+
+
+def test_prompt_missing_from_the_answer_falls_back_alone():
+    llm = BatchAwareLLM(skip_ids={"2"})
+    batcher = busy(AnalysisBatcher(llm, LLMGuard(max_retries=0), window=0.05))
+    results = submit_all(batcher, PROMPTS)
+    assert isinstance(results[2], BatchItemError)
+    assert all(isinstance(result, str) for index, result in enumerate(results) if index != 2)
+
+
+@pytest.mark.parametrize("fail_batches", [False, True])
+def test_analyzer_falls_back_to_per_prompt_calls_when_the_batch_fails(fail_batches):
+    llm = BatchAwareLLM(fail_batches=fail_batches)
+    analyzer = PromptAnalyzer(SimpleNamespace(
+        llm=llm, router=None, cache=None, fast_analysis=False, fast_analysis_threshold=1.0,
+        structured_analysis=False, semantic_cache=None, analysis_batching={"window": 0.05},
+        analysis_chunk_tokens=0, analysis_chunk_concurrency=1, guard=LLMGuard(max_retries=0),
+    ))
+    busy(analyzer.batcher)
+
+    async def scenario():
+        return await asyncio.gather(*(analyzer.analyze_prompt_async(prompt, raise_errors=True) for prompt in PROMPTS))
+
+    analyses = asyncio.run(scenario())
+    assert [(analysis["task_type"], analysis["complexity"]) for analysis in analyses] == [("code", "Low")] * 4
+    assert not any(analyzer._is_fallback(analysis) for analysis in analyses)
+    assert llm.batch_sizes == [4]
+    assert llm.single_calls == (4 if fail_batches else 0)
@@ -0,0 +1,74 @@
+# test_rate_limit.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import time
+from Prompt_analyzer_Enhancer.rate_limit import BATCH, INTERACTIVE, TokenBucketLimiter, track_queue_wait
+
+
+def drained(requests_per_minute: int) -> TokenBucketLimiter:
+    limiter = TokenBucketLimiter(requests_per_minute=requests_per_minute)
+    limiter._levels["requests"] = (0.0, time.time())
+    return limiter
+
+
+def test_full_bucket_admits_its_capacity_then_refuses():
+    limiter = TokenBucketLimiter(requests_per_minute=3)
+    assert [limiter.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_empty_bucket_refills_at_its_rate():
+    # 1,200 a minute is one request every 50 ms
+    limiter = drained(1200)
+    assert not limiter.try_acquire()
+    with track_queue_wait() as waited:
+        limiter.acquire()
+    assert 0.03 <= waited[0] < 0.5
+    assert limiter.stats()["interactive"]["waited"] == 1
+
+
+def test_call_larger_than_the_token_bucket_waits_for_a_full_bucket_only():
+    limiter = TokenBucketLimiter(tokens_per_minute=600)
+    assert limiter.acquire(tokens=10_000) < 0.01
+    assert not limiter.try_acquire(tokens=1)
+
+
+def test_interactive_waiters_are_served_before_earlier_batch_waiters():
+    async def scenario():
+        limiter = drained(1200)
+        served = []
+
+        async def call(name, priority):
+            await limiter.aacquire(priority=priority)
+            served.append(name)
+
+        batch = asyncio.create_task(call("batch", BATCH))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+        await asyncio.gather(batch, interactive)
+        assert served == ["interactive", "batch"]
+
+    asyncio.run(scenario())
+
+
+def test_try_acquire_does_not_jump_the_queue():
+    async def scenario():
+        limiter = drained(1200)
+        waiter = asyncio.create_task(limiter.aacquire())
+        await asyncio.sleep(0)
+        # Let the budget refill while the waiter still holds its place
+        limiter._levels["requests"] = (10.0, time.time())
+        assert not limiter.try_acquire()
+        await waiter
+
+    asyncio.run(scenario())
+
+
+def test_limiters_on_one_database_share_a_budget(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first = TokenBucketLimiter(requests_per_minute=2, db_path=path)
+    second = TokenBucketLimiter(requests_per_minute=2, db_path=path)
+    assert first.try_acquire() and second.try_acquire()
+    assert not first.try_acquire() and not second.try_acquire()
+    assert first.stats()["shared"]
@@ -0,0 +1,82 @@
+# test_resilience.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import pytest
+from Prompt_analyzer_Enhancer.resilience import CircuitBreaker, CircuitOpenError, LLMGuard
+
+
+class Interrupted(BaseException):
+    """Stands in for GeneratorExit/KeyboardInterrupt in a blocking call"""
+
+
+def open_guard(reset_timeout: float = 0.0) -> LLMGuard:
+    guard = LLMGuard(max_retries=0, breaker=CircuitBreaker(failure_threshold=1, reset_timeout=reset_timeout))
+
+    def unavailable():
+        raise ConnectionError("upstream unavailable")
+
+    with pytest.raises(ConnectionError):
+        guard.call(unavailable)
+    return guard
+
+
+def test_breaker_opens_and_rejects_calls():
+    guard = open_guard(reset_timeout=60)
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: "ok")
+    assert guard.stats()["short_circuited"] == 1
+
+
+def test_only_one_half_open_probe_at_a_time():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.admit() is True
+    assert breaker.admit() is None
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.admit() is False
+
+
+def test_cancelled_async_probe_lets_the_next_call_through():
+    async def scenario():
+        guard = open_guard()
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(5)
+
+        probe = asyncio.create_task(guard.acall(hang))
+        await started.wait()
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok():
+            return "ok"
+
+        assert await guard.acall(ok) == "ok"
+        assert guard.breaker.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_sync_probe_lets_the_next_call_through():
+    guard = open_guard()
+
+    def interrupted():
+        raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        guard.call(interrupted)
+    assert guard.call(lambda: "ok") == "ok"
+    assert guard.breaker.state == "closed"
+
+
+def test_cancelled_call_does_not_release_another_callers_probe():
+    guard = open_guard()
+    assert guard.before_attempt() is True
+    guard.release(False)
+    with pytest.raises(CircuitOpenError):
+        guard.before_attempt()
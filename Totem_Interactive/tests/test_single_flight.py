@@ -0,0 +1,149 @@
+# test_single_flight.py
+#
+# Run from Totem_Interactive/ with: python3 -m pytest -q tests
+
+import asyncio
+import threading
+import pytest
+from Prompt_analyzer_Enhancer.single_flight import SingleFlight
+
+
+def test_sync_follower_gets_a_copy_of_the_leader_result():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def fn():
+        started.set()
+        release.wait(5)
+        return {"missing_elements": ["Expected output"]}
+
+    def call(name):
+        results[name] = flight.do("key", fn)
+
+    leader = threading.Thread(target=call, args=("leader",))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call, args=("follower",))
+    follower.start()
+    while flight.stats()["followers"] == 0:
+        pass
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    (leader_result, leader_shared), (follower_result, follower_shared) = results["leader"], results["follower"]
+    assert (leader_shared, follower_shared) == (False, True)
+    assert follower_result == leader_result
+    leader_result["missing_elements"].append("Constraints")
+    assert follower_result["missing_elements"] == ["Expected output"]
+
+
+def test_sync_follower_gets_the_leader_exception():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    errors = {}
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    def call(name):
+        try:
+            flight.do("key", fn)
+        except ValueError as e:
+            errors[name] = e
+
+    leader = threading.Thread(target=call, args=("leader",))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call, args=("follower",))
+    follower.start()
+    while flight.stats()["followers"] == 0:
+        pass
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert set(errors) == {"leader", "follower"}
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_follower_gets_a_copy_of_the_leader_result():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            return {"missing_elements": ["Expected output"]}
+
+        (leader_result, leader_shared), (follower_result, follower_shared) = await asyncio.gather(
+            flight.ado("key", fn), flight.ado("key", fn)
+        )
+        assert (leader_shared, follower_shared) == (False, True)
+        assert follower_result == leader_result and follower_result is not leader_result
+        leader_result["missing_elements"].append("Constraints")
+        assert follower_result["missing_elements"] == ["Expected output"]
+
+    asyncio.run(scenario())
+
+
+def test_async_follower_gets_the_leader_exception():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def fn():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(flight.ado("key", fn), flight.ado("key", fn), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_async_caller_after_the_last_waiter_left_starts_a_new_call():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def slow():
+            await asyncio.sleep(5)
+            return "stale"
+
+        async def fresh():
+            return "fresh"
+
+        only_waiter = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        only_waiter.cancel()
+        # Scheduled before the cancelled call's done callback can run
+        late_caller = asyncio.create_task(flight.ado("key", fresh))
+
+        with pytest.raises(asyncio.CancelledError):
+            await only_waiter
+        assert await late_caller == ("fresh", False)
+
+    asyncio.run(scenario())
+
+
+def test_async_cancelled_follower_leaves_the_shared_call_running():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fn():
+            await asyncio.sleep(0.01)
+            return "done"
+
+        leader = asyncio.create_task(flight.ado("key", fn))
+        follower = asyncio.create_task(flight.ado("key", fn))
+        await asyncio.sleep(0)
+        follower.cancel()
+        assert await leader == ("done", False)
+
+    asyncio.run(scenario())